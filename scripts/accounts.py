@@ -0,0 +1,162 @@
+# ═══════════════════════════════════════════════════════════════
+# Account Registry
+# Per-platform accounts (logins, sessions, tokens) for sharding
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DEFAULT_ACCOUNTS_FILE = 'accounts.json'
+DEFAULT_ACCOUNT = 'default'
+
+# Settings of the single built-in account, used when accounts.json is missing.
+# These are the file names and env vars the uploaders always used.
+LEGACY_SETTINGS = {
+    'instagram': {
+        'username_env': 'INSTAGRAM_USERNAME',
+        'password_env': 'INSTAGRAM_PASSWORD',
+        'session_file': 'instagram_session.json',
+    },
+    'youtube': {
+        'credentials_file': 'youtube_credentials.json',
+        'token_file': 'youtube_token.json',
+    },
+    'tiktok': {
+        'username_env': 'TIKTOK_USERNAME',
+        'password_env': 'TIKTOK_PASSWORD',
+        'state_file': 'tiktok_state.json',
+    },
+}
+
+# Per-account file names, derived from the account name when not given
+DERIVED_FILES = {
+    'instagram': {'session_file': 'instagram_session_{name}.json'},
+    'youtube': {'token_file': 'youtube_token_{name}.json'},
+    'tiktok': {'state_file': 'tiktok_state_{name}.json'},
+}
+
+
+class Account:
+    """One identity on one platform.
+
+    `settings` holds whatever the platform uploader needs: username/password
+    (or the env vars holding them), session/token/state file names, etc.
+    """
+
+    def __init__(self, platform: str, name: str, settings: Optional[Dict] = None,
+                 configured: bool = True):
+        self.platform = platform
+        self.name = name
+        self.settings = settings or {}
+        # False for the built-in default account of a platform that has no
+        # accounts configured; it takes every row regardless of `Account`
+        self.configured = configured
+
+    def get(self, key: str, default=None):
+        return self.settings.get(key, default)
+
+    def secret(self, key: str, default: str = '') -> str:
+        """Value of `key`, or of the env var named by `<key>_env`"""
+        if self.settings.get(key):
+            return self.settings[key]
+        env = self.settings.get(f'{key}_env')
+        return os.getenv(env, default) if env else default
+
+    def owns(self, row: Dict) -> bool:
+        """True if a tracker row is pinned to this account or not pinned at all"""
+        return not self.configured or (row.get('Account') or '').strip() in ('', self.name)
+
+    def __repr__(self):
+        return f"Account({self.platform}:{self.name})"
+
+
+class AccountRegistry:
+    """Accounts per platform, loaded from accounts.json.
+
+    Format:
+        {
+          "instagram": [{"name": "travel", "username": "...", "password_env": "IG_TRAVEL_PASSWORD"}],
+          "youtube":   [{"name": "travel", "credentials_file": "youtube_credentials.json"}],
+          "tiktok":    [{"name": "travel", "username_env": "TT_TRAVEL_USER", "password_env": "TT_TRAVEL_PASSWORD"}]
+        }
+
+    Platforms missing from the file get one `default` account that uses the
+    original env vars and session files and ignores the `Account` column, so a
+    persona configured only for Instagram still posts to YouTube and TikTok.
+    """
+
+    def __init__(self, path: str = DEFAULT_ACCOUNTS_FILE):
+        self.path = Path(path)
+        self._accounts: Dict[str, List[Account]] = {}
+        config = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+
+        for platform, legacy in LEGACY_SETTINGS.items():
+            entries = config.get(platform) or []
+            if not entries:
+                self._accounts[platform] = [
+                    Account(platform, DEFAULT_ACCOUNT, dict(legacy), configured=False)
+                ]
+                continue
+            accounts = []
+            for entry in entries:
+                name = entry.get('name') or DEFAULT_ACCOUNT
+                settings = dict(legacy)
+                settings.update({k: v.format(name=name) for k, v in DERIVED_FILES[platform].items()})
+                settings.update(entry)
+                accounts.append(Account(platform, name, settings))
+            self._accounts[platform] = accounts
+
+    def accounts(self, platform: str) -> List[Account]:
+        return list(self._accounts.get(platform, []))
+
+    def get(self, platform: str, name: Optional[str] = None) -> Optional[Account]:
+        """Account by name, or the platform's first account when no name is given"""
+        accounts = self._accounts.get(platform, [])
+        if not name:
+            return accounts[0] if accounts else None
+        return next((a for a in accounts if a.name == name), None)
+
+    def shard(self, platform: str, rows: List[Dict]) -> Dict[str, List[Dict]]:
+        """Split job rows across the platform's accounts.
+
+        Rows with an `Account` go to that account; the rest are spread evenly
+        (least-loaded first). Rows naming an unknown account land under that
+        name so the caller can report them.
+        """
+        shards = {a.name: [] for a in self.accounts(platform)}
+        configured = any(a.configured for a in self.accounts(platform))
+        unassigned = []
+        for row in rows:
+            name = (row.get('Account') or '').strip()
+            if name and configured:
+                shards.setdefault(name, []).append(row)
+            else:
+                unassigned.append(row)
+        known = [a.name for a in self.accounts(platform)]
+        for row in unassigned:
+            target = min(known, key=lambda n: len(shards[n]))
+            shards[target].append(row)
+        return shards
+
+
+_registry: Optional[AccountRegistry] = None
+
+
+def get_registry() -> AccountRegistry:
+    """Process-wide registry, loaded on first use"""
+    global _registry
+    if _registry is None:
+        _registry = AccountRegistry(os.getenv('ACCOUNTS_FILE', DEFAULT_ACCOUNTS_FILE))
+    return _registry
+
+
+def reload_registry() -> AccountRegistry:
+    """Re-read accounts.json (e.g. on a daemon reload)"""
+    global _registry
+    _registry = None
+    return get_registry()
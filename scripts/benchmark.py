@@ -0,0 +1,456 @@
+# ═══════════════════════════════════════════════════════════════
+# Offline Benchmark
+# Runs the orchestrator against local stand-ins for Instagram,
+# YouTube and TikTok and reports videos/hour, peak RSS and tail
+# latency per mode
+# ═══════════════════════════════════════════════════════════════
+#
+#   python benchmark.py --videos 50 --size-mb 5 --modes sequential,parallel
+#
+# Instagram: a fake instagrapi Client (in-process). YouTube: a local HTTP
+# server speaking the resumable upload protocol, driven by the real
+# googleapiclient upload code. TikTok: benchmark_tiktok.html, served by the
+# same server and driven by the real Playwright flow. Each mode runs in its
+# own process, so peak RSS and metrics don't leak between modes.
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+HERE = Path(__file__).resolve().parent
+TIKTOK_PAGE = HERE / 'benchmark_tiktok.html'
+PLATFORM_LABELS = {'instagram': 'IG', 'youtube': 'YT', 'tiktok': 'TT'}
+
+
+# ═══════════════════════════════════════════════════════════════
+# YouTube + TikTok stand-in server
+# ═══════════════════════════════════════════════════════════════
+
+class FakeServer(ThreadingHTTPServer):
+    """Local HTTP server for the YouTube resumable protocol and the TikTok page
+
+    `latency` is added to every request, `bandwidth` (MB/s) caps how fast
+    upload bodies are accepted, `yt_fail` is the chance a YouTube chunk gets
+    a 503 (retried by the uploader), `tt_processing` is how long TikTok takes
+    to "process" a video.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.05, bandwidth: float = 50.0,
+                 yt_fail: float = 0.0, tt_processing: float = 1.0):
+        super().__init__(('127.0.0.1', 0), FakeHandler)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.yt_fail = yt_fail
+        self.tt_processing = tt_processing
+        self.sessions: Dict[str, Dict] = {}  # upload_id -> {'size', 'offset'}
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def next_id(self) -> str:
+        with self.lock:
+            self.counter += 1
+            return f"bench{self.counter:06d}"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        size = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(size) if size else b''
+        if body and self.server.bandwidth > 0:
+            time.sleep(len(body) / (self.server.bandwidth * 1024 * 1024))
+        return body
+
+    def _reply(self, status: int, body: bytes = b'', headers: Optional[Dict[str, str]] = None,
+               content_type: str = 'application/json'):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, data: Dict, headers: Optional[Dict[str, str]] = None):
+        self._reply(status, json.dumps(data).encode(), headers)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        if url.path == '/tiktok/upload':
+            self._reply(200, TIKTOK_PAGE.read_bytes(), content_type='text/html; charset=utf-8')
+        elif url.path == '/tiktok/video/commit':
+            time.sleep(self.server.tt_processing)
+            self._json(200, {'status': 'complete'})
+        else:
+            self._json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        body = self._read_body()
+        if url.path == '/upload/youtube/v3/videos':
+            # Start a resumable session
+            upload_id = self.server.next_id()
+            size = int(self.headers.get('X-Upload-Content-Length') or -1)
+            with self.server.lock:
+                self.server.sessions[upload_id] = {'size': size, 'offset': 0}
+            location = f"{self.server.url}/upload/youtube/v3/videos?upload_id={upload_id}"
+            self._reply(200, headers={'Location': location})
+        elif url.path == '/tiktok/upload/video':
+            self._json(200, {'video_id': self.server.next_id(), 'bytes': len(body)})
+        elif url.path == '/tiktok/post/create':
+            video_id = json.loads(body or b'{}').get('video_id', '')
+            self._json(200, {'url': f"https://www.tiktok.com/@bench/video/{video_id}"})
+        else:
+            self._json(404, {'error': 'not found'})
+
+    def do_PUT(self):
+        time.sleep(self.server.latency)
+        upload_id = parse_qs(urlparse(self.path).query).get('upload_id', [''])[0]
+        session = self.server.sessions.get(upload_id)
+        body = self._read_body()
+        if session is None:
+            self._json(404, {'error': {'code': 404, 'message': 'Upload session not found'}})
+            return
+
+        # Content-Range: "bytes a-b/total" for a chunk, "bytes */total" for a status check
+        content_range = self.headers.get('Content-Range', '')
+        span, _, total = content_range.replace('bytes ', '').partition('/')
+        if span != '*':
+            if random.random() < self.server.yt_fail:
+                self._json(503, {'error': {'code': 503, 'message': 'Backend Error',
+                                           'errors': [{'reason': 'backendError'}]}})
+                return
+            start = int(span.split('-')[0])
+            if start == session['offset']:
+                session['offset'] += len(body)
+            if total != '*':
+                session['size'] = int(total)
+
+        if session['size'] >= 0 and session['offset'] >= session['size']:
+            self._json(200, {'kind': 'youtube#video', 'id': upload_id})
+        elif session['offset']:
+            self._reply(308, headers={'Range': f"bytes=0-{session['offset'] - 1}"})
+        else:
+            self._reply(308)
+
+
+# ═══════════════════════════════════════════════════════════════
+# Instagram stand-in (instagrapi-compatible client)
+# ═══════════════════════════════════════════════════════════════
+
+class FakeMedia:
+    def __init__(self, code: str):
+        self.code = code
+
+
+class FakeInstagramClient:
+    """The slice of instagrapi.Client the Instagram uploader uses
+
+    clip_upload() reads the whole file, then waits `latency` plus the time
+    the bytes would take at `bandwidth` MB/s; `fail` is the chance it raises.
+    """
+
+    latency = 0.5
+    bandwidth = 50.0
+    fail = 0.0
+
+    def __init__(self):
+        self._settings = {}
+
+    def load_settings(self, path):
+        self._settings = {'uuids': {}}
+
+    def dump_settings(self, path):
+        pass
+
+    def get_settings(self) -> Dict:
+        return self._settings
+
+    def set_settings(self, settings: Dict):
+        self._settings = settings
+
+    def set_uuids(self, uuids: Dict):
+        self._settings['uuids'] = uuids
+
+    def account_info(self) -> Dict:
+        return {'username': 'bench'}
+
+    def login(self, username: str, password: str) -> bool:
+        time.sleep(self.latency)
+        return True
+
+    def clip_upload(self, path, caption: str, extra_data: Optional[Dict] = None) -> FakeMedia:
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+        time.sleep(self.latency + size / (self.bandwidth * 1024 * 1024))
+        if random.random() < self.fail:
+            raise RuntimeError('Fake Instagram error: upload failed')
+        return FakeMedia(f"BENCH{random.getrandbits(40):010x}")
+
+
+# ═══════════════════════════════════════════════════════════════
+# One mode (child process)
+# ═══════════════════════════════════════════════════════════════
+
+class LocalYouTube:
+    """Stands in for the googleapiclient service: videos().insert() returns a
+    real resumable HttpRequest pointed at the local server"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    def videos(self):
+        return self
+
+    def insert(self, part: str, body: Dict, media_body):
+        import httplib2
+        from googleapiclient.http import HttpRequest
+        http = httplib2.Http()
+        # 308 means "resume incomplete" here, not a redirect (as in build())
+        http.redirect_codes = http.redirect_codes - {308}
+        return HttpRequest(
+            http, lambda resp, content: json.loads(content),
+            f"{self.base_url}/upload/youtube/v3/videos?uploadType=resumable&part={part}",
+            method='POST', body=json.dumps(body),
+            headers={'content-type': 'application/json'},
+            methodId='youtube.videos.insert', resumable=media_body,
+        )
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of this process in bytes, if the OS tells us"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset
+        except ImportError:
+            return None
+
+
+def make_queue(queue_dir: Path, count: int, size_mb: float, real_media: bool):
+    """`count` distinct files: random bytes, or a real clip plus a unique tail"""
+    queue_dir.mkdir(parents=True, exist_ok=True)
+    size = int(size_mb * 1024 * 1024)
+    base = b''
+    if real_media:
+        clip = queue_dir.parent / 'base.mp4'
+        subprocess.run([
+            'ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc2=size=1080x1920:rate=30',
+            '-f', 'lavfi', '-i', 'sine', '-t', '5', '-c:v', 'libx264', '-b:v', f"{max(1, size * 8 // 5)}",
+            '-c:a', 'aac', '-shortest', str(clip)
+        ], check=True)
+        base = clip.read_bytes()
+    for i in range(count):
+        with open(queue_dir / f"bench_{i:05d}.mp4", 'wb') as f:
+            # MP4 readers ignore trailing bytes; they keep every hash unique
+            f.write(base or os.urandom(size))
+            f.write(os.urandom(16))
+
+
+def run_mode(args) -> Dict:
+    """Run one orchestrator mode in this process and measure it"""
+    os.environ['YOUTUBE_DAILY_QUOTA'] = str(10 ** 9)
+    os.environ['ACCOUNTS_FILE'] = str(Path(args.workdir) / 'accounts.json')
+    os.environ['METRICS_DIR'] = str(Path(args.workdir) / 'metrics')
+    os.chdir(args.workdir)
+
+    import media
+    import ratelimit
+    import uploader_ig
+    import orchestrator
+    from uploader_yt import YouTubeUploader
+    from uploader_tt import TikTokUploader
+    from metrics import METRICS, percentile
+    from tracker import open_tracker
+
+    if not args.rate_limits:
+        # Measure our own overhead, not the platforms' politeness delays
+        ratelimit.RATE_LIMITS.clear()
+    if not args.media:
+        media.ffmpeg_available = lambda: False
+
+    FakeInstagramClient.latency = args.ig_latency
+    FakeInstagramClient.bandwidth = args.bandwidth
+    FakeInstagramClient.fail = args.ig_fail
+    uploader_ig.InstagramClient = FakeInstagramClient
+
+    class BenchYouTubeUploader(YouTubeUploader):
+        def _authenticate(self) -> bool:
+            self.youtube = LocalYouTube(args.server)
+            return True
+
+    class BenchTikTokUploader(TikTokUploader):
+        upload_url = f"{args.server}/tiktok/upload"
+
+    uploaders = {
+        'instagram': uploader_ig.InstagramUploader,
+        'youtube': BenchYouTubeUploader,
+        'tiktok': BenchTikTokUploader,
+    }
+    orchestrator.UPLOADERS.update(uploaders)
+
+    # Platforms left out are marked done up front, so no job is queued for them
+    with open('upload_tracker.csv', 'w', encoding='utf-8', newline='') as f:
+        f.write('Video File,Title,Caption,Tags,Instagram Status,YouTube Status,TikTok Status\n')
+        for path in sorted(Path('videos_queue').iterdir()):
+            statuses = ['new' if p in args.platforms else 'skip' for p in orchestrator.PLATFORMS]
+            f.write(f"{path.name},Bench {path.stem},Benchmark upload,bench,{','.join(statuses)}\n")
+
+    orc = orchestrator.Orchestrator(tracker_path='upload_tracker.db')
+    started = time.perf_counter()
+    orc.run(mode=args.child)
+    wall = time.perf_counter() - started
+
+    tracker = open_tracker('upload_tracker.db')
+    published = sum(1 for row in tracker.rows() if row['Status'] == 'published')
+    tracker.close()
+
+    result = {
+        'mode': args.child,
+        'videos': args.videos,
+        'published': published,
+        'wall': wall,
+        'videos_per_hour': published / wall * 3600 if wall else 0.0,
+        'jobs_per_hour': sum(s['posted'] for s in orc.stats.values()) / wall * 3600 if wall else 0.0,
+        'peak_rss': peak_rss(),
+        'platforms': {},
+    }
+    for platform in args.platforms:
+        values = METRICS.values(platform, 'upload')
+        result['platforms'][platform] = {
+            'posted': orc.stats[platform]['posted'],
+            'failed': orc.stats[platform]['failed'],
+            'p50': percentile(values, 0.5),
+            'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99),
+        }
+    return result
+
+
+# ═══════════════════════════════════════════════════════════════
+# Runner (parent process)
+# ═══════════════════════════════════════════════════════════════
+
+def print_report(results: List[Dict], platforms: List[str]):
+    print("\n" + "="*70)
+    print("📊 BENCHMARK")
+    print("="*70)
+    header = f"{'mode':11} {'done':>9} {'wall':>8} {'videos/h':>9} {'jobs/h':>8} {'peak RSS':>9}"
+    print(header)
+    for r in results:
+        rss = f"{r['peak_rss'] / (1024 * 1024):.0f} MB" if r['peak_rss'] else 'n/a'
+        print(f"{r['mode']:11} {r['published']:>4}/{r['videos']:<4} {r['wall']:>7.1f}s "
+              f"{r['videos_per_hour']:>9.0f} {r['jobs_per_hour']:>8.0f} {rss:>9}")
+    print("-"*70)
+    print("⏱️  Upload latency p50 / p95 / p99 (failed)")
+    for r in results:
+        cells = []
+        for platform in platforms:
+            stats = r['platforms'][platform]
+            cells.append(f"{PLATFORM_LABELS[platform]} {stats['p50']:.2f}/{stats['p95']:.2f}/"
+                         f"{stats['p99']:.2f}s ({stats['failed']})")
+        print(f"{r['mode']:11} " + "  ".join(cells))
+    print("="*70 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline orchestrator benchmark")
+    parser.add_argument('--videos', type=int, default=20, help="Videos in the synthetic queue")
+    parser.add_argument('--size-mb', type=float, default=2.0, help="Size of each video")
+    parser.add_argument('--modes', default='sequential,parallel')
+    parser.add_argument('--platforms', default='instagram,youtube,tiktok')
+    parser.add_argument('--ig-latency', type=float, default=0.5, help="Seconds per Instagram call")
+    parser.add_argument('--ig-fail', type=float, default=0.0, help="Chance an Instagram upload fails")
+    parser.add_argument('--yt-fail', type=float, default=0.0, help="Chance a YouTube chunk gets a 503")
+    parser.add_argument('--tt-processing', type=float, default=1.0, help="Seconds TikTok 'processes' a video")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds added to every server request")
+    parser.add_argument('--bandwidth', type=float, default=50.0, help="Upload bandwidth in MB/s")
+    parser.add_argument('--rate-limits', action='store_true', help="Keep the real per-platform rate limits")
+    parser.add_argument('--media', action='store_true', help="Use real clips (needs ffmpeg) and prepare them")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--keep', action='store_true', help="Keep the work directories and logs")
+    # Internal: run one mode in a child process
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--server', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.platforms = [p.strip() for p in args.platforms.split(',') if p.strip()]
+
+    if args.child:
+        sys.path.insert(0, str(HERE))
+        result = run_mode(args)
+        with open(args.result, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    server = FakeServer(args.latency, args.bandwidth, args.yt_fail, args.tt_processing)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    root = Path(tempfile.mkdtemp(prefix='bench_'))
+    print(f"🧪 {args.videos} x {args.size_mb:g} MB videos, fakes at {server.url}, work dir {root}")
+
+    results = []
+    try:
+        for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+            workdir = root / mode
+            make_queue(workdir / 'videos_queue', args.videos, args.size_mb, args.media)
+            result_file = workdir / 'result.json'
+            command = [sys.executable, str(Path(__file__).resolve()), '--child', mode,
+                       '--server', server.url, '--workdir', str(workdir), '--result', str(result_file)]
+            command += [arg for arg in sys.argv[1:] if arg not in ('--keep',)]
+            print(f"▶️  {mode}...")
+            with open(workdir / 'run.log', 'w', encoding='utf-8') as log:
+                code = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT,
+                                       env=dict(os.environ, PYTHONIOENCODING='utf-8'))
+            if code != 0 or not result_file.exists():
+                print(f"❌ {mode} failed (exit {code}), see {workdir / 'run.log'}")
+                args.keep = True
+                continue
+            with open(result_file, 'r', encoding='utf-8') as f:
+                results.append(json.load(f))
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if results:
+        print_report(results, args.platforms)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
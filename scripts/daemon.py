@@ -0,0 +1,284 @@
+# ═══════════════════════════════════════════════════════════════
+# Upload Daemon
+# Long-running mode: uploaders stay logged in, videos_queue is
+# watched and new files are uploaded seconds after they land
+# ═══════════════════════════════════════════════════════════════
+
+import time
+import signal
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from accounts import get_registry, reload_registry
+from hashindex import HashIndex, index_path_for
+from generate_csv import new_row
+from watcher import QueueWatcher
+from scheduler import PublishScheduler
+from metrics import METRICS
+
+SYNC_INTERVAL = 30.0  # Seconds between CSV syncs and re-checks of deferred jobs
+
+
+class UploadDaemon:
+    """Runs an Orchestrator until stopped.
+
+    Each (platform, account) is a lane: one uploader, started once, and its
+    worker tasks pulling from an asyncio queue. New files are added to the
+    tracker and their jobs pushed onto the lanes; jobs already queued or
+    uploading are never dispatched twice.
+
+    Future jobs (Publish Date, or deferred until a quota reset) sit in a
+    PublishScheduler: staged a lead time ahead and dispatched when due.
+
+    Signals: SIGINT/SIGTERM finish the uploads in progress and exit (a second
+    one exits at once); SIGHUP (Ctrl+Break on Windows) reloads the CSV and
+    accounts.json. CSV edits are also picked up on the periodic sync.
+    """
+
+    def __init__(self, orchestrator):
+        self.orc = orchestrator
+        self.tracker = orchestrator.tracker
+        self.queue_dir = orchestrator.queue_dir
+        self.csv_path = orchestrator.csv_path
+        self.hashes = HashIndex(index_path_for(self.tracker))
+        self.lanes: Dict[Tuple[str, str], Dict] = {}
+        self.inflight = set()  # (video_file, platform) queued or uploading
+        self.scheduler = PublishScheduler(self.tracker, platforms=orchestrator.platforms)
+        self._stopping = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._reload = False
+        self._dirty = False
+        self._csv_sig = None
+        self._next_reconcile = 0.0
+
+    # ── Signals ──
+
+    def _install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        handlers = [(signal.SIGINT, self._on_stop), (getattr(signal, 'SIGTERM', None), self._on_stop),
+                    (getattr(signal, 'SIGHUP', None) or getattr(signal, 'SIGBREAK', None), self._on_reload)]
+        for sig, handler in handlers:
+            if sig is None:
+                continue
+            try:
+                loop.add_signal_handler(sig, handler)
+            except (NotImplementedError, RuntimeError):
+                # Windows event loops have no add_signal_handler
+                signal.signal(sig, lambda *_, h=handler: loop.call_soon_threadsafe(h))
+
+    def _on_stop(self):
+        if self._stopping.is_set():
+            print("\n⛔ Stopping now")
+            for lane in self.lanes.values():
+                for task in lane['workers']:
+                    task.cancel()
+            return
+        print("\n🛑 Stopping after the uploads in progress (again to stop now)...")
+        self._stopping.set()
+        self._wake.set()
+
+    def _on_reload(self):
+        self._reload = True
+        self._wake.set()
+
+    # ── Lanes ──
+
+    async def _open_lanes(self):
+        """Start an uploader per (platform, account) that has no lane yet"""
+        registry = get_registry()
+        wanted = [(p, a) for p in self.orc.platforms for a in registry.accounts(p) if (p, a.name) not in self.lanes]
+        uploaders = [self.orc._new_uploader(p, a) for p, a in wanted]
+        ready = await asyncio.gather(*(self.orc._start_uploader(u) for u in uploaders))
+        for (platform, account), uploader, ok in zip(wanted, uploaders, ready):
+            if not ok:
+                print(f"⚠️ [{platform}:{account.name}] Not started; its jobs wait for a reload")
+                continue
+            queue = asyncio.Queue()
+            size = uploader.concurrency if platform == 'tiktok' else self.orc.workers[platform]
+            workers = [asyncio.ensure_future(self._lane_worker(platform, uploader, queue))
+                       for _ in range(size)]
+            self.lanes[(platform, account.name)] = {'uploader': uploader, 'queue': queue, 'workers': workers}
+
+    async def _lane_worker(self, platform: str, uploader, queue: asyncio.Queue):
+        while True:
+            row = await queue.get()
+            if row is None:
+                return
+            try:
+                await self.orc._run_job(platform, uploader, row)
+            finally:
+                self.inflight.discard((row['Video File'], platform))
+                self._dirty = True
+
+    async def _close_lanes(self):
+        # Jobs still waiting stay `new` in the tracker for the next start
+        for lane in self.lanes.values():
+            while not lane['queue'].empty():
+                row = lane['queue'].get_nowait()
+                if row is not None:
+                    self.inflight.discard((row['Video File'], lane['uploader'].platform))
+            for _ in lane['workers']:
+                lane['queue'].put_nowait(None)
+        workers = [t for lane in self.lanes.values() for t in lane['workers']]
+        if any(not t.done() for t in workers):
+            print("⏳ Waiting for uploads in progress...")
+        await asyncio.gather(*workers, return_exceptions=True)
+        await asyncio.gather(*(self.orc._stop_uploader(lane['uploader']) for lane in self.lanes.values()))
+        self.lanes.clear()
+
+    # ── Jobs ──
+
+    def dispatch(self, rows_by_platform: Dict[str, List[Dict]]):
+        """Push jobs onto their (platform, account) lanes"""
+        registry = get_registry()
+        media = {}
+        for platform, rows in rows_by_platform.items():
+            for name, shard in registry.shard(platform, rows).items():
+                lane = self.lanes.get((platform, name))
+                if lane is None:
+                    if registry.get(platform, name) is None:
+                        for row in shard:
+                            self.tracker.update_job(row['Video File'], platform, 'error',
+                                                    error=f"Unknown account '{name}'")
+                    continue
+                for row in shard:
+                    self.inflight.add((row['Video File'], platform))
+                    media.setdefault(row['Video File'], []).append(platform)
+                    lane['queue'].put_nowait(row)
+                if shard:
+                    print(f"📋 [{platform}:{name}] {len(shard)} job(s) queued")
+        if media:
+            self.orc.preparer.submit(media)
+
+    def pending_jobs(self, names: Optional[set] = None) -> Dict[str, List[Dict]]:
+        """New jobs whose file is in the queue and that are not queued yet"""
+        pending = {}
+        for platform in self.orc.platforms:
+            pending[platform] = [
+                row for row in self.tracker.jobs(platform, 'new')
+                if (names is None or row['Video File'] in names)
+                and (row['Video File'], platform) not in self.inflight
+                and (self.queue_dir / row['Video File']).exists()
+            ]
+        return pending
+
+    async def _stage(self, jobs: Dict[str, List[str]]):
+        """Get jobs that are due soon ready: media prepared, uploader logged in"""
+        print(f"🗓️  Staging {len(jobs)} video(s) due within {self.scheduler.lead}")
+        platforms = {platform for platforms in jobs.values() for platform in platforms}
+        if platforms - {platform for platform, _ in self.lanes}:
+            await self._open_lanes()
+        self.orc.preparer.submit(jobs)
+
+    async def _due(self, names: set):
+        print(f"🗓️  {len(names)} scheduled video(s) due")
+        self.dispatch(self.pending_jobs(names))
+
+    def ingest(self, names: List[str], digests: Dict[str, str]):
+        """Track new files (skipping copies of tracked content) and dispatch them"""
+        for name in names:
+            own_path = str(self.queue_dir / name)
+            if self.tracker.get(name) is not None or own_path not in digests:
+                continue  # Known, or gone before it could be hashed
+            original = next((Path(p).name for p in self.hashes.paths_with(digests[own_path])
+                             if p != own_path and self.tracker.get(Path(p).name)), None)
+            if original:
+                print(f"= {name} (duplicate of {original}, skipped)")
+                continue
+            self.tracker.add(new_row(name))
+            self._dirty = True
+            print(f"📥 New video: {name}")
+        self.dispatch(self.pending_jobs(set(names)))
+
+    async def _watch(self, watcher: QueueWatcher):
+        while True:
+            names = await watcher.changes()
+            try:
+                # Hash off the event loop so a big file doesn't stall running uploads
+                digests = await asyncio.to_thread(self.hashes.digests, [self.queue_dir / n for n in names])
+                self.ingest(names, digests)
+            except Exception as e:
+                # Keep watching; these files are picked up again on their next change
+                print(f"⚠️ Couldn't add {', '.join(names)}: {e}")
+
+    # ── CSV ──
+
+    def _csv_signature(self):
+        try:
+            stat = self.csv_path.stat()
+            return stat.st_size, stat.st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def sync_csv(self, force_import: bool = False):
+        """Import CSV edits made since the last sync, then export our progress"""
+        changed = self._dirty
+        if force_import or self._csv_signature() != self._csv_sig:
+            changed = True
+            added = self.tracker.import_csv(self.csv_path)
+            if added:
+                print(f"📥 Imported {added} new row(s) from {self.csv_path}")
+        if self._dirty or self._csv_sig is None:
+            self.tracker.export_csv(self.csv_path)
+            self.tracker.flush()
+            METRICS.export()
+            self._dirty = False
+        self._csv_sig = self._csv_signature()
+        if changed:
+            # Dates edited in the CSV, jobs deferred by the uploaders
+            self.scheduler.reload()
+
+    async def _reload_config(self):
+        print("🔄 Reloading CSV and accounts...")
+        self.sync_csv(force_import=True)
+        reload_registry()
+        await self._open_lanes()
+
+    # ── Main loop ──
+
+    async def run(self):
+        print("\n" + "="*70)
+        print("👀 RUNNING DAEMON")
+        print("="*70 + "\n")
+
+        self._install_signal_handlers()
+        self._csv_sig = self._csv_signature()
+        # run() reconciled just now; other workers' leases lapse within a ttl
+        self._next_reconcile = time.monotonic() + self.orc.leases.ttl
+        await self._open_lanes()
+
+        watcher = QueueWatcher(self.queue_dir)
+        watcher.start(known=[row['Video File'] for row in self.tracker.rows()])
+        watch_task = asyncio.ensure_future(self._watch(watcher))
+        print(f"👀 Watching {self.queue_dir}/ ({watcher.mode}); Ctrl+C to stop\n")
+        self.dispatch(self.pending_jobs())
+        if self.scheduler.reload():
+            print(f"🗓️  {len(self.scheduler)} job(s) scheduled, next at {self.scheduler.next_due()}\n")
+        schedule_task = asyncio.ensure_future(self.scheduler.run(self._stage, self._due))
+
+        try:
+            while not self._stopping.is_set():
+                try:
+                    await asyncio.wait_for(self._wake.wait(), SYNC_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                if self._stopping.is_set():
+                    break
+                if self._reload:
+                    self._reload = False
+                    await self._reload_config()
+                else:
+                    self.sync_csv()
+                if time.monotonic() >= self._next_reconcile:
+                    # Uploads cut off on workers whose leases have lapsed since
+                    self._next_reconcile = time.monotonic() + self.orc.leases.ttl
+                    await asyncio.to_thread(self.orc.reconcile)
+                # Deferred jobs that came due, rows re-queued in the CSV, lanes just started
+                self.dispatch(self.pending_jobs())
+        finally:
+            watch_task.cancel()
+            schedule_task.cancel()
+            watcher.stop()
+            await self._close_lanes()
+            self.sync_csv()
@@ -3,89 +3,213 @@
 # Quickly create CSV entries from videos in queue
 # ═══════════════════════════════════════════════════════════════
 
+import os
 import csv
+import json
+import time
 from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from hashindex import HashIndex, index_path_for
+from media import VIDEO_EXTENSIONS
+
+FIELDNAMES = [
+    'Video File', 'Title', 'Caption', 'Description', 'Tags', 'Account',
+    'Publish Date', 'Status', 'Instagram URL', 'YouTube URL', 'TikTok URL',
+    'Error', 'Timestamp'
+]
+
+
+def manifest_path_for(csv_path: Path) -> Path:
+    return csv_path.with_name(f"{csv_path.stem}.manifest.json")
+
+
+def _signature(stat: os.stat_result) -> List[int]:
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def scan_queue(queue_path: Path) -> Dict[str, os.DirEntry]:
+    """Every video in the queue, in one directory pass
+
+    DirEntry caches its stat, and is_file() comes from the directory listing,
+    so files that are already known cost no extra system calls.
+    """
+    videos = {}
+    with os.scandir(queue_path) as entries:
+        for entry in entries:
+            name = entry.name
+            if name[name.rfind('.'):].lower() in VIDEO_EXTENSIONS and entry.is_file():
+                videos[name] = entry
+    return videos
+
+
+def read_tracked_names(csv_path: Path) -> Set[str]:
+    """`Video File` of every CSV row, streamed without building row dicts"""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if 'Video File' not in header:
+            return set()
+        column = header.index('Video File')
+        return {row[column] for row in reader if len(row) > column and row[column]}
+
+
+def read_header(csv_path: Path) -> Optional[List[str]]:
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), None)
+
+
+def load_manifest(path: Path) -> Dict:
+    if path.exists():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except ValueError:
+            pass
+    return {'csv': None, 'files': {}}
+
+
+def save_manifest(path: Path, manifest: Dict):
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(manifest))  # dumps() uses the C encoder, dump() does not
+    os.replace(tmp, path)
+
+
+def new_row(video_name: str) -> Dict[str, str]:
+    title = Path(video_name).stem.replace('_', ' ').replace('-', ' ')
+    return {
+        'Video File': video_name,
+        'Title': f"[EDIT] {title}",
+        'Caption': "🎬 New video! #Reels #Instagram #YouTube #TikTok",
+        'Description': "Great content!",
+        'Tags': "viral,entertainment,auto",
+        'Account': '',
+        'Publish Date': '',
+        'Status': 'new',
+        'Instagram URL': '',
+        'YouTube URL': '',
+        'TikTok URL': '',
+        'Error': '',
+        'Timestamp': ''
+    }
+
+
+def append_rows(csv_path: Path, rows: List[Dict[str, str]]):
+    """Append rows under the file's existing header (or a new one)"""
+    header = read_header(csv_path) if csv_path.exists() else None
+    missing_newline = False
+    if header:
+        # A hand-edited file may lack the trailing newline
+        with open(csv_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            missing_newline = f.read(1) not in (b'\n', b'\r')
+    with open(csv_path, 'a', encoding='utf-8', newline='') as f:
+        if missing_newline:
+            f.write('\r\n')
+        writer = csv.DictWriter(f, fieldnames=header or FIELDNAMES, restval='', extrasaction='ignore')
+        if not header:
+            writer.writeheader()
+        writer.writerows(rows)
+
 
 def generate_csv(queue_dir: str = 'videos_queue', csv_file: str = 'upload_tracker.csv'):
-    """Generate CSV from videos in queue folder"""
-    
+    """Add CSV rows for videos that appeared in the queue folder since the last run
+
+    Only new files are looked at: a manifest of (name, size, mtime) remembers
+    what was already handled, and new rows are appended instead of rewriting
+    the file. If the CSV was changed by someone else, its names are re-read
+    (streamed) before diffing. Files gone from the queue stay in the manifest
+    (their rows stay in the CSV), so one that comes back is not added twice.
+    """
     queue_path = Path(queue_dir)
     csv_path = Path(csv_file)
-    
-    # Video extensions
-    extensions = ['.mp4', '.mov', '.avi', '.mkv']
-    
-    # Find all videos
-    videos = []
-    for ext in extensions:
-        videos.extend(queue_path.glob(f'*{ext}'))
-    
+    manifest_path = manifest_path_for(csv_path)
+    timings: List[Tuple[str, float]] = []
+    clock = time.perf_counter()
+
+    def lap(step: str):
+        nonlocal clock
+        now = time.perf_counter()
+        timings.append((step, now - clock))
+        clock = now
+
+    # One pass over the queue
+    videos = scan_queue(queue_path)
+    lap('scan')
     if not videos:
         print(f"No videos found in {queue_dir}/")
         return
-    
-    # Read existing CSV
-    existing_rows = {}
-    if csv_path.exists():
-        with open(csv_path, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                video_file = row.get('Video File', '')
-                if video_file:
-                    existing_rows[video_file] = row
-    
-    # Create rows for new videos
-    fieldnames = [
-        'Video File', 'Title', 'Caption', 'Description', 'Tags',
-        'Status', 'Instagram URL', 'YouTube URL', 'TikTok URL',
-        'Error', 'Timestamp'
-    ]
-    
+
+    # What was handled before: the manifest, unless the CSV changed under us
+    manifest = load_manifest(manifest_path)
+    csv_sig = _signature(csv_path.stat()) if csv_path.exists() else None
+    if csv_sig is not None and manifest['csv'] == csv_sig:
+        handled = manifest['files']
+    else:
+        tracked = read_tracked_names(csv_path) if csv_sig is not None else set()
+        # Rows whose file is not in the queue are known too (no signature)
+        handled = {name: _signature(videos[name].stat()) if name in videos else None for name in tracked}
+    new = sorted(name for name in videos if name not in handled)
+    removed = [name for name in handled if name not in videos]
+    lap('diff')
+
+    # Hash only new files (in parallel); tracked copies were hashed on earlier runs
+    index = HashIndex(index_path_for(csv_path))
+    if csv_sig is not None and manifest['csv'] != csv_sig:
+        index.digests(queue_path / name for name in handled if name in videos)
+    digests = index.digests(queue_path / name for name in new)
+    lap('hash')
+
+    def tracked_copy(digest: str) -> Optional[str]:
+        for path in index.paths_with(digest):
+            name = Path(path).name
+            if name in handled and str(queue_path / name) == path:
+                return name
+        return None
+
     rows = []
-    
-    for video in sorted(videos):
-        video_name = video.name
-        
-        # Check if already exists
-        if video_name in existing_rows:
-            rows.append(existing_rows[video_name])
-            print(f"✓ {video_name} (existing)")
+    owners = {}  # digest -> first new video with it
+    for video_name in new:
+        digest = digests.get(str(queue_path / video_name))
+        if digest is None:
+            continue  # Gone or unreadable; picked up on the next run
+        original = owners.get(digest) or tracked_copy(digest)
+        if original:
+            print(f"= {video_name} (duplicate of {original}, skipped)")
             continue
-        
-        # Create new row
-        title = video.stem.replace('_', ' ').replace('-', ' ')
-        row = {
-            'Video File': video_name,
-            'Title': f"[EDIT] {title}",
-            'Caption': "🎬 New video! #Reels #Instagram #YouTube #TikTok",
-            'Description': "Great content!",
-            'Tags': "viral,entertainment,auto",
-            'Status': 'new',
-            'Instagram URL': '',
-            'YouTube URL': '',
-            'TikTok URL': '',
-            'Error': '',
-            'Timestamp': ''
-        }
-        rows.append(row)
+        owners[digest] = video_name
+        rows.append(new_row(video_name))
         print(f"+ {video_name} (new)")
-    
-    # Write CSV
+
+    if rows:
+        append_rows(csv_path, rows)
+    lap('write')
+
+    # Known files keep their recorded (size, mtime); only new ones are stat'ed.
+    # Removed ones are kept: their rows are still in the CSV
+    csv_now = _signature(csv_path.stat()) if csv_path.exists() else None
+    files = {name: handled[name] for name in removed}
+    files.update((name, handled.get(name) or _signature(entry.stat())) for name, entry in videos.items())
+    if csv_now != manifest['csv'] or files != manifest['files']:
+        save_manifest(manifest_path, {'csv': csv_now, 'files': files})
+    lap('manifest')
+
     if rows:
-        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-        
         print(f"\n✅ CSV updated: {csv_path}")
-        print(f"   Total entries: {len(rows)}")
+        print(f"   Added {len(rows)} row(s); {len(videos) - len(new)} already tracked")
     else:
-        print("No videos to process")
+        print("No new videos to add")
+    if removed:
+        print(f"   {len(removed)} tracked video(s) no longer in {queue_dir}/ (rows kept)")
+    total = sum(seconds for _, seconds in timings)
+    print("⏱️  " + ", ".join(f"{step} {seconds * 1000:.1f}ms" for step, seconds in timings)
+          + f" (total {total * 1000:.1f}ms)")
+
 
 if __name__ == "__main__":
     import sys
-    
+
     queue_dir = sys.argv[1] if len(sys.argv) > 1 else 'videos_queue'
     csv_file = sys.argv[2] if len(sys.argv) > 2 else 'upload_tracker.csv'
-    
+
     generate_csv(queue_dir, csv_file)
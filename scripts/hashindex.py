@@ -0,0 +1,261 @@
+# ═══════════════════════════════════════════════════════════════
+# Content-Hash Index
+# SHA-256 per queued file (cached by path, size and mtime) and the
+# uploads made per hash, so the same clip is never posted twice
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Union
+from tracker import SQLITE_JOURNAL_MODE
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def content_hash(path: Union[str, Path]) -> str:
+    """SHA-256 of a file, streamed through one reusable buffer"""
+    digest = hashlib.sha256()
+    buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def _try_hash(path: Path) -> Optional[str]:
+    try:
+        return content_hash(path)
+    except OSError as e:
+        print(f"⚠️ Can't hash {path.name}: {e}")
+        return None
+
+
+def index_path_for(tracker_or_path) -> Path:
+    """Index file next to a tracker (or tracker/CSV path): <stem>.hashes.db"""
+    path = (getattr(tracker_or_path, 'db_path', None) or getattr(tracker_or_path, 'csv_path', None)
+            or getattr(tracker_or_path, 'xlsx_path', None))
+    path = Path(path or tracker_or_path)
+    return path.with_name(f"{path.stem}.hashes.db")
+
+
+class HashIndex:
+    """SQLite index of file hashes and per-platform uploads.
+
+    `files` caches the hash of each path with the size and mtime it was taken
+    at, so unchanged files are never re-read. `uploads` holds one row per
+    (hash, platform): claimed before an upload starts and completed with the
+    URL, so a duplicate under another name, or a file re-queued after a crash,
+    is recognised before any bytes are sent.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                sha256 TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                video_file TEXT NOT NULL,
+                url TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (sha256, platform)
+            )
+        """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def _cached(self, path: Path, stat: os.stat_result) -> Optional[str]:
+        record = self._connect().execute(
+            "SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (str(path),)
+        ).fetchone()
+        if record and record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns:
+            return record['sha256']
+        return None
+
+    def _store(self, entries):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                entries
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def digest(self, path: Union[str, Path]) -> str:
+        """Hash of one file, from the cache when size and mtime are unchanged"""
+        digest = self.digests([path]).get(str(path))
+        if digest is None:
+            raise FileNotFoundError(f"Can't read {path}")
+        return digest
+
+    def digests(self, paths: Iterable[Union[str, Path]], workers: Optional[int] = None) -> Dict[str, str]:
+        """Hashes of many files; stale or new ones are hashed in parallel
+
+        hashlib releases the GIL on large buffers, so threads hash on all cores
+        without the cost of shipping work to other processes. Files that can't
+        be read (e.g. deleted or renamed meanwhile) are left out of the result.
+        """
+        result, stale = {}, []
+        for path in map(Path, paths):
+            try:
+                stat = path.stat()
+            except OSError as e:
+                print(f"⚠️ Can't hash {path.name}: {e}")
+                continue
+            cached = self._cached(path, stat)
+            if cached:
+                result[str(path)] = cached
+            else:
+                stale.append((path, stat))
+        if not stale:
+            return result
+
+        workers = workers or int(os.getenv('HASH_WORKERS', os.cpu_count() or 1))
+        if len(stale) == 1 or workers == 1:
+            hashed = [_try_hash(p) for p, _ in stale]
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(stale))) as pool:
+                hashed = list(pool.map(lambda item: _try_hash(item[0]), stale))
+        done = [(p, st, sha) for (p, st), sha in zip(stale, hashed) if sha is not None]
+        self._store([(str(p), st.st_size, st.st_mtime_ns, sha) for p, st, sha in done])
+        result.update({str(p): sha for p, _, sha in done})
+        return result
+
+    def paths_with(self, sha256: str) -> List[str]:
+        """Every indexed path whose content has this hash"""
+        return [r['path'] for r in self._connect().execute(
+            "SELECT path FROM files WHERE sha256 = ?", (sha256,)
+        )]
+
+    def claim(self, sha256: str, platform: str, video_file: str) -> Optional[Dict]:
+        """Claim a hash for uploading on a platform
+
+        Returns None if the claim is ours (new, or left over from our own
+        earlier attempt), else the existing record: {'video_file', 'url'}.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            record = conn.execute(
+                "SELECT video_file, url FROM uploads WHERE sha256 = ? AND platform = ?",
+                (sha256, platform)
+            ).fetchone()
+            if record is None:
+                conn.execute(
+                    "INSERT INTO uploads (sha256, platform, video_file) VALUES (?, ?, ?)",
+                    (sha256, platform, video_file)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if record is None or (record['video_file'] == video_file and not record['url']):
+            return None
+        return dict(record)
+
+    def complete(self, sha256: str, platform: str, video_file: str, url: str):
+        """Record a finished upload"""
+        self._connect().execute(
+            "UPDATE uploads SET url = ? WHERE sha256 = ? AND platform = ? AND video_file = ?",
+            (url or '-', sha256, platform, video_file)
+        )
+
+    def release(self, sha256: str, platform: str, video_file: str):
+        """Drop a claim after a failed upload so another copy may try"""
+        self._connect().execute(
+            "DELETE FROM uploads WHERE sha256 = ? AND platform = ? AND video_file = ? AND url = ''",
+            (sha256, platform, video_file)
+        )
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class UploadGuard:
+    """Claims a job's content hash before an upload and settles it afterwards.
+
+    Used by every uploader around its upload call:
+        if not guard.begin(video_name, queue_dir): return None
+        ... upload ...
+        guard.end(video_name, success, url)
+    """
+
+    def __init__(self, tracker, platform: str):
+        self.tracker = tracker
+        self.platform = platform
+        self.index = HashIndex(index_path_for(tracker))
+        self._digests: Dict[str, str] = {}
+
+    def begin(self, video_name: str, queue_dir: Path) -> bool:
+        """False if this content is already on the platform (the job is closed out)
+        or another copy of it is being uploaded (the job stays queued)"""
+        source = Path(queue_dir) / video_name
+        if not source.exists():
+            return True
+        digest = self.index.digest(source)
+        existing = self.index.claim(digest, self.platform, video_name)
+        if existing is None:
+            self._digests[video_name] = digest
+            return True
+
+        url = existing['url'] if existing['url'] != '-' else ''
+        if existing['video_file'] == video_name:
+            # Uploaded before, but the tracker never heard about it (crash)
+            self.tracker.update_job(video_name, self.platform, 'published', url=url)
+            print(f"♻️  [{self.platform}] {video_name} already uploaded: {url or 'no URL'}")
+        elif existing['url']:
+            self.tracker.update_job(video_name, self.platform, 'skip', url=url,
+                                    error=f"Duplicate of {existing['video_file']}")
+            print(f"♻️  [{self.platform}] {video_name} is a duplicate of {existing['video_file']}, skipped")
+        else:
+            # The other copy is still uploading and may yet fail; ask again next run
+            print(f"⏳ [{self.platform}] {video_name} waits on {existing['video_file']} (same content, upload in progress)")
+        return False
+
+    def end(self, video_name: str, success: bool, url: str = ''):
+        digest = self._digests.pop(video_name, None)
+        if digest is None:
+            return
+        if success:
+            self.index.complete(digest, self.platform, video_name, url)
+        else:
+            self.index.release(digest, self.platform, video_name)
+
+    def recover(self, video_name: str, queue_dir: Path, url: str):
+        """Record an upload a crashed run finished (found on the platform since)"""
+        if self.begin(video_name, queue_dir):
+            self.end(video_name, True, url)
+        self.tracker.update_job(video_name, self.platform, 'published', url=url)
+        print(f"♻️  [{self.platform}] {video_name} was posted before the crash: {url}")
@@ -0,0 +1,286 @@
+# ═══════════════════════════════════════════════════════════════
+# Job Leases
+# Lets several orchestrators (on one box or many) share a queue
+# and tracker without two of them uploading the same job
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import time
+import uuid
+import socket
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# A lease lapses this long after its worker's last heartbeat
+LEASE_SECONDS = float(os.getenv('LEASE_SECONDS', '120'))
+# Identifies this worker in the tracker; must differ between running workers
+WORKER_ID = os.getenv('WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+# Folder in the queue holding the lease files
+LEASE_DIR = '.leases'
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # os.kill() would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # Access denied: it exists
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def worker_gone(owner: str) -> bool:
+    """True if `owner` is a default-named worker on this host whose process has exited.
+
+    Workers on other hosts (or with a custom WORKER_ID) can't be checked;
+    their leases are trusted until they lapse.
+    """
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    return not _pid_alive(int(pid))
+
+
+class LeaseFiles:
+    """Job leases as files in a folder every worker reaches (the shared queue).
+
+    A lease is `<root>/<platform>/<video file>.lease`, created with O_EXCL so
+    only one worker can make it, and its mtime is the heartbeat. Every time
+    involved is set by the file server (utime without a time) and compared
+    with a probe file touched on the same share, so the workers' clocks never
+    need to agree. A lapsed lease is removed under a `.break` lock file, so
+    two workers can't both take it over.
+    """
+
+    def __init__(self, root: Union[str, Path], owner: str, ttl: float):
+        self.root = Path(root)
+        self.owner = owner
+        self.ttl = ttl
+        self._held: Dict[Tuple[str, str], Tuple[Path, str]] = {}
+        self._probe = self.root / ('.clock-' + ''.join(c if c.isalnum() else '_' for c in owner))
+
+    def now(self) -> float:
+        """Current time on the file server holding the leases"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self._probe, 'a'):
+            pass
+        os.utime(self._probe, None)
+        return os.stat(self._probe).st_mtime
+
+    def _path(self, video_file: str, platform: str) -> Path:
+        return self.root / platform / f"{video_file}.lease"
+
+    @staticmethod
+    def _read(path: Path) -> Optional[Tuple[str, str, float]]:
+        """(owner, token, mtime) of a lease file; None if there is none"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                token = f.read()
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        return token.split('\n', 1)[0], token, mtime
+
+    def _create(self, path: Path) -> Optional[str]:
+        """Make the lease file if there is none; returns its token"""
+        token = f"{self.owner}\n{uuid.uuid4().hex}\n"
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(token)
+        return token
+
+    def _break(self, path: Path, lease: Tuple[str, str, float]) -> bool:
+        """Remove a lapsed lease, unless another worker is at it or it was renewed"""
+        lock = path.with_name(path.name + '.break')
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            # A worker that died while breaking leaves its lock; it lapses like a lease
+            try:
+                if os.stat(lock).st_mtime + self.ttl < self.now():
+                    os.unlink(lock)
+            except FileNotFoundError:
+                pass
+            return False
+        try:
+            current = self._read(path)
+            if current is not None and current != lease:
+                return False
+            if current is not None:
+                os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return True
+        finally:
+            os.unlink(lock)
+
+    def acquire(self, video_file: str, platform: str) -> bool:
+        """True if the lease file is ours (made now, or taken over from a lost worker)"""
+        key = (video_file, platform)
+        if key in self._held:
+            return True
+        path = self._path(video_file, platform)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        token = self._create(path)
+        if token is None:
+            lease = self._read(path)
+            if lease is not None:
+                owner, _, mtime = lease
+                if mtime + self.ttl >= self.now() and not worker_gone(owner):
+                    return False
+                if not self._break(path, lease):
+                    return False
+            token = self._create(path)
+            if token is None:
+                return False
+        self._held[key] = (path, token)
+        return True
+
+    def release(self, video_file: str, platform: str):
+        held = self._held.pop((video_file, platform), None)
+        if held is None:
+            return
+        path, token = held
+        lease = self._read(path)
+        if lease is not None and lease[1] == token:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def release_all(self):
+        for video_file, platform in list(self._held):
+            self.release(video_file, platform)
+
+    def renew(self, keep: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Touch the leases in `keep` and drop the rest (their jobs are settled).
+        Returns the leases another worker took over meanwhile."""
+        keep, lost = set(keep), []
+        for key, (path, token) in list(self._held.items()):
+            if key not in keep:
+                self.release(*key)
+                continue
+            lease = self._read(path)
+            if lease is None or lease[1] != token:
+                del self._held[key]
+                lost.append(key)
+                continue
+            os.utime(path, None)
+        return lost
+
+    def close(self):
+        self.release_all()
+        try:
+            os.unlink(self._probe)
+        except FileNotFoundError:
+            pass
+
+
+class LeaseKeeper:
+    """This worker's job leases.
+
+    claim() leases a job right before it is uploaded; only one worker can
+    hold a live lease, and only `new` jobs can be leased, so a job finished
+    elsewhere is never picked up again. A heartbeat thread renews every
+    lease we hold each ttl/3 seconds, so leases only lapse when their worker
+    is gone (crash, kill, lost network) and are then claimed by whoever gets
+    to the job next. A lease held by a crashed worker on this host is taken
+    over right away, without waiting for it to lapse.
+
+    With `lease_dir` (a folder on the shared queue) each lease is also a
+    LeaseFiles file, which is what decides between workers on different
+    machines; the tracker lease then only tells `status` who is uploading.
+    """
+
+    def __init__(self, tracker, owner: str = WORKER_ID, ttl: float = LEASE_SECONDS,
+                 lease_dir: Optional[Union[str, Path]] = None):
+        self.tracker = tracker
+        self.owner = owner
+        self.ttl = ttl
+        self.files = LeaseFiles(lease_dir, owner, ttl) if lease_dir is not None else None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._heartbeat, name='lease-heartbeat', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the heartbeat and hand back every job still leased"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.release_all()
+        if self.files:
+            self.files.close()
+
+    def claim(self, video_file: str, platform: str, status: str = 'new') -> bool:
+        """True if the job is ours to work on now"""
+        with self._lock:
+            if self.files and not self.files.acquire(video_file, platform):
+                return False
+            job = self.tracker.get_job(video_file, platform) or {}
+            previous = job.get('lease_owner')
+            # Holding the lease file, any other tracker lease is left over from a lost worker
+            if previous and previous != self.owner and (self.files or (
+                    job.get('lease_expires', 0) >= time.time() and worker_gone(previous))):
+                self.tracker.release_jobs(previous, video_file, platform)
+            if not self.tracker.claim_job(video_file, platform, self.owner, self.ttl, status):
+                if self.files:
+                    self.files.release(video_file, platform)
+                return False
+        if previous and previous != self.owner:
+            print(f"♻️  [{platform}] {video_file}: {previous} is gone, taking over")
+        return True
+    
+    def held(self, video_file: str, platform: str) -> bool:
+        """True if this worker holds a live lease on the job"""
+        job = self.tracker.get_job(video_file, platform) or {}
+        return job.get('lease_owner') == self.owner and job.get('lease_expires', 0) >= time.time()
+
+    def release(self, video_file: str, platform: str):
+        """Hand a job back without a result (e.g. deferred); update_job() also ends a lease"""
+        with self._lock:
+            self.tracker.release_jobs(self.owner, video_file, platform)
+            if self.files:
+                self.files.release(video_file, platform)
+
+    def release_all(self):
+        with self._lock:
+            self.tracker.release_jobs(self.owner)
+            if self.files:
+                self.files.release_all()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                with self._lock:
+                    self.tracker.renew_leases(self.owner, self.ttl)
+                    if self.files:
+                        # update_job() ended the tracker lease of every settled job
+                        held = [(lease['video_file'], lease['platform']) for lease in self.tracker.leases()
+                                if lease['lease_owner'] == self.owner]
+                        for video_file, platform in self.files.renew(held):
+                            print(f"⚠️ [{platform}] {video_file}: lease taken over by another worker")
+            except Exception as e:
+                # Leases last ttl, so one missed beat costs nothing
+                print(f"⚠️ Lease heartbeat failed: {e}")
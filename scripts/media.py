@@ -0,0 +1,321 @@
+# ═══════════════════════════════════════════════════════════════
+# Media Preparation
+# ffprobe each queued file once, then transcode/remux copies that
+# fit each platform's limits, in a process pool ahead of uploads
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import json
+import shutil
+import asyncio
+import hashlib
+import mimetypes
+import subprocess
+from pathlib import Path
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from hashindex import content_hash
+
+PREPARED_DIR = 'videos_prepared'
+PROBE_CACHE_DIR = '.probe_cache'
+
+# What each platform accepts without re-encoding. Resolution limits are
+# (long side, short side) so portrait and landscape are treated alike.
+PLATFORM_SPECS = {
+    'instagram': {
+        'containers': {'.mp4', '.mov'},
+        'video_codecs': {'h264', 'hevc'},
+        'audio_codecs': {'aac'},
+        'max_long_side': 1920,
+        'max_short_side': 1080,
+        'max_duration': 900,
+        'max_bitrate': 25_000_000,
+    },
+    'youtube': {
+        'containers': {'.mp4', '.mov', '.avi', '.mkv', '.webm'},
+        'video_codecs': {'h264', 'hevc', 'vp9', 'av1', 'mpeg4'},
+        'audio_codecs': {'aac', 'mp3', 'opus', 'vorbis', 'ac3'},
+        'max_long_side': 7680,
+        'max_short_side': 4320,
+        'max_duration': 12 * 3600,
+        'max_bitrate': 0,  # No limit
+    },
+    'tiktok': {
+        'containers': {'.mp4', '.mov'},
+        'video_codecs': {'h264', 'hevc'},
+        'audio_codecs': {'aac'},
+        'max_long_side': 1920,
+        'max_short_side': 1080,
+        'max_duration': 600,
+        'max_bitrate': 20_000_000,
+    },
+}
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+# Container MIME types the YouTube API expects for each extension
+MIME_TYPES = {
+    '.mp4': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.avi': 'video/x-msvideo',
+    '.mkv': 'video/x-matroska',
+    '.webm': 'video/webm',
+}
+
+
+def mimetype_for(path: Path) -> str:
+    """MIME type of a video file, from its extension"""
+    ext = path.suffix.lower()
+    return MIME_TYPES.get(ext) or mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+
+def ffmpeg_available() -> bool:
+    return bool(shutil.which('ffprobe') and shutil.which('ffmpeg'))
+
+
+def probe(path: Path) -> Dict:
+    """Duration, resolution, codecs and bitrate of a video, via ffprobe"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', str(path)],
+        capture_output=True, text=True, check=True
+    )
+    data = json.loads(result.stdout)
+    streams = data.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), {})
+    fmt = data.get('format', {})
+    return {
+        'duration': float(fmt.get('duration') or video.get('duration') or 0),
+        'width': int(video.get('width') or 0),
+        'height': int(video.get('height') or 0),
+        'video_codec': video.get('codec_name', ''),
+        'audio_codec': audio.get('codec_name', ''),
+        'bitrate': int(fmt.get('bit_rate') or 0),
+    }
+
+
+def cached_probe(path: Path, digest: str, cache_dir: Path) -> Dict:
+    """probe(), cached per content hash (one small JSON file per video)"""
+    cache_file = cache_dir / f"{digest}.json"
+    if cache_file.exists():
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    info = probe(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    os.replace(tmp, cache_file)
+    return info
+
+
+def problems(info: Dict, spec: Dict, ext: str) -> List[str]:
+    """Ways a probed file breaks a platform spec (empty if it is fine as is)"""
+    found = []
+    if ext.lower() not in spec['containers']:
+        found.append(f"container {ext}")
+    if info['video_codec'] not in spec['video_codecs']:
+        found.append(f"video codec {info['video_codec'] or 'none'}")
+    if info['audio_codec'] and info['audio_codec'] not in spec['audio_codecs']:
+        found.append(f"audio codec {info['audio_codec']}")
+    long_side, short_side = max(info['width'], info['height']), min(info['width'], info['height'])
+    if long_side > spec['max_long_side'] or short_side > spec['max_short_side']:
+        found.append(f"resolution {info['width']}x{info['height']}")
+    if info['duration'] > spec['max_duration']:
+        found.append(f"duration {info['duration']:.0f}s")
+    if spec['max_bitrate'] and info['bitrate'] > spec['max_bitrate']:
+        found.append(f"bitrate {info['bitrate'] // 1000} kb/s")
+    return found
+
+
+def ffmpeg_args(info: Dict, spec: Dict, ext: str) -> Optional[List[str]]:
+    """ffmpeg output options that make the file fit `spec`, or None if it already does
+
+    Streams that are already fine are copied, so a wrong container alone is
+    a cheap remux rather than a re-encode.
+    """
+    found = problems(info, spec, ext)
+    if not found:
+        return None
+
+    args = []
+    if info['duration'] > spec['max_duration']:
+        args += ['-t', str(spec['max_duration'])]
+
+    reencode_video = any(p.startswith(('video codec', 'resolution', 'bitrate')) for p in found)
+    if reencode_video:
+        if info['width'] >= info['height']:
+            box = (spec['max_long_side'], spec['max_short_side'])
+        else:
+            box = (spec['max_short_side'], spec['max_long_side'])
+        args += [
+            '-vf', f"scale='min({box[0]},iw)':'min({box[1]},ih)':force_original_aspect_ratio=decrease,"
+                   "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+            '-c:v', 'libx264', '-preset', 'medium', '-crf', '20', '-pix_fmt', 'yuv420p',
+        ]
+        if spec['max_bitrate']:
+            rate = int(spec['max_bitrate'] * 0.9)
+            args += ['-maxrate', str(rate), '-bufsize', str(rate * 2)]
+    else:
+        args += ['-c:v', 'copy']
+
+    if not info['audio_codec']:
+        args += ['-an']
+    elif any(p.startswith('audio codec') for p in found):
+        args += ['-c:a', 'aac', '-b:a', '128k']
+    else:
+        args += ['-c:a', 'copy']
+
+    return args + ['-movflags', '+faststart']
+
+
+def _transcode(source: Path, args: List[str], target: Path) -> str:
+    """Write `target` with ffmpeg unless it already exists; returns an error or ''"""
+    if target.exists():
+        return ''
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.stem}.part.mp4")
+    result = subprocess.run(
+        ['ffmpeg', '-y', '-v', 'error', '-i', str(source), *args, str(tmp)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return f"Transcode failed: {result.stderr.strip()[-80:]}"
+    os.replace(tmp, target)
+    return ''
+
+
+def prepare_file(path: str, platforms: List[str], out_dir: str, cache_dir: str,
+                 digest: str = '') -> Dict:
+    """Probe one video and write a compliant copy for each platform that needs one
+
+    Runs in a worker process. Platforms whose settings come out the same share
+    one output file, and outputs that already exist are reused.
+    Returns {'files': {platform: prepared path or ''}, 'errors': {platform: message}}.
+    """
+    source = Path(path)
+    digest = digest or content_hash(source)
+    info = cached_probe(source, digest, Path(cache_dir))
+
+    files, errors, done = {}, {}, {}
+    for platform in platforms:
+        spec = PLATFORM_SPECS[platform]
+        args = ffmpeg_args(info, spec, source.suffix)
+        if args is None:
+            files[platform] = ''
+            continue
+        signature = hashlib.sha1((digest + ' '.join(args)).encode()).hexdigest()[:10]
+        target = Path(out_dir) / f"{source.stem}.{signature}.mp4"
+        if signature not in done:
+            print(f"🎞️  [Media] {source.name} for {platform}: "
+                  f"{', '.join(problems(info, spec, source.suffix))}")
+            done[signature] = _transcode(source, args, target)
+        if done[signature]:
+            errors[platform] = done[signature]
+        else:
+            files[platform] = str(target)
+    return {'files': files, 'errors': errors}
+
+
+def upload_path(tracker, video_name: str, platform: str, queue_dir: Path) -> Path:
+    """File to upload for a job: its prepared copy if there is one, else the original"""
+    job = tracker.get_job(video_name, platform) or {}
+    prepared = job.get('media_file')
+    if prepared and Path(prepared).exists():
+        return Path(prepared)
+    return queue_dir / video_name
+
+
+class MediaPreparer:
+    """Runs prepare_file() for queued videos in a process pool.
+
+    Everything is submitted up front in queue order, so while video N is
+    uploading the pool is already preparing N+1 and later. Uploaders wait on
+    `ready()` (or iterate `iter_ready()`) before touching a file.
+    """
+
+    def __init__(self, tracker, queue_dir: Path, workers: Optional[int] = None):
+        self.tracker = tracker
+        self.queue_dir = Path(queue_dir)
+        self.out_dir = self.queue_dir.parent / PREPARED_DIR
+        self.cache_dir = self.queue_dir.parent / PROBE_CACHE_DIR
+        # ffmpeg is multi-threaded itself, so half the cores is plenty
+        self.workers = workers or int(os.getenv('MEDIA_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+        self.enabled = ffmpeg_available()
+        self._pool = None
+        self._warned = False
+        self._futures: Dict[str, Future] = {}
+        self._recorded = set()
+
+    def submit(self, jobs: Dict[str, List[str]], digests: Optional[Dict[str, str]] = None):
+        """Start preparing {video_file: [platforms]} in the background
+
+        `digests` ({path: sha256}, e.g. from the hash index) saves re-hashing.
+        """
+        digests = digests or {}
+        if not self.enabled:
+            if not self._warned:
+                print("⚠️ [Media] ffmpeg/ffprobe not found, uploading files as they are\n")
+                self._warned = True
+            return
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        submitted = 0
+        for video_file, platforms in jobs.items():
+            path = self.queue_dir / video_file
+            if video_file in self._futures or not path.exists():
+                continue
+            self._futures[video_file] = self._pool.submit(
+                prepare_file, str(path), platforms, str(self.out_dir), str(self.cache_dir),
+                digests.get(str(path), '')
+            )
+            submitted += 1
+        if submitted:
+            print(f"🎞️  [Media] Preparing {submitted} video(s) with {self.workers} worker(s)\n")
+
+    def _record(self, video_file: str, platform: str, result: Optional[Dict], error: str) -> bool:
+        """Store the outcome on the job; False if the job cannot be uploaded"""
+        key = (video_file, platform)
+        if error or platform in (result or {}).get('errors', {}):
+            message = error or result['errors'][platform]
+            if key not in self._recorded:
+                self.tracker.update_job(video_file, platform, 'error', error=message[:100])
+                print(f"❌ [Media] {video_file} ({platform}): {message}")
+            self._recorded.add(key)
+            return False
+        if key not in self._recorded and result:
+            self.tracker.set_job_fields(video_file, platform,
+                                        {'media_file': result['files'].get(platform, '')})
+        self._recorded.add(key)
+        return True
+
+    def ready(self, video_file: str, platform: str) -> bool:
+        """Block until a video is prepared; False if it failed for this platform"""
+        future = self._futures.get(video_file)
+        if future is None:
+            return True
+        try:
+            return self._record(video_file, platform, future.result(), '')
+        except Exception as e:
+            return self._record(video_file, platform, None, f"Media probe failed: {e}")
+
+    async def ready_async(self, video_file: str, platform: str) -> bool:
+        future = self._futures.get(video_file)
+        if future is None:
+            return True
+        try:
+            result = await asyncio.wrap_future(future)
+            return self._record(video_file, platform, result, '')
+        except Exception as e:
+            return self._record(video_file, platform, None, f"Media probe failed: {e}")
+
+    def iter_ready(self, rows: Iterable[Dict], platform: str):
+        """Yield rows as their files become ready, skipping ones that failed"""
+        for row in rows:
+            if self.ready(row['Video File'], platform):
+                yield row
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,164 @@
+# ═══════════════════════════════════════════════════════════════
+# Upload Metrics
+# Spans per upload stage (duration, bytes, MB/s), exported as
+# JSONL and a Prometheus textfile, with p50/p95 for the summary
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import json
+import math
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+METRICS_DIR = os.getenv('METRICS_DIR', 'metrics')
+JSONL_FILE = 'uploads.jsonl'      # One line per span, appended
+PROM_FILE = 'uploader.prom'       # node_exporter textfile collector format
+QUANTILES = (0.5, 0.95)
+
+
+class Span:
+    """One timed stage; set `bytes` (and `ok`) while it runs"""
+
+    __slots__ = ('platform', 'stage', 'video', 'account', 'bytes', 'ok', 'seconds')
+
+    def __init__(self, platform: str, stage: str, video: str = '', account: str = '', nbytes: int = 0):
+        self.platform = platform
+        self.stage = stage
+        self.video = video
+        self.account = account
+        self.bytes = nbytes
+        self.ok = True
+        self.seconds = 0.0
+
+    @property
+    def mbps(self) -> float:
+        return self.bytes / (1024 * 1024) / self.seconds if self.bytes and self.seconds > 0 else 0.0
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of unsorted values (0 if empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class Metrics:
+    """Thread-safe store of finished spans.
+
+    Durations are kept per (platform, stage) for percentiles; the full spans
+    wait in memory until export() appends them to the JSONL file.
+    """
+
+    def __init__(self, directory: str = METRICS_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._pending: List[Dict] = []
+        self._seconds: Dict[Tuple[str, str], List[float]] = {}
+        self._bytes: Dict[Tuple[str, str], int] = {}
+        self._failures: Dict[Tuple[str, str], int] = {}
+
+    @contextmanager
+    def span(self, platform: str, stage: str, video: str = '', account: str = '', nbytes: int = 0):
+        """Time a stage: `with METRICS.span('youtube', 'upload', name) as s: ...`
+
+        An exception marks the span failed and is re-raised.
+        """
+        span = Span(platform, stage, video, account, nbytes)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.ok = False
+            raise
+        finally:
+            span.seconds = time.perf_counter() - started
+            self.add(span)
+
+    def add(self, span: Span):
+        key = (span.platform, span.stage)
+        with self._lock:
+            self._seconds.setdefault(key, []).append(span.seconds)
+            self._bytes[key] = self._bytes.get(key, 0) + span.bytes
+            if not span.ok:
+                self._failures[key] = self._failures.get(key, 0) + 1
+            self._pending.append({
+                'ts': datetime.now().isoformat(timespec='milliseconds'),
+                'platform': span.platform,
+                'stage': span.stage,
+                'video': span.video,
+                'account': span.account,
+                'seconds': round(span.seconds, 3),
+                'bytes': span.bytes,
+                'mbps': round(span.mbps, 3),
+                'ok': span.ok,
+            })
+
+    def values(self, platform: str, stage: str) -> List[float]:
+        """Every recorded duration of a stage, in seconds"""
+        with self._lock:
+            return list(self._seconds.get((platform, stage), ()))
+
+    def latency(self, platform: str, stage: str) -> Optional[Dict[str, float]]:
+        """{'count', 'p50', 'p95'} for a stage, None if it never ran"""
+        values = self.values(platform, stage)
+        if not values:
+            return None
+        return {'count': len(values), 'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95)}
+
+    def stages(self, platform: str) -> List[str]:
+        with self._lock:
+            return [stage for p, stage in self._seconds if p == platform]
+
+    def export(self):
+        """Append new spans to the JSONL file and rewrite the Prometheus textfile"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            seconds = {key: list(values) for key, values in self._seconds.items()}
+            nbytes = dict(self._bytes)
+            failures = dict(self._failures)
+        if not seconds:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        if pending:
+            with open(self.directory / JSONL_FILE, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in pending))
+
+        lines = [
+            '# HELP uploader_stage_seconds Time spent in each upload stage',
+            '# TYPE uploader_stage_seconds summary',
+        ]
+        for (platform, stage), values in sorted(seconds.items()):
+            labels = f'platform="{platform}",stage="{stage}"'
+            for q in QUANTILES:
+                lines.append(f'uploader_stage_seconds{{{labels},quantile="{q}"}} {percentile(values, q):.3f}')
+            lines.append(f'uploader_stage_seconds_sum{{{labels}}} {sum(values):.3f}')
+            lines.append(f'uploader_stage_seconds_count{{{labels}}} {len(values)}')
+        lines += [
+            '# HELP uploader_stage_bytes_total Bytes handled in each upload stage',
+            '# TYPE uploader_stage_bytes_total counter',
+        ]
+        lines += [f'uploader_stage_bytes_total{{platform="{p}",stage="{s}"}} {n}'
+                  for (p, s), n in sorted(nbytes.items()) if n]
+        lines += [
+            '# HELP uploader_stage_failures_total Upload stages that ended in an error',
+            '# TYPE uploader_stage_failures_total counter',
+        ]
+        lines += [f'uploader_stage_failures_total{{platform="{p}",stage="{s}"}} {failures.get((p, s), 0)}'
+                  for p, s in sorted(seconds)]
+
+        # Swap the file in whole, so the collector never reads half of it
+        path = self.directory / PROM_FILE
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+
+# Shared by every uploader in the process
+METRICS = Metrics()
@@ -3,19 +3,73 @@
 # Main coordinator for Instagram, YouTube, TikTok
 # ═══════════════════════════════════════════════════════════════
 
+import os
 import csv
+import sys
 import time
 import asyncio
+import argparse
+import importlib
+import subprocess
 from pathlib import Path
+from collections import Counter
 from datetime import datetime
-from uploader_ig import InstagramUploader
-from uploader_yt import YouTubeUploader
-from uploader_tt import TikTokUploader
+from typing import List, Optional
+from tracker import open_tracker, DEFAULT_DB_PATH, PLATFORMS, STATUS_FIELDS
+from accounts import get_registry
+from media import MediaPreparer, VIDEO_EXTENSIONS
+from hashindex import HashIndex, index_path_for
+from daemon import UploadDaemon
+from scheduler import PublishScheduler
+from metrics import METRICS
+from generate_csv import generate_csv
+from leases import LEASE_DIR, LeaseKeeper
+
+# Imported on first use: instagrapi, googleapiclient and playwright take
+# hundreds of milliseconds (and their memory) to load, so a run only pays for
+# the platforms it actually uploads to
+UPLOADERS = {
+    'instagram': 'uploader_ig.InstagramUploader',
+    'youtube': 'uploader_yt.YouTubeUploader',
+    'tiktok': 'uploader_tt.TikTokUploader',
+}
+PLATFORM_ALIASES = {'ig': 'instagram', 'yt': 'youtube', 'tt': 'tiktok'}
+PLATFORM_EMOJI = {'instagram': '📸', 'youtube': '📺', 'tiktok': '🎵'}
+MODES = ('sequential', 'parallel', 'daemon')
+
+
+def uploader_class(platform: str):
+    """The uploader class for a platform, importing its module the first time"""
+    uploader = UPLOADERS[platform]
+    if isinstance(uploader, str):
+        module, _, name = uploader.rpartition('.')
+        uploader = UPLOADERS[platform] = getattr(importlib.import_module(module), name)
+    return uploader
+
+
+def parse_platforms(value: str) -> List[str]:
+    """'yt,ig' -> ['instagram', 'youtube'] (always in PLATFORMS order)"""
+    names = {PLATFORM_ALIASES.get(name, name) for name in value.lower().replace(' ', '').split(',') if name}
+    unknown = names - set(PLATFORMS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown platform: {', '.join(sorted(unknown))} "
+                                         f"(use {', '.join(PLATFORMS)} or ig, yt, tt)")
+    return [platform for platform in PLATFORMS if platform in names]
+
 
 class Orchestrator:
-    def __init__(self, csv_path: str = 'upload_tracker.csv', queue_dir: str = 'videos_queue'):
+    def __init__(self, csv_path: str = 'upload_tracker.csv', queue_dir: str = 'videos_queue',
+                 tracker_path: str = DEFAULT_DB_PATH, platforms: Optional[List[str]] = None):
         self.csv_path = Path(csv_path)
         self.queue_dir = Path(queue_dir)
+        self.tracker_path = Path(tracker_path)
+        self.platforms = list(platforms or PLATFORMS)
+        self.tracker = None
+        self.preparer = None
+        self.leases = None
+        # Worker pool size per account (instagrapi clients are not thread-safe,
+        # so keep Instagram at 1; TikTok uses its TIKTOK_CONCURRENCY instead)
+        self.workers = {'instagram': 1, 'youtube': 1}
         self.stats = {
             'instagram': {'posted': 0, 'failed': 0},
             'youtube': {'posted': 0, 'failed': 0},
@@ -36,6 +90,7 @@ class Orchestrator:
                 'Caption': 'This place will disappear in 5 years\n\nWhile you\'re reading this — nobody\'s there...',
                 'Description': 'Cinematic travel video from Bali',
                 'Tags': 'travel,viral,nature,bali,cinematic',
+                'Publish Date': '',
                 'Status': 'new',
                 'Instagram URL': '',
                 'YouTube URL': '',
@@ -57,61 +112,194 @@ class Orchestrator:
         self.queue_dir.mkdir(exist_ok=True)
         print(f"✅ Directory ready: {self.queue_dir}\n")
     
+    def _shards(self, platform: str, status: str = 'new', **filters):
+        """(account, rows) pairs splitting a platform's jobs in `status` across its accounts
+
+        `filters` go to tracker.jobs() (include_deferred, include_leased).
+        """
+        registry = get_registry()
+        for name, rows in registry.shard(platform, self.tracker.jobs(platform, status, **filters)).items():
+            account = registry.get(platform, name)
+            if account is None:
+                for row in rows:
+                    self.tracker.update_job(row['Video File'], platform, 'error',
+                                            error=f"Unknown account '{name}'")
+                self.stats[platform]['failed'] += len(rows)
+                print(f"❌ [{platform}] {len(rows)} job(s) for unknown account '{name}'")
+                continue
+            if rows:
+                yield account, rows
+    
+    def _pending_media(self) -> dict:
+        """{video_file: [platforms]} for every job about to be uploaded, in queue order"""
+        pending = {}
+        for platform in self.platforms:
+            for row in self.tracker.jobs(platform, 'new'):
+                pending.setdefault(row['Video File'], []).append(platform)
+        return pending
+    
     def run_sequential(self):
         """Run uploaders sequentially (safer, one at a time)"""
         print("\n" + "="*70)
         print("🚀 RUNNING SEQUENTIAL UPLOAD")
         print("="*70 + "\n")
         
-        # Instagram
-        print("\n[1/3] INSTAGRAM\n")
-        ig = InstagramUploader(self.csv_path)
-        posted = ig.process_videos(self.queue_dir)
-        self.stats['instagram']['posted'] = posted
-        time.sleep(5)
-        
-        # YouTube
-        print("\n[2/3] YOUTUBE\n")
-        yt = YouTubeUploader(self.csv_path)
-        posted = yt.process_videos(self.queue_dir)
-        self.stats['youtube']['posted'] = posted
-        time.sleep(5)
-        
-        # TikTok
-        print("\n[3/3] TIKTOK\n")
-        tt = TikTokUploader(self.csv_path)
-        posted = asyncio.run(tt.process_videos(self.queue_dir))
-        self.stats['tiktok']['posted'] = posted
+        for i, platform in enumerate(self.platforms, 1):
+            print(f"\n[{i}/{len(self.platforms)}] {platform.upper()}\n")
+            for account, rows in self._shards(platform):
+                uploader = self._new_uploader(platform, account)
+                # Each row waits for its own file only, so later videos keep
+                # preparing while earlier ones upload
+                ready = self._claimed(self.preparer.iter_ready(rows, platform), platform)
+                try:
+                    if platform == 'tiktok':
+                        posted = asyncio.run(uploader.process_videos(self.queue_dir, ready))
+                    else:
+                        posted = uploader.process_videos(self.queue_dir, ready)
+                finally:
+                    # Deferred jobs have no result that would end their lease
+                    self.leases.release_all()
+                self.stats[platform]['posted'] += posted
+                self.stats[platform]['failed'] += sum(
+                    1 for row in rows
+                    if (self.tracker.get_job(row['Video File'], platform) or {}).get('status') == 'error'
+                )
+    
+    def reconcile(self):
+        """Settle jobs a crashed run left `uploading`, before anything is uploaded
+        
+        Each uploader checks the platform: jobs it finds posted are marked
+        published, jobs surely not posted go back to `new`. Deferred jobs are
+        checked too. Jobs this worker is uploading, or another live worker
+        holds a lease on, are left alone; a crashed worker's leases are taken
+        over (see LeaseKeeper.claim). The daemon re-runs this as leases lapse.
+        """
+        for platform in self.platforms:
+            for account, rows in self._shards(platform, 'uploading', include_deferred=True, include_leased=True):
+                rows = [row for row in rows
+                        if not self.leases.held(row['Video File'], platform)
+                        and self.leases.claim(row['Video File'], platform, 'uploading')]
+                if not rows:
+                    continue
+                print(f"🔎 [{platform}:{account.name}] {len(rows)} upload(s) interrupted, checking...")
+                try:
+                    self._new_uploader(platform, account).reconcile(rows, self.queue_dir)
+                except Exception as e:
+                    print(f"❌ [{platform}] Reconcile failed, checking again later: {e}\n")
+                finally:
+                    # Settled jobs already ended their lease; hand back the rest
+                    for row in rows:
+                        self.leases.release(row['Video File'], platform)
+    
+    def _claimed(self, rows, platform: str):
+        """The rows this worker wins a lease on (others are uploading the rest)"""
+        for row in rows:
+            if self.leases.claim(row['Video File'], platform):
+                yield row
+    
+    def _new_uploader(self, platform: str, account):
+        return uploader_class(platform)(self.tracker, account)
+    
+    @staticmethod
+    async def _start_uploader(uploader) -> bool:
+        """Log in / warm up one uploader"""
+        if uploader.platform == 'instagram':
+            return await asyncio.to_thread(uploader.connect)
+        if uploader.platform == 'youtube':
+            return await asyncio.to_thread(uploader.authenticate)
+        return await uploader.start()
+    
+    @staticmethod
+    async def _stop_uploader(uploader):
+        if uploader.platform == 'instagram':
+            await asyncio.to_thread(uploader.disconnect)
+        elif uploader.platform == 'youtube':
+            uploader.close()
+        elif uploader.platform == 'tiktok':
+            await uploader.stop()
+    
+    async def _run_job(self, platform: str, uploader, row: dict):
+        """Lease a job, wait for its media, upload it and count the outcome"""
+        if not await asyncio.to_thread(self.leases.claim, row['Video File'], platform):
+            # Another worker took it (or finished it) since the queue was read
+            return
+        try:
+            await self._upload_job(platform, uploader, row)
+        finally:
+            await asyncio.to_thread(self.leases.release, row['Video File'], platform)
+    
+    async def _upload_job(self, platform: str, uploader, row: dict):
+        with METRICS.span(platform, 'media_wait', row['Video File'], uploader.account.name) as span:
+            span.ok = await self.preparer.ready_async(row['Video File'], platform)
+        if not span.ok:
+            self.stats[platform]['failed'] += 1
+            return
+        
+        try:
+            if asyncio.iscoroutinefunction(uploader.process_job):
+                success = await uploader.process_job(row, self.queue_dir)
+            else:
+                success = await asyncio.to_thread(uploader.process_job, row, self.queue_dir)
+        except Exception as e:
+            print(f"❌ [{platform}] {row.get('Video File')}: {e}\n")
+            success = False
+        
+        # None means deferred (e.g. out of quota): neither posted nor failed
+        if success is not None:
+            self.stats[platform]['posted' if success else 'failed'] += 1
+    
+    async def _platform_worker(self, platform: str, uploader, queue: asyncio.Queue):
+        """Pull jobs for one platform until its queue is drained"""
+        while True:
+            try:
+                row = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await self._run_job(platform, uploader, row)
     
     async def run_parallel(self):
-        """Run uploaders in parallel (faster but needs more resources)"""
+        """Run uploads in parallel (faster but needs more resources)
+        
+        Every tracker row is split into one job per platform, and each platform's
+        jobs are sharded across its accounts. Each (platform, account) has its
+        own worker pool pulling from its own queue, so a video goes to all three
+        platforms at the same time and the slowest platform sets the pace.
+        """
         print("\n" + "="*70)
         print("🚀 RUNNING PARALLEL UPLOAD")
         print("="*70 + "\n")
         
-        # Instagram (sync)
-        print("[1/3] INSTAGRAM\n")
-        ig = InstagramUploader(self.csv_path)
-        ig_task = asyncio.to_thread(ig.process_videos, self.queue_dir)
-        
-        # YouTube (sync)
-        print("[2/3] YOUTUBE\n")
-        yt = YouTubeUploader(self.csv_path)
-        yt_task = asyncio.to_thread(yt.process_videos, self.queue_dir)
+        # One uploader per (platform, account), each with its own shard of jobs
+        shards = [
+            (platform, self._new_uploader(platform, account), rows)
+            for platform in self.platforms
+            for account, rows in self._shards(platform)
+        ]
         
-        # TikTok (async)
-        print("[3/3] TIKTOK\n")
-        tt = TikTokUploader(self.csv_path)
-        tt_task = tt.process_videos(self.queue_dir)
+        # Log in everywhere at once (TikTok keeps one browser per account for the run)
+        ready = await asyncio.gather(*(self._start_uploader(u) for _, u, _ in shards))
         
-        # Run all
-        ig_posted, yt_posted, tt_posted = await asyncio.gather(
-            ig_task, yt_task, tt_task
-        )
+        workers = []
+        for (platform, uploader, rows), ok in zip(shards, ready):
+            if not ok:
+                continue
+            queue = asyncio.Queue()
+            for row in rows:
+                queue.put_nowait(row)
+            print(f"📋 [{platform}:{uploader.account.name}] {queue.qsize()} job(s) queued")
+            size = uploader.concurrency if platform == 'tiktok' else self.workers[platform]
+            workers.extend(
+                self._platform_worker(platform, uploader, queue)
+                for _ in range(size)
+            )
+        print()
         
-        self.stats['instagram']['posted'] = ig_posted
-        self.stats['youtube']['posted'] = yt_posted
-        self.stats['tiktok']['posted'] = tt_posted
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            await asyncio.gather(*(
+                self._stop_uploader(u) for (_, u, _), ok in zip(shards, ready) if ok
+            ))
     
     def print_summary(self):
         """Print final summary"""
@@ -120,16 +308,77 @@ class Orchestrator:
         print("="*70)
         
         total_posted = 0
-        for platform, data in self.stats.items():
+        for platform in self.platforms:
+            data = self.stats[platform]
             posted = data['posted']
             total_posted += posted
-            emoji = '📸' if platform == 'instagram' else '📺' if platform == 'youtube' else '🎵'
-            print(f"{emoji} {platform.upper():12} ✅ {posted} posted")
+            line = f"{PLATFORM_EMOJI[platform]} {platform.upper():12} ✅ {posted} posted  ❌ {data['failed']} failed"
+            latency = METRICS.latency(platform, 'upload')
+            if latency:
+                line += f"  ⏱️ p50 {latency['p50']:.1f}s / p95 {latency['p95']:.1f}s"
+            print(line)
+        
+        # Where the time went: every measured stage per platform
+        stage_lines = []
+        for platform in self.platforms:
+            stages = []
+            for stage in METRICS.stages(platform):
+                latency = METRICS.latency(platform, stage)
+                stages.append(f"{stage} {latency['p50']:.1f}/{latency['p95']:.1f}s")
+            if stages:
+                stage_lines.append(f"   {platform:10} " + ", ".join(stages))
+        if stage_lines:
+            print("-"*70)
+            print("⏱️  Stages (p50/p95):")
+            print("\n".join(stage_lines))
+            print(f"   Details: {METRICS.directory}/")
         
         print("="*70)
         print(f"\n🎉 Total: {total_posted} videos posted!")
         print(f"⏰ Finished at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
     
+    def status(self):
+        """Print job counts from the tracker (read-only; no uploader is loaded)"""
+        if not self.tracker_path.exists():
+            print(f"📭 No tracker yet ({self.tracker_path}): run `python orchestrator.py upload` first\n")
+            return
+        tracker = open_tracker(self.tracker_path)
+        try:
+            rows = tracker.rows()
+            scheduler = PublishScheduler(tracker, platforms=self.platforms)
+            scheduled = scheduler.reload()
+            leases = [lease for lease in tracker.leases() if lease['platform'] in self.platforms]
+        finally:
+            tracker.close()
+        
+        print("\n" + "="*70)
+        print(f"📊 STATUS ({self.tracker_path})")
+        print("="*70)
+        videos = Counter(row.get('Status') or 'new' for row in rows)
+        print(f"🎬 {len(rows)} video(s): " + ", ".join(f"{s} {n}" for s, n in videos.most_common()))
+        for platform in self.platforms:
+            jobs = Counter(row.get(STATUS_FIELDS[platform]) or 'new' for row in rows)
+            print(f"{PLATFORM_EMOJI[platform]} {platform.upper():12} "
+                  + "  ".join(f"{s} {n}" for s, n in jobs.most_common()))
+        if scheduled:
+            print(f"🗓️  {scheduled} job(s) scheduled, next at {scheduler.next_due()}")
+        if leases:
+            owners = Counter(lease['lease_owner'] for lease in leases)
+            print(f"🔒 {len(leases)} job(s) uploading: "
+                  + ", ".join(f"{owner} {n}" for owner, n in owners.most_common()))
+        if self.queue_dir.exists():
+            tracked = {row['Video File'] for row in rows}
+            untracked = [p for p in self.queue_dir.iterdir()
+                         if p.suffix.lower() in VIDEO_EXTENSIONS and p.name not in tracked]
+            if untracked:
+                print(f"📹 {len(untracked)} video(s) in {self.queue_dir}/ not tracked yet")
+        print("="*70 + "\n")
+    
+    def scan(self):
+        """Add CSV rows for videos that are new in the queue (no uploader is loaded)"""
+        self.ensure_directories()
+        generate_csv(str(self.queue_dir), str(self.csv_path))
+    
     def run(self, mode: str = 'sequential'):
         """Main orchestrator entry point"""
         print("\n" + "="*70)
@@ -138,7 +387,10 @@ class Orchestrator:
         print(f"📅 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"📂 Queue dir: {self.queue_dir}")
         print(f"📋 CSV file: {self.csv_path}")
+        print(f"🗄️  Tracker: {self.tracker_path}")
         print(f"🔄 Mode: {mode}")
+        if self.platforms != PLATFORMS:
+            print(f"🎯 Platforms: {', '.join(self.platforms)}")
         print("="*70)
         
         self.create_sample_csv()
@@ -149,29 +401,135 @@ class Orchestrator:
             print("❌ CSV file not found!\n")
             return
         
-        # Check for videos
-        videos = list(self.queue_dir.glob('*.mp4')) + list(self.queue_dir.glob('*.mov'))
-        if not videos:
+        # Check for videos (a daemon waits for them instead)
+        videos = [p for p in self.queue_dir.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS]
+        if not videos and mode.lower() != 'daemon':
             print("📭 No videos found in queue\n")
             return
         
         print(f"📹 Found {len(videos)} video(s)\n")
         
+        # Open tracker (SQLite by default) and pull in CSV edits
+        self.tracker = open_tracker(self.tracker_path)
+        added = self.tracker.import_csv(self.csv_path)
+        if added:
+            print(f"📥 Imported {added} new row(s) from {self.csv_path}\n")
+        
+        # Future-dated jobs are left for the daemon, which publishes them on time
+        if mode.lower() != 'daemon':
+            scheduled = PublishScheduler(self.tracker, platforms=self.platforms)
+            if scheduled.reload():
+                print(f"🗓️  {len(scheduled)} job(s) scheduled for later (next at {scheduled.next_due()}); "
+                      f"run `python orchestrator.py daemon` to publish them on time\n")
+        
+        # Jobs are leased one at a time, so workers on other boxes can share the queue
+        self.leases = LeaseKeeper(self.tracker, lease_dir=self.queue_dir / LEASE_DIR)
+        self.leases.start()
+        print(f"🔒 Worker {self.leases.owner} (leases {self.leases.ttl:g}s)\n")
+        # Uploads a crash cut off are settled first; requeued ones are hashed below
+        self.reconcile()
+        
+        # Hash pending files up front (in parallel, cached by size/mtime);
+        # the uploaders use these to skip content that is already posted
+        pending = self._pending_media()
+        paths = [self.queue_dir / name for name in pending if (self.queue_dir / name).exists()]
+        started = time.perf_counter()
+        digests = HashIndex(index_path_for(self.tracker)).digests(paths)
+        print(f"#️⃣  Hashed {len(digests)} file(s) in {time.perf_counter() - started:.2f}s\n")
+        
+        # Probe/transcode in the background while uploads run
+        self.preparer = MediaPreparer(self.tracker, self.queue_dir)
+        self.preparer.submit(pending, digests)
+        
         # Run
         try:
             if mode.lower() == 'parallel':
                 asyncio.run(self.run_parallel())
+            elif mode.lower() == 'daemon':
+                asyncio.run(UploadDaemon(self).run())
             else:
                 self.run_sequential()
         except Exception as e:
             print(f"❌ Error: {e}\n")
+        finally:
+            self.leases.stop()
+            self.preparer.close()
+            # Keep the CSV in sync for people who read it directly
+            self.tracker.export_csv(self.csv_path)
+            self.tracker.close()
+            METRICS.export()
         
         self.print_summary()
 
-if __name__ == "__main__":
-    import sys
+
+def importtime(command: List[str]):
+    """Run `orchestrator.py <command>` under `python -X importtime` and show
+    what its startup spends on imports"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', str(Path(__file__).resolve()), *command],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, encoding='utf-8',
+        errors='replace', env={**os.environ, 'PYTHONIOENCODING': 'utf-8'},
+    )
+    wall = time.perf_counter() - started
+    
+    # "import time: self [us] | cumulative | name", nested imports indented
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit() and not name.startswith('  '):
+            imports.append((int(cumulative) / 1000, name.strip()))
+    imports.sort(reverse=True)
+    
+    print(f"\n⏱️  orchestrator.py {' '.join(command)}: {wall:.2f}s in total, "
+          f"{sum(ms for ms, _ in imports):.0f}ms importing modules")
+    for ms, name in imports[:10]:
+        print(f"   {ms:8.1f}ms  {name}")
+    if result.returncode != 0:
+        print(f"⚠️  Command exited with code {result.returncode}")
+    print()
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    # `orchestrator.py [sequential|parallel|daemon]` keeps working
+    if not argv:
+        argv = ['upload']
+    elif argv[0].lower() in MODES:
+        argv = ['upload', '--mode', argv[0].lower(), *argv[1:]]
+    
+    paths = argparse.ArgumentParser(add_help=False)
+    paths.add_argument('--csv', default='upload_tracker.csv', help="CSV file (default: %(default)s)")
+    paths.add_argument('--queue', default='videos_queue', help="Queue folder (default: %(default)s)")
+    paths.add_argument('--tracker', default=DEFAULT_DB_PATH, help="Tracker file (default: %(default)s)")
+    platforms = argparse.ArgumentParser(add_help=False)
+    platforms.add_argument('--platform', type=parse_platforms, default=list(PLATFORMS),
+                           help="ig, yt, tt or a comma-separated list (default: all)")
+    
+    parser = argparse.ArgumentParser(prog='orchestrator.py', description="Multi-platform video uploader")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+    upload = commands.add_parser('upload', parents=[paths, platforms], help="Upload new videos")
+    upload.add_argument('--mode', type=str.lower, choices=MODES, default='sequential')
+    commands.add_parser('status', parents=[paths, platforms], help="Show job counts from the tracker")
+    commands.add_parser('scan', parents=[paths], help="Add CSV rows for new videos in the queue")
+    timing = commands.add_parser('importtime', help="Time the imports of a command (default: status)")
+    timing.add_argument('args', nargs=argparse.REMAINDER, metavar='command')
+    args = parser.parse_args(argv)
     
-    mode = sys.argv[1] if len(sys.argv) > 1 else 'sequential'
+    if args.command == 'importtime':
+        importtime(args.args or ['status'])
+        return
     
-    orchestrator = Orchestrator()
-    orchestrator.run(mode=mode)
+    orchestrator = Orchestrator(args.csv, args.queue, args.tracker, getattr(args, 'platform', None))
+    if args.command == 'upload':
+        orchestrator.run(mode=args.mode)
+    elif args.command == 'status':
+        orchestrator.status()
+    else:
+        orchestrator.scan()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# ═══════════════════════════════════════════════════════════════
+# YouTube Quota Accountant
+# Tracks API units per project and day so uploads are deferred
+# before any bytes are sent
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC = ZoneInfo('America/Los_Angeles')
+except Exception:
+    # No tz database (e.g. Windows without tzdata): quota day is close enough in PST
+    PACIFIC = timezone(timedelta(hours=-8))
+
+DEFAULT_DAILY_QUOTA = 10000
+VIDEO_INSERT_COST = 1600
+
+
+class QuotaExceeded(Exception):
+    """Raised when the API reports the daily quota is used up"""
+
+
+def project_id(credentials_file: str) -> str:
+    """Google Cloud project the OAuth client belongs to"""
+    try:
+        with open(credentials_file, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        client = info.get('installed') or info.get('web') or {}
+        return client.get('project_id') or client.get('client_id') or 'default'
+    except Exception:
+        return 'default'
+
+
+class QuotaAccountant:
+    """Reserves API units in the tracker before each call.
+
+    YouTube quota resets at midnight Pacific time, so each Pacific date is one
+    window. Reservations are atomic in the tracker, so several uploaders (or
+    processes) sharing a project never overspend it together.
+    """
+
+    def __init__(self, tracker, project: str, daily_limit: Optional[int] = None):
+        self.tracker = tracker
+        self.project = project
+        self.daily_limit = daily_limit or int(os.getenv('YOUTUBE_DAILY_QUOTA', DEFAULT_DAILY_QUOTA))
+
+    @staticmethod
+    def window(now: Optional[datetime] = None) -> str:
+        now = now or datetime.now(timezone.utc)
+        return now.astimezone(PACIFIC).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def next_window_start(now: Optional[datetime] = None) -> datetime:
+        """Start of the next quota day, in local time"""
+        now = (now or datetime.now(timezone.utc)).astimezone(PACIFIC)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), PACIFIC)
+        return midnight.astimezone().replace(tzinfo=None)
+
+    def remaining(self) -> int:
+        return self.daily_limit - self.tracker.quota_used(self.project, self.window())
+
+    def reserve(self, units: int) -> bool:
+        """Spend `units` now if they fit in today's quota"""
+        return self.tracker.reserve_quota(self.project, self.window(), units, self.daily_limit)
+
+    def exhaust(self):
+        """Mark today's quota as used up (the API said so)"""
+        remaining = self.remaining()
+        if remaining > 0:
+            self.tracker.reserve_quota(self.project, self.window(), remaining, self.daily_limit)
+
+    def defer(self, video_file: str, platform: str) -> datetime:
+        """Push a job to the next quota window"""
+        when = self.next_window_start()
+        self.tracker.set_job_fields(video_file, platform, {
+            'not_before': when.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        return when
@@ -0,0 +1,139 @@
+# ═══════════════════════════════════════════════════════════════
+# Rate Limiter
+# Adaptive token buckets per platform and account, usable from
+# sync and async code
+# ═══════════════════════════════════════════════════════════════
+
+import re
+import time
+import asyncio
+import threading
+from typing import Dict, Optional, Union
+
+# Seconds between uploads: where each bucket starts, the fastest it may go
+# after a run of successes, and the slowest it backs off to when throttled.
+# `burst` is how many uploads may go out back to back after an idle period.
+RATE_LIMITS = {
+    'instagram': {'interval': 4.0, 'min_interval': 2.0, 'max_interval': 600.0, 'burst': 1},
+    'youtube': {'interval': 3.0, 'min_interval': 1.0, 'max_interval': 120.0, 'burst': 2},
+    'tiktok': {'interval': 5.0, 'min_interval': 2.0, 'max_interval': 300.0, 'burst': 1},
+}
+
+SLOWDOWN_FACTOR = 2.0   # Interval multiplier on a throttling error
+SPEEDUP_FACTOR = 0.8    # Interval multiplier after a run of successes
+SPEEDUP_AFTER = 5       # Successes in a row before speeding up
+
+# Errors that mean "slow down": HTTP 429, Instagram feedback_required /
+# please-wait, Google rate-limit reasons, generic throttling messages
+THROTTLE_PATTERN = re.compile(
+    r'\b429\b|too many requests|feedback_required|feedback required|please wait|'
+    r'throttl|rate ?limit|ratelimitexceeded|try again later',
+    re.I
+)
+THROTTLE_EXCEPTIONS = {
+    'FeedbackRequired', 'PleaseWaitFewMinutes', 'RateLimitError', 'ClientThrottledError',
+}
+
+
+def is_throttle(error: Union[Exception, str, None]) -> bool:
+    """True if an error (or error message) says the platform is throttling us"""
+    if error is None:
+        return False
+    if isinstance(error, Exception) and type(error).__name__ in THROTTLE_EXCEPTIONS:
+        return True
+    return bool(THROTTLE_PATTERN.search(str(error)))
+
+
+class RateLimiter:
+    """Token bucket whose refill interval adapts to the platform's feedback.
+
+    Each call to `wait()` / `wait_async()` takes one token, sleeping until one
+    is available. Time spent doing the work counts towards the interval, so a
+    slow upload is not followed by a full extra sleep. `report()` feeds back
+    the outcome: throttling doubles the interval and pauses the bucket, a run
+    of successes shortens it again down to `min_interval`.
+    """
+
+    def __init__(self, interval: float, min_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None, burst: int = 1):
+        self.interval = interval
+        self.min_interval = min_interval if min_interval is not None else interval
+        self.max_interval = max_interval if max_interval is not None else interval
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if self.interval > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+        else:
+            self._tokens = float(self.burst)
+        self._updated = now
+
+    def _claim(self) -> float:
+        """Take the next token; returns how long the caller must wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            # A negative balance is debt: later callers queue up behind this one
+            delay = -self._tokens * self.interval if self._tokens < 0 else 0.0
+            return max(delay, self._paused_until - now)
+
+    def wait(self):
+        delay = self._claim()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        delay = self._claim()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def success(self):
+        with self._lock:
+            self._successes += 1
+            if self._successes >= SPEEDUP_AFTER:
+                self._successes = 0
+                self.interval = max(self.min_interval, self.interval * SPEEDUP_FACTOR)
+
+    def throttled(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._successes = 0
+            self.interval = min(self.max_interval, self.interval * SLOWDOWN_FACTOR)
+            # Drop any saved-up burst and hold everyone for one full interval
+            self._tokens = min(self._tokens, 0.0)
+            self._paused_until = max(self._paused_until, now + self.interval)
+        print(f"🐢 Rate limited: next uploads every {self.interval:.1f}s")
+
+    def report(self, success: bool, error: Union[Exception, str, None] = None):
+        """Feed back one call's outcome; errors other than throttling are neutral"""
+        if success:
+            self.success()
+        elif is_throttle(error):
+            self.throttled()
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(platform: str, account: str = 'default',
+                overrides: Optional[Dict] = None) -> RateLimiter:
+    """Process-wide limiter for one account on a platform
+
+    `overrides` (e.g. an account's `rate_limit` settings) replace the
+    platform defaults for this account.
+    """
+    key = f"{platform}:{account}"
+    with _limiters_lock:
+        if key not in _limiters:
+            config = dict(RATE_LIMITS.get(platform, {'interval': 0.0}))
+            config.update(overrides or {})
+            _limiters[key] = RateLimiter(**config)
+        return _limiters[key]
@@ -64,11 +64,12 @@ echo Choose upload mode:
 echo.
 echo 1) Sequential (safer, one platform at a time)
 echo 2) Parallel (faster, uploads to all at once)
-echo 3) Exit
+echo 3) Daemon (stay running, upload new videos as they arrive)
+echo 4) Exit
 echo ============================================================
 echo.
 
-set /p choice=Enter your choice (1-3): 
+set /p choice=Enter your choice (1-4): 
 
 if "%choice%"=="1" (
     echo.
@@ -87,6 +88,14 @@ if "%choice%"=="2" (
 )
 
 if "%choice%"=="3" (
+    echo.
+    echo Starting DAEMON mode ^(Ctrl+C to stop^)...
+    echo.
+    python orchestrator.py daemon
+    goto :end
+)
+
+if "%choice%"=="4" (
     exit /b 0
 )
 
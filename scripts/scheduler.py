@@ -0,0 +1,101 @@
+# ═══════════════════════════════════════════════════════════════
+# Publish Scheduler
+# Wakes exactly when scheduled jobs (Publish Date / not_before)
+# come due, and stages them a lead time ahead
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import heapq
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from tracker import PLATFORMS, DATE_FORMAT
+
+# Jobs are transcoded and their uploader warmed up this long before they are due
+SCHEDULE_LEAD = timedelta(minutes=float(os.getenv('SCHEDULE_LEAD_MINUTES', '10')))
+# Re-check the clock at least this often (system sleep, clock changes)
+MAX_SLEEP = 3600.0
+
+Entry = Tuple[datetime, str, str]  # (time, video_file, platform)
+
+
+class PublishScheduler:
+    """Min-heaps of future jobs and one timer for the earliest of them.
+
+    `_due` is ordered by due time and `_stage` by due time minus the lead, so
+    the loop only ever looks at the two heap tops and sleeps until the earlier
+    one. Thousands of future posts cost one sleeping task; reload() rebuilds the
+    heaps from the tracker and re-arms the timer after edits.
+    """
+
+    def __init__(self, tracker, lead: timedelta = SCHEDULE_LEAD, platforms: List[str] = PLATFORMS):
+        self.tracker = tracker
+        self.lead = lead
+        self.platforms = platforms
+        self._due: List[Entry] = []
+        self._stage: List[Entry] = []
+        self._staged: Set[Tuple[str, str]] = set()
+        self._changed: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def reload(self) -> int:
+        """Rebuild the heaps from the tracker; returns the number of future jobs"""
+        entries = [
+            (datetime.strptime(due, DATE_FORMAT), video_file, platform)
+            for platform in self.platforms
+            for video_file, due in self.tracker.scheduled_jobs(platform)
+        ]
+        self._due = list(entries)
+        heapq.heapify(self._due)
+        keys = {(video_file, platform) for _, video_file, platform in entries}
+        self._staged &= keys
+        self._stage = [
+            (due - self.lead, video_file, platform) for due, video_file, platform in entries
+            if (video_file, platform) not in self._staged
+        ]
+        heapq.heapify(self._stage)
+        if self._changed is not None:
+            self._changed.set()
+        return len(entries)
+
+    def next_due(self) -> Optional[datetime]:
+        return self._due[0][0] if self._due else None
+
+    @staticmethod
+    def _pop_until(heap: List[Entry], now: datetime) -> List[Entry]:
+        popped = []
+        while heap and heap[0][0] <= now:
+            popped.append(heapq.heappop(heap))
+        return popped
+
+    async def run(self, on_stage: Callable[[Dict[str, List[str]]], Awaitable],
+                  on_due: Callable[[Set[str]], Awaitable]):
+        """Call on_stage({video_file: [platforms]}) a lead time before jobs are due
+        and on_due({video_files}) when they are; runs until cancelled"""
+        self._changed = asyncio.Event()
+        while True:
+            now = datetime.now()
+            staging = {}
+            for _, video_file, platform in self._pop_until(self._stage, now):
+                self._staged.add((video_file, platform))
+                staging.setdefault(video_file, []).append(platform)
+            if staging:
+                await on_stage(staging)
+
+            due = self._pop_until(self._due, now)
+            if due:
+                for _, video_file, platform in due:
+                    self._staged.discard((video_file, platform))
+                await on_due({video_file for _, video_file, _ in due})
+
+            tops = [heap[0][0] for heap in (self._due, self._stage) if heap]
+            timeout = None
+            if tops:
+                timeout = min(max(0.0, (min(tops) - datetime.now()).total_seconds()), MAX_SLEEP)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,1074 @@
+# ═══════════════════════════════════════════════════════════════
+# Upload Tracker
+# Pluggable storage for upload state (SQLite by default, CSV compat)
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import csv
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+DEFAULT_DB_PATH = 'upload_tracker.db'
+DEFAULT_CSV_PATH = 'upload_tracker.csv'
+DEFAULT_XLSX_PATH = 'upload_tracker.xlsx'
+
+# WAL needs shared memory, so it only works for processes on one host; a
+# database on a network share used from several machines needs DELETE
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL').upper()
+
+PLATFORMS = ['instagram', 'youtube', 'tiktok']
+
+URL_FIELDS = {
+    'instagram': 'Instagram URL',
+    'youtube': 'YouTube URL',
+    'tiktok': 'TikTok URL',
+}
+
+STATUS_FIELDS = {
+    'instagram': 'Instagram Status',
+    'youtube': 'YouTube Status',
+    'tiktok': 'TikTok Status',
+}
+
+# Columns stored per video
+VIDEO_FIELDS = [
+    'Video File', 'Title', 'Caption', 'Description', 'Tags', 'Account',
+    'Publish Date', 'Status', 'Instagram URL', 'YouTube URL', 'TikTok URL',
+    'Error', 'Timestamp'
+]
+
+# Columns in the CSV: video columns plus one status per platform job
+FIELDNAMES = VIDEO_FIELDS + [STATUS_FIELDS[p] for p in PLATFORMS]
+
+# CSV header -> SQLite column
+COLUMNS = {name: name.lower().replace(' ', '_') for name in VIDEO_FIELDS}
+
+# Columns the user edits in the CSV; everything else is owned by the uploaders
+METADATA_FIELDS = ['Title', 'Caption', 'Description', 'Tags', 'Account', 'Publish Date']
+
+# Job states that no longer need work
+DONE_STATUSES = ('published', 'skip')
+
+# Accepted `Publish Date` spellings (local time); stored as the first one
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+PUBLISH_DATE_FORMATS = [
+    DATE_FORMAT, '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d',
+    '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%d.%m.%Y',
+]
+
+# Per-job bookkeeping kept by the uploaders (column -> SQLite type and default)
+JOB_FIELDS = {
+    'resume_uri': "TEXT NOT NULL DEFAULT ''",      # YouTube resumable session
+    'resume_offset': "INTEGER NOT NULL DEFAULT 0",  # Bytes the server has committed
+    'not_before': "TEXT NOT NULL DEFAULT ''",      # Deferred until (e.g. next quota window)
+    'account': "TEXT NOT NULL DEFAULT ''",         # Account that last worked on the job
+    'media_file': "TEXT NOT NULL DEFAULT ''",      # Prepared copy to upload instead of the original
+    'lease_owner': "TEXT NOT NULL DEFAULT ''",     # Worker uploading the job right now
+    'lease_expires': "REAL NOT NULL DEFAULT 0",    # Unix time the lease lapses unless renewed
+    'committed': "INTEGER NOT NULL DEFAULT 0",     # 1 once the publishing request went out
+}
+
+
+def _now() -> str:
+    return datetime.now().strftime(DATE_FORMAT)
+
+
+def upload_tag(video_file: str, platform: str) -> str:
+    """Idempotency tag sent along with an upload where the platform keeps one
+    out of sight (YouTube video tags), so an upload interrupted by a crash
+    can be found again"""
+    return 'vu' + hashlib.sha1(f"{video_file}|{platform}".encode('utf-8')).hexdigest()[:12]
+
+
+def parse_publish_date(value: str) -> Optional[datetime]:
+    """`Publish Date` as a datetime; None if empty. Raises ValueError if unreadable."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    for fmt in PUBLISH_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised Publish Date: {value}")
+
+
+def normalize_publish_date(value: str) -> str:
+    """`Publish Date` in DATE_FORMAT, so dates compare as strings"""
+    date = parse_publish_date(value)
+    return date.strftime(DATE_FORMAT) if date else ''
+
+
+def _with_publish_date(row: Dict[str, str]) -> Dict[str, str]:
+    """A new row with its Publish Date normalised; an unreadable date fails its pending jobs"""
+    try:
+        return dict(row, **{'Publish Date': normalize_publish_date(row.get('Publish Date'))})
+    except ValueError as e:
+        print(f"⚠️ {row['Video File']}: {e}")
+        failed = dict(row, Error=str(e))
+        for platform in PLATFORMS:
+            if initial_job_status(row, platform) == 'new':
+                failed[STATUS_FIELDS[platform]] = 'error'
+        return failed
+
+
+def _read_csv(csv_path: Path) -> List[Dict[str, str]]:
+    if not csv_path.exists():
+        return []
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        return [row for row in csv.DictReader(f) if row.get('Video File')]
+
+
+def _write_csv(csv_path: Path, rows: List[Dict[str, str]]):
+    """Write rows to a temp file and swap it in, so readers never see half a file"""
+    tmp_path = csv_path.with_name(csv_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, csv_path)
+
+
+def initial_job_status(row: Dict[str, str], platform: str) -> str:
+    """Job state for a row that has no job record yet (new or legacy rows)"""
+    status = (row.get(STATUS_FIELDS[platform]) or '').lower()
+    if not status:
+        status = 'published' if row.get(URL_FIELDS[platform]) else (row.get('Status') or 'new').lower()
+    # `scheduled` rows are pending jobs held back by their Publish Date
+    return 'new' if status == 'scheduled' else status
+
+
+def rollup_status(job_statuses: Iterable[str], publish_date: str = '') -> str:
+    """Overall video status from its platform jobs (and normalised Publish Date)"""
+    job_statuses = list(job_statuses)
+    if all(s == 'skip' for s in job_statuses):
+        return 'skip'
+    if all(s in DONE_STATUSES for s in job_statuses):
+        return 'published'
+    if any(s not in DONE_STATUSES and s != 'error' for s in job_statuses):
+        return 'scheduled' if publish_date > _now() else 'new'
+    return 'error'
+
+
+class BaseTracker:
+    """Interface shared by all tracker backends.
+
+    Rows are plain dicts keyed by the CSV headers in FIELDNAMES. Each row has one
+    job per platform with its own status; the row `Status` is rolled up from them.
+    """
+
+    def rows(self, status: Optional[str] = None) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    def get(self, video_file: str) -> Optional[Dict[str, str]]:
+        raise NotImplementedError
+
+    def add(self, row: Dict[str, str]) -> bool:
+        """Insert a row and its platform jobs if the video is not tracked yet.
+        Returns True if inserted."""
+        raise NotImplementedError
+
+    def update(self, video_file: str, fields: Dict[str, str]):
+        """Atomically update one row; committed before returning"""
+        raise NotImplementedError
+
+    def jobs(self, platform: str, status: str = 'new', include_deferred: bool = False,
+             include_leased: bool = False) -> List[Dict[str, str]]:
+        """Rows whose job for `platform` is in `status`.
+
+        Jobs deferred to a later `not_before` or `Publish Date`, and jobs
+        another worker holds a live lease on, are left out unless asked for.
+        """
+        raise NotImplementedError
+
+    def scheduled_jobs(self, platform: str) -> List[Tuple[str, str]]:
+        """(video_file, due) for `new` jobs held back until a later time.
+
+        `due` is the later of the row's Publish Date and the job's not_before.
+        """
+        raise NotImplementedError
+
+    def update_job(self, video_file: str, platform: str, status: str,
+                   url: str = '', error: str = '', duration: Optional[float] = None):
+        """Atomically record a platform job result and roll up the row status
+
+        `duration` is the upload time in seconds, for backends that keep a log.
+        """
+        raise NotImplementedError
+
+    def start_job(self, video_file: str, platform: str):
+        """Mark a job `uploading` before its first byte is sent (its lease is kept).
+
+        A job still `uploading` at the next start was cut off by a crash, and
+        is checked against the platform before it may be uploaded again.
+        """
+        raise NotImplementedError
+
+    def get_job(self, video_file: str, platform: str) -> Optional[Dict]:
+        """Job record: status, url, error plus the JOB_FIELDS bookkeeping"""
+        raise NotImplementedError
+
+    def set_job_fields(self, video_file: str, platform: str, fields: Dict):
+        """Atomically update JOB_FIELDS bookkeeping without touching the status"""
+        raise NotImplementedError
+
+    def claim_job(self, video_file: str, platform: str, owner: str, ttl: float,
+                  status: str = 'new') -> bool:
+        """Atomically lease a job in `status` to `owner` for `ttl` seconds.
+
+        Fails while another owner holds a live lease; a lapsed lease (its
+        worker died) is taken over. update_job() ends the lease.
+        """
+        raise NotImplementedError
+
+    def renew_leases(self, owner: str, ttl: float) -> int:
+        """Extend every lease `owner` holds to `ttl` seconds from now. Returns the count."""
+        raise NotImplementedError
+
+    def release_jobs(self, owner: str, video_file: Optional[str] = None, platform: Optional[str] = None):
+        """Drop `owner`'s leases: one job, or all of them"""
+        raise NotImplementedError
+
+    def leases(self) -> List[Dict]:
+        """Live leases: {'video_file', 'platform', 'lease_owner', 'lease_expires'}"""
+        raise NotImplementedError
+
+    def quota_used(self, project: str, window: str) -> int:
+        """Units spent by `project` in the quota `window` (e.g. a day)"""
+        raise NotImplementedError
+
+    def reserve_quota(self, project: str, window: str, units: int, limit: int) -> bool:
+        """Atomically spend `units` if that stays within `limit`. Returns False if not."""
+        raise NotImplementedError
+
+    def import_csv(self, csv_path: Path) -> int:
+        """Merge rows from a CSV file. Returns the number of new rows."""
+        raise NotImplementedError
+
+    def export_csv(self, csv_path: Path):
+        _write_csv(Path(csv_path), self.rows())
+
+    def flush(self):
+        """Write out buffered changes (backends that write through have none)"""
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteTracker(BaseTracker):
+    """SQLite tracker in WAL mode (SQLITE_JOURNAL_MODE).
+
+    Each thread gets its own connection; WAL plus a busy timeout lets several
+    threads or processes write concurrently without losing updates. Workers on
+    several machines share the database on a network folder in DELETE mode,
+    which locks the file itself instead of using shared memory.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = DEFAULT_DB_PATH):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+            # NORMAL is only crash-safe with WAL
+            conn.execute(f"PRAGMA synchronous={'NORMAL' if SQLITE_JOURNAL_MODE == 'WAL' else 'FULL'}")
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute("CREATE TABLE IF NOT EXISTS videos (video_file TEXT PRIMARY KEY)")
+        existing = {r['name'] for r in conn.execute("PRAGMA table_info(videos)")}
+        for col in COLUMNS.values():
+            if col not in existing:
+                conn.execute(f"ALTER TABLE videos ADD COLUMN {col} TEXT NOT NULL DEFAULT ''")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_status ON videos(status)")
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                video_file TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'new',
+                url TEXT NOT NULL DEFAULT '',
+                error TEXT NOT NULL DEFAULT '',
+                updated_at TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (video_file, platform)
+            )
+        """)
+        existing = {r['name'] for r in conn.execute("PRAGMA table_info(jobs)")}
+        for col, definition in JOB_FIELDS.items():
+            if col not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {col} {definition}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_platform_status ON jobs(platform, status)")
+        # Older trackers stored `scheduled` as a job state; the date now holds jobs back
+        conn.execute("UPDATE jobs SET status = 'new' WHERE status = 'scheduled'")
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS quota_usage (
+                project TEXT NOT NULL,
+                quota_window TEXT NOT NULL,
+                units INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (project, quota_window)
+            )
+        """)
+
+        # Rows tracked before per-platform jobs existed
+        for record in conn.execute(
+            "SELECT * FROM videos WHERE video_file NOT IN (SELECT video_file FROM jobs)"
+        ).fetchall():
+            self._insert_jobs(conn, self._to_row(record))
+
+    @staticmethod
+    def _to_row(record: sqlite3.Row) -> Dict[str, str]:
+        return {name: record[col] for name, col in COLUMNS.items()}
+
+    def _with_job_statuses(self, rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        if not rows:
+            return rows
+        by_file = {row['Video File']: row for row in rows}
+        for row in rows:
+            for platform in PLATFORMS:
+                row[STATUS_FIELDS[platform]] = ''
+        query = "SELECT video_file, platform, status FROM jobs"
+        params = []
+        if len(rows) == 1:
+            query += " WHERE video_file = ?"
+            params.append(rows[0]['Video File'])
+        for record in self._connect().execute(query, params):
+            row = by_file.get(record['video_file'])
+            if row is not None and record['platform'] in STATUS_FIELDS:
+                row[STATUS_FIELDS[record['platform']]] = record['status']
+        return rows
+
+    @staticmethod
+    def _insert_jobs(conn: sqlite3.Connection, row: Dict[str, str]):
+        conn.executemany(
+            "INSERT OR IGNORE INTO jobs (video_file, platform, status, url) VALUES (?, ?, ?, ?)",
+            [
+                (row['Video File'], p, initial_job_status(row, p), row.get(URL_FIELDS[p]) or '')
+                for p in PLATFORMS
+            ]
+        )
+
+    def rows(self, status: Optional[str] = None) -> List[Dict[str, str]]:
+        conn = self._connect()
+        if status is None:
+            cursor = conn.execute("SELECT * FROM videos ORDER BY video_file")
+        else:
+            cursor = conn.execute(
+                "SELECT * FROM videos WHERE status = ? ORDER BY video_file", (status.lower(),)
+            )
+        return self._with_job_statuses([self._to_row(r) for r in cursor])
+
+    def get(self, video_file: str) -> Optional[Dict[str, str]]:
+        record = self._connect().execute(
+            "SELECT * FROM videos WHERE video_file = ?", (video_file,)
+        ).fetchone()
+        return self._with_job_statuses([self._to_row(record)])[0] if record else None
+
+    def add(self, row: Dict[str, str]) -> bool:
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM videos WHERE video_file = ?", (row['Video File'],)).fetchone():
+            return False
+        row = _with_publish_date(row)
+        values = {col: (row.get(name) or '') for name, col in COLUMNS.items()}
+        values['status'] = rollup_status((initial_job_status(row, p) for p in PLATFORMS),
+                                         values['publish_date'])
+        cols = ', '.join(values)
+        marks = ', '.join('?' for _ in values)
+        cursor = conn.execute(
+            f"INSERT OR IGNORE INTO videos ({cols}) VALUES ({marks})", list(values.values())
+        )
+        if cursor.rowcount > 0:
+            self._insert_jobs(conn, row)
+            return True
+        return False
+
+    def update(self, video_file: str, fields: Dict[str, str]):
+        fields = {k: v for k, v in fields.items() if k in COLUMNS and k != 'Video File'}
+        fields.setdefault('Timestamp', _now())
+        if 'Status' in fields:
+            fields['Status'] = fields['Status'].lower()
+        assignments = ', '.join(f"{COLUMNS[k]} = ?" for k in fields)
+        self._connect().execute(
+            f"UPDATE videos SET {assignments} WHERE video_file = ?",
+            [*fields.values(), video_file]
+        )
+
+    def jobs(self, platform: str, status: str = 'new', include_deferred: bool = False,
+             include_leased: bool = False) -> List[Dict[str, str]]:
+        query = """
+            SELECT v.* FROM jobs j JOIN videos v ON v.video_file = j.video_file
+            WHERE j.platform = ? AND j.status = ?
+        """
+        params = [platform, status.lower()]
+        if not include_deferred:
+            query += " AND j.not_before <= ? AND v.publish_date <= ?"
+            params += [_now(), _now()]
+        if not include_leased:
+            # Jobs another worker is uploading right now
+            query += " AND (j.lease_owner = '' OR j.lease_expires < ?)"
+            params.append(time.time())
+        cursor = self._connect().execute(query + " ORDER BY v.video_file", params)
+        return [self._to_row(r) for r in cursor]
+
+    def scheduled_jobs(self, platform: str) -> List[Tuple[str, str]]:
+        cursor = self._connect().execute(
+            """
+            SELECT j.video_file, MAX(v.publish_date, j.not_before) AS due
+            FROM jobs j JOIN videos v ON v.video_file = j.video_file
+            WHERE j.platform = ? AND j.status = 'new' AND due > ?
+            """,
+            (platform, _now())
+        )
+        return [(r['video_file'], r['due']) for r in cursor]
+
+    def update_job(self, video_file: str, platform: str, status: str,
+                   url: str = '', error: str = '', duration: Optional[float] = None):
+        now = _now()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, url = CASE WHEN ? != '' THEN ? ELSE url END,
+                                error = ?, updated_at = ?, lease_owner = '', lease_expires = 0
+                WHERE video_file = ? AND platform = ?
+                """,
+                (status.lower(), url, url, error, now, video_file, platform)
+            )
+            jobs = conn.execute(
+                "SELECT platform, status, error FROM jobs WHERE video_file = ?", (video_file,)
+            ).fetchall()
+            publish_date = conn.execute(
+                "SELECT publish_date FROM videos WHERE video_file = ?", (video_file,)
+            ).fetchone()
+            errors = '; '.join(f"{j['platform']}: {j['error']}" for j in jobs if j['error'])
+            fields = {
+                'Status': rollup_status((j['status'] for j in jobs),
+                                        publish_date['publish_date'] if publish_date else ''),
+                'Error': errors,
+                'Timestamp': now,
+            }
+            if url:
+                fields[URL_FIELDS[platform]] = url
+            assignments = ', '.join(f"{COLUMNS[k]} = ?" for k in fields)
+            conn.execute(
+                f"UPDATE videos SET {assignments} WHERE video_file = ?",
+                [*fields.values(), video_file]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def start_job(self, video_file: str, platform: str):
+        self._connect().execute(
+            """
+            UPDATE jobs SET status = 'uploading', committed = 0, error = '', updated_at = ?
+            WHERE video_file = ? AND platform = ?
+            """,
+            (_now(), video_file, platform)
+        )
+
+    def get_job(self, video_file: str, platform: str) -> Optional[Dict]:
+        record = self._connect().execute(
+            "SELECT * FROM jobs WHERE video_file = ? AND platform = ?", (video_file, platform)
+        ).fetchone()
+        return dict(record) if record else None
+
+    def set_job_fields(self, video_file: str, platform: str, fields: Dict):
+        fields = {k: v for k, v in fields.items() if k in JOB_FIELDS}
+        if not fields:
+            return
+        assignments = ', '.join(f"{k} = ?" for k in fields)
+        self._connect().execute(
+            f"UPDATE jobs SET {assignments} WHERE video_file = ? AND platform = ?",
+            [*fields.values(), video_file, platform]
+        )
+
+    def claim_job(self, video_file: str, platform: str, owner: str, ttl: float,
+                  status: str = 'new') -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            """
+            UPDATE jobs SET lease_owner = ?, lease_expires = ?
+            WHERE video_file = ? AND platform = ? AND status = ?
+              AND (lease_owner IN ('', ?) OR lease_expires < ?)
+            """,
+            (owner, now + ttl, video_file, platform, status, owner, now)
+        )
+        return cursor.rowcount == 1
+
+    def renew_leases(self, owner: str, ttl: float) -> int:
+        return self._connect().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE lease_owner = ?", (time.time() + ttl, owner)
+        ).rowcount
+
+    def release_jobs(self, owner: str, video_file: Optional[str] = None, platform: Optional[str] = None):
+        query = "UPDATE jobs SET lease_owner = '', lease_expires = 0 WHERE lease_owner = ?"
+        params = [owner]
+        if video_file is not None:
+            query += " AND video_file = ? AND platform = ?"
+            params += [video_file, platform]
+        self._connect().execute(query, params)
+
+    def leases(self) -> List[Dict]:
+        cursor = self._connect().execute(
+            """
+            SELECT video_file, platform, lease_owner, lease_expires FROM jobs
+            WHERE lease_owner != '' AND lease_expires >= ? ORDER BY video_file
+            """,
+            (time.time(),)
+        )
+        return [dict(r) for r in cursor]
+
+    def quota_used(self, project: str, window: str) -> int:
+        record = self._connect().execute(
+            "SELECT units FROM quota_usage WHERE project = ? AND quota_window = ?", (project, window)
+        ).fetchone()
+        return record['units'] if record else 0
+
+    def reserve_quota(self, project: str, window: str, units: int, limit: int) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            used = self.quota_used(project, window)
+            if used + units > limit:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                """
+                INSERT INTO quota_usage (project, quota_window, units) VALUES (?, ?, ?)
+                ON CONFLICT (project, quota_window) DO UPDATE SET units = units + excluded.units
+                """,
+                (project, window, units)
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def import_csv(self, csv_path: Path) -> int:
+        """Merge a CSV into the database.
+
+        New videos are inserted, metadata edits are picked up for known ones, and
+        a row (or a single platform status) set back to `new` in the CSV re-queues
+        the failed jobs. Upload results stay as recorded in the database.
+        """
+        added = 0
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in _read_csv(Path(csv_path)):
+                if self.add(row):
+                    added += 1
+                    continue
+                video_file = row['Video File']
+                fields = {k: row[k] for k in METADATA_FIELDS if k in row}
+                if 'Publish Date' in fields:
+                    try:
+                        fields['Publish Date'] = normalize_publish_date(fields['Publish Date'])
+                    except ValueError as e:
+                        print(f"⚠️ {video_file}: {e} (kept the previous date)")
+                        del fields['Publish Date']
+                if fields:
+                    assignments = ', '.join(f"{COLUMNS[k]} = ?" for k in fields)
+                    conn.execute(
+                        f"UPDATE videos SET {assignments} WHERE video_file = ?",
+                        [*fields.values(), video_file]
+                    )
+                retry_all = (row.get('Status') or '').lower() == 'new'
+                for platform in PLATFORMS:
+                    if retry_all or (row.get(STATUS_FIELDS[platform]) or '').lower() == 'new':
+                        conn.execute(
+                            """
+                            UPDATE jobs SET status = 'new', error = ''
+                            WHERE video_file = ? AND platform = ? AND status = 'error'
+                            """,
+                            (video_file, platform)
+                        )
+                jobs = conn.execute(
+                    "SELECT platform, status, error FROM jobs WHERE video_file = ?", (video_file,)
+                ).fetchall()
+                publish_date = conn.execute(
+                    "SELECT publish_date FROM videos WHERE video_file = ?", (video_file,)
+                ).fetchone()['publish_date']
+                # Re-queued jobs lost their errors above; drop them from the row too
+                errors = '; '.join(f"{j['platform']}: {j['error']}" for j in jobs if j['error'])
+                conn.execute(
+                    "UPDATE videos SET status = ?, error = ? WHERE video_file = ?",
+                    (rollup_status((j['status'] for j in jobs), publish_date), errors, video_file)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class CSVTracker(BaseTracker):
+    """Legacy CSV tracker.
+
+    Kept for compatibility only: every update rewrites the whole file (atomically,
+    under a lock), so it is safe across threads but O(N) per update and not safe
+    across processes. Job states live in the per-platform status columns;
+    JOB_FIELDS bookkeeping and quota usage live in a `.state.json` file next to
+    the CSV.
+    """
+
+    def __init__(self, csv_path: Union[str, Path] = DEFAULT_CSV_PATH):
+        self.csv_path = Path(csv_path)
+        self.state_path = self.csv_path.with_suffix('.state.json')
+        self._lock = threading.Lock()
+        self._rows = {}
+        for row in map(_with_publish_date, _read_csv(self.csv_path)):
+            for platform in PLATFORMS:
+                row[STATUS_FIELDS[platform]] = initial_job_status(row, platform)
+            self._rows[row['Video File']] = row
+        self._state = {'jobs': {}, 'quota': {}}
+        if self.state_path.exists():
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self._state.update(json.load(f))
+
+    def _save(self):
+        _write_csv(self.csv_path, list(self._rows.values()))
+
+    def _save_state(self):
+        tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def rows(self, status: Optional[str] = None) -> List[Dict[str, str]]:
+        with self._lock:
+            return [
+                dict(row) for row in self._rows.values()
+                if status is None or (row.get('Status') or '').lower() == status.lower()
+            ]
+
+    def get(self, video_file: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._rows.get(video_file)
+            return dict(row) if row else None
+
+    def add(self, row: Dict[str, str]) -> bool:
+        with self._lock:
+            if row['Video File'] in self._rows:
+                return False
+            row = _with_publish_date(row)
+            new_row = {name: row.get(name) or '' for name in FIELDNAMES}
+            for platform in PLATFORMS:
+                new_row[STATUS_FIELDS[platform]] = initial_job_status(row, platform)
+            new_row['Status'] = rollup_status((new_row[STATUS_FIELDS[p]] for p in PLATFORMS),
+                                              new_row['Publish Date'])
+            self._rows[row['Video File']] = new_row
+            self._save()
+            return True
+
+    def update(self, video_file: str, fields: Dict[str, str]):
+        with self._lock:
+            row = self._rows.get(video_file)
+            if row is None:
+                return
+            row.update(fields)
+            if 'Timestamp' not in fields:
+                row['Timestamp'] = _now()
+            self._save()
+
+    def jobs(self, platform: str, status: str = 'new', include_deferred: bool = False,
+             include_leased: bool = False) -> List[Dict[str, str]]:
+        now = _now()
+        with self._lock:
+            return [
+                dict(row) for row in self._rows.values()
+                if row[STATUS_FIELDS[platform]] == status.lower() and (
+                    include_deferred or self._due(row, platform) <= now
+                ) and (include_leased or not self._leased(row['Video File'], platform))
+            ]
+
+    def scheduled_jobs(self, platform: str) -> List[Tuple[str, str]]:
+        now = _now()
+        with self._lock:
+            return [
+                (row['Video File'], self._due(row, platform)) for row in self._rows.values()
+                if row[STATUS_FIELDS[platform]] == 'new' and self._due(row, platform) > now
+            ]
+
+    def _due(self, row: Dict[str, str], platform: str) -> str:
+        return max(row.get('Publish Date') or '',
+                   self._job_state(row['Video File'], platform).get('not_before', ''))
+
+    def _job_state(self, video_file: str, platform: str) -> Dict:
+        return self._state['jobs'].get(f"{video_file}|{platform}", {})
+
+    def _leased(self, video_file: str, platform: str) -> bool:
+        job = self._job_state(video_file, platform)
+        return bool(job.get('lease_owner')) and job.get('lease_expires', 0) >= time.time()
+
+    def update_job(self, video_file: str, platform: str, status: str,
+                   url: str = '', error: str = '', duration: Optional[float] = None):
+        with self._lock:
+            row = self._rows.get(video_file)
+            if row is None:
+                return
+            row[STATUS_FIELDS[platform]] = status.lower()
+            if url:
+                row[URL_FIELDS[platform]] = url
+            if error:
+                row['Error'] = f"{platform}: {error}"
+            elif not any(row[STATUS_FIELDS[p]] == 'error' for p in PLATFORMS):
+                row['Error'] = ''
+            row['Status'] = rollup_status((row[STATUS_FIELDS[p]] for p in PLATFORMS),
+                                          row.get('Publish Date') or '')
+            row['Timestamp'] = _now()
+            job = self._job_state(video_file, platform)
+            if job.get('lease_owner'):
+                job.update(lease_owner='', lease_expires=0)
+                self._save_state()
+            self._save()
+
+    def start_job(self, video_file: str, platform: str):
+        with self._lock:
+            row = self._rows.get(video_file)
+            if row is None:
+                return
+            row[STATUS_FIELDS[platform]] = 'uploading'
+            row['Timestamp'] = _now()
+            job = self._job_state(video_file, platform)
+            if job.get('committed'):
+                job['committed'] = 0
+                self._save_state()
+            self._save()
+
+    def get_job(self, video_file: str, platform: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._rows.get(video_file)
+            if row is None:
+                return None
+            job = {
+                'video_file': video_file,
+                'platform': platform,
+                'status': row[STATUS_FIELDS[platform]],
+                'url': row.get(URL_FIELDS[platform]) or '',
+                'error': row.get('Error') or '',
+            }
+            job.update({col: '' if 'TEXT' in d else 0 for col, d in JOB_FIELDS.items()})
+            job.update(self._job_state(video_file, platform))
+            return job
+
+    def set_job_fields(self, video_file: str, platform: str, fields: Dict):
+        fields = {k: v for k, v in fields.items() if k in JOB_FIELDS}
+        if not fields:
+            return
+        with self._lock:
+            self._state['jobs'].setdefault(f"{video_file}|{platform}", {}).update(fields)
+            self._save_state()
+
+    def claim_job(self, video_file: str, platform: str, owner: str, ttl: float,
+                  status: str = 'new') -> bool:
+        with self._lock:
+            row = self._rows.get(video_file)
+            job = self._job_state(video_file, platform)
+            if row is None or row[STATUS_FIELDS[platform]] != status or (
+                    job.get('lease_owner') not in (None, '', owner) and self._leased(video_file, platform)):
+                return False
+            self._state['jobs'].setdefault(f"{video_file}|{platform}", {}).update(
+                lease_owner=owner, lease_expires=time.time() + ttl)
+            self._save_state()
+            return True
+
+    def renew_leases(self, owner: str, ttl: float) -> int:
+        with self._lock:
+            held = [job for job in self._state['jobs'].values() if job.get('lease_owner') == owner]
+            for job in held:
+                job['lease_expires'] = time.time() + ttl
+            if held:
+                self._save_state()
+            return len(held)
+
+    def release_jobs(self, owner: str, video_file: Optional[str] = None, platform: Optional[str] = None):
+        with self._lock:
+            keys = [f"{video_file}|{platform}"] if video_file is not None else list(self._state['jobs'])
+            released = False
+            for key in keys:
+                job = self._state['jobs'].get(key)
+                if job and job.get('lease_owner') == owner:
+                    job.update(lease_owner='', lease_expires=0)
+                    released = True
+            if released:
+                self._save_state()
+
+    def leases(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {'video_file': key.rpartition('|')[0], 'platform': key.rpartition('|')[2],
+                 'lease_owner': job['lease_owner'], 'lease_expires': job['lease_expires']}
+                for key, job in self._state['jobs'].items()
+                if job.get('lease_owner') and job.get('lease_expires', 0) >= time.time()
+            ]
+
+    def quota_used(self, project: str, window: str) -> int:
+        with self._lock:
+            return self._state['quota'].get(f"{project}|{window}", 0)
+
+    def reserve_quota(self, project: str, window: str, units: int, limit: int) -> bool:
+        with self._lock:
+            key = f"{project}|{window}"
+            used = self._state['quota'].get(key, 0)
+            if used + units > limit:
+                return False
+            self._state['quota'][key] = used + units
+            self._save_state()
+            return True
+
+    def import_csv(self, csv_path: Path) -> int:
+        if Path(csv_path).resolve() == self.csv_path.resolve():
+            return 0
+        return sum(self.add(row) for row in _read_csv(Path(csv_path)))
+
+    def export_csv(self, csv_path: Path):
+        if Path(csv_path).resolve() == self.csv_path.resolve():
+            return
+        super().export_csv(csv_path)
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _video_id(url: str) -> str:
+    """Platform id from a post URL (watch?v=ID or the last path segment)"""
+    if 'v=' in url:
+        return url.split('v=', 1)[1].split('&', 1)[0]
+    return url.rstrip('/').rsplit('/', 1)[-1] if url else ''
+
+
+class XLSXTracker(CSVTracker):
+    """Tracker on the upload_tracker.xlsx workbook from create_template.py.
+
+    The Videos sheet is streamed once at start through openpyxl's read_only
+    mode. Changes are kept in memory and journaled to the `.state.json` next to
+    the workbook right away; the workbook itself is only written in batches
+    (every XLSX_FLUSH_ROWS results or XLSX_FLUSH_SECONDS, and on flush/close).
+    A batch updates the changed Videos cells and appends one row per result to
+    the platform's log sheet: timestamp, status, URL, error and duration.
+    """
+
+    VIDEOS_SHEET = 'Videos'
+    LOG_SHEETS = {
+        'instagram': 'Instagram Logs',
+        'youtube': 'YouTube Logs',
+        'tiktok': 'TikTok Logs',
+    }
+    # Tracker field -> Videos sheet header, where they differ
+    COLUMNS = {
+        'Instagram URL': 'IG URL',
+        'YouTube URL': 'YT URL',
+        'TikTok URL': 'TT URL',
+    }
+    FLUSH_ROWS = int(os.getenv('XLSX_FLUSH_ROWS', '25'))
+    FLUSH_SECONDS = float(os.getenv('XLSX_FLUSH_SECONDS', '60'))
+
+    def __init__(self, xlsx_path: Union[str, Path] = DEFAULT_XLSX_PATH):
+        # Imported here: it is slow to load and only this backend needs it
+        try:
+            import openpyxl
+        except ImportError:  # Optional: pip install openpyxl
+            raise ImportError("The xlsx tracker needs openpyxl: pip install openpyxl") from None
+        self._openpyxl = openpyxl
+        self.xlsx_path = Path(xlsx_path)
+        self.state_path = self.xlsx_path.with_suffix('.state.json')
+        self._lock = threading.Lock()
+        if not self.xlsx_path.exists():
+            from create_template import create_template
+            create_template(str(self.xlsx_path))
+
+        self._state = {'jobs': {}, 'quota': {}, 'statuses': {}, 'pending': {}, 'log': []}
+        if self.state_path.exists():
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self._state.update(json.load(f))
+        self._log: List[Tuple[str, Dict]] = [tuple(entry) for entry in self._state['log']]
+        self._flushed_at = time.monotonic()
+
+        sheet_rows = self._read_workbook()
+        # What the workbook holds now; rows that differ are written on flush
+        self._flushed = {name: self._sheet_values(row) for name, row in sheet_rows.items()}
+        self._rows = {}
+        for name, row in {**sheet_rows, **self._state['pending']}.items():
+            row = _with_publish_date(row) if name not in self._state['pending'] else dict(row)
+            statuses = self._state['statuses'].get(name)
+            for i, platform in enumerate(PLATFORMS):
+                row[STATUS_FIELDS[platform]] = statuses[i] if statuses else initial_job_status(row, platform)
+            self._rows[name] = row
+
+    @staticmethod
+    def _sheet_values(row: Dict[str, str]) -> Dict[str, str]:
+        return {field: row.get(field) or '' for field in VIDEO_FIELDS if field != 'Timestamp'}
+
+    def _read_workbook(self) -> Dict[str, Dict[str, str]]:
+        """Stream the Videos rows and the log sheet headers (read_only mode)"""
+        workbook = self._openpyxl.load_workbook(self.xlsx_path, read_only=True, data_only=True)
+        try:
+            cells = workbook[self.VIDEOS_SHEET].iter_rows(values_only=True)
+            self._header = [_cell_text(v) for v in next(cells, ())]
+            self._row_numbers: Dict[str, int] = {}
+            self._last_row = 1
+            rows = {}
+            for number, values in enumerate(cells, 2):
+                record = dict(zip(self._header, map(_cell_text, values)))
+                name = record.get('Video File')
+                if not name:
+                    continue
+                rows[name] = {f: record.get(self.COLUMNS.get(f, f), '') for f in FIELDNAMES}
+                self._row_numbers[name] = self._last_row = number
+            self._log_headers = {
+                platform: [_cell_text(v) for v in next(workbook[sheet].iter_rows(values_only=True), ())]
+                for platform, sheet in self.LOG_SHEETS.items() if sheet in workbook.sheetnames
+            }
+            return rows
+        finally:
+            workbook.close()
+
+    def _write_workbook(self):
+        """Apply the journaled changes to the workbook (one load and save per batch)"""
+        workbook = self._openpyxl.load_workbook(self.xlsx_path)
+        sheet = workbook[self.VIDEOS_SHEET]
+        columns = {header: i for i, header in enumerate(self._header, 1) if header}
+        for name, row in self._state['pending'].items():
+            number = self._row_numbers.get(name)
+            if number is None:
+                self._last_row += 1
+                number = self._row_numbers[name] = self._last_row
+            for field in VIDEO_FIELDS:
+                column = columns.get(self.COLUMNS.get(field, field))
+                if column:
+                    sheet.cell(row=number, column=column, value=row.get(field) or None)
+        for platform, entry in self._log:
+            if platform in self._log_headers:
+                workbook[self.LOG_SHEETS[platform]].append(
+                    [entry.get(header) for header in self._log_headers[platform]]
+                )
+
+        tmp_path = self.xlsx_path.with_name(self.xlsx_path.name + '.tmp')
+        workbook.save(tmp_path)
+        try:
+            os.replace(tmp_path, self.xlsx_path)
+        except PermissionError:
+            # Open in Excel on Windows; the journal keeps everything until next time
+            os.remove(tmp_path)
+            print(f"⚠️ {self.xlsx_path} is locked (open in Excel?), will write it later")
+            return
+
+        self._flushed = {name: self._sheet_values(row) for name, row in self._rows.items()}
+        self._state['pending'] = {}
+        self._log.clear()
+        self._flushed_at = time.monotonic()
+
+    def _save(self, force: bool = False):
+        self._state['statuses'] = {
+            name: [row[STATUS_FIELDS[p]] for p in PLATFORMS] for name, row in self._rows.items()
+        }
+        self._state['pending'] = {
+            name: row for name, row in self._rows.items()
+            if self._sheet_values(row) != self._flushed.get(name)
+        }
+        due = len(self._log) >= self.FLUSH_ROWS or time.monotonic() - self._flushed_at >= self.FLUSH_SECONDS
+        if (force or due) and (self._state['pending'] or self._log):
+            self._write_workbook()
+        self._state['log'] = self._log
+        self._save_state()
+
+    def update_job(self, video_file: str, platform: str, status: str,
+                   url: str = '', error: str = '', duration: Optional[float] = None):
+        with self._lock:
+            if video_file not in self._rows:
+                return
+            self._log.append((platform, {
+                'Timestamp': _now(),
+                'Video File': video_file,
+                'Status': status.lower(),
+                'URL': url or None,
+                'Video ID': _video_id(url) or None,
+                'Error': error or None,
+                'Duration (sec)': round(duration, 1) if duration is not None else None,
+            }))
+        super().update_job(video_file, platform, status, url=url, error=error)
+
+    def import_csv(self, csv_path: Path) -> int:
+        return sum(self.add(row) for row in _read_csv(Path(csv_path)))
+
+    def export_csv(self, csv_path: Path):
+        BaseTracker.export_csv(self, csv_path)
+
+    def flush(self):
+        with self._lock:
+            self._save(force=True)
+
+    def close(self):
+        self.flush()
+
+
+BACKENDS = {
+    'sqlite': SQLiteTracker,
+    'csv': CSVTracker,
+    'xlsx': XLSXTracker,
+}
+
+DEFAULT_PATHS = {
+    'sqlite': DEFAULT_DB_PATH,
+    'csv': DEFAULT_CSV_PATH,
+    'xlsx': DEFAULT_XLSX_PATH,
+}
+
+
+def open_tracker(path: Union[str, Path, BaseTracker, None] = None,
+                 backend: Optional[str] = None) -> BaseTracker:
+    """Open a tracker backend.
+
+    The backend comes from `backend`, then the TRACKER_BACKEND env var, then the
+    file extension of `path` (.csv -> csv, .xlsx -> xlsx), and defaults to SQLite.
+    """
+    if isinstance(path, BaseTracker):
+        return path
+
+    suffix = Path(path).suffix.lower() if path is not None else ''
+    backend = (backend or os.getenv('TRACKER_BACKEND', '')).lower()
+    if not backend:
+        backend = {'.csv': 'csv', '.xlsx': 'xlsx'}.get(suffix, 'sqlite')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown tracker backend: {backend}")
+
+    if path is None:
+        path = DEFAULT_PATHS[backend]
+    elif backend == 'sqlite' and suffix in ('.csv', '.xlsx'):
+        path = Path(path).with_suffix('.db')
+    elif backend != 'sqlite' and suffix != f".{backend}":
+        path = Path(path).with_suffix(f".{backend}")
+    return BACKENDS[backend](path)
@@ -3,34 +3,72 @@
 # ═══════════════════════════════════════════════════════════════
 
 import os
-import csv
-import time
-import gc
 from pathlib import Path
+from datetime import datetime, timedelta
 from typing import Optional, Tuple
 from instagrapi import Client as InstagramClient
+from tracker import open_tracker, DATE_FORMAT
+from ratelimit import get_limiter
+from accounts import Account, get_registry
+from hashindex import UploadGuard
+from media import upload_path
+from metrics import METRICS
+
+# Latest posts searched for uploads a crash cut off
+RECONCILE_LOOKBACK = 20
 
 class InstagramUploader:
-    def __init__(self, csv_path: Path):
-        self.csv_path = csv_path
+    platform = 'instagram'
+    
+    def __init__(self, tracker, account: Optional[Account] = None):
+        self.tracker = open_tracker(tracker)
+        self.account = account or get_registry().get(self.platform)
         self.client = None
-        self.session_file = 'instagram_session.json'
-        self.username = os.getenv('INSTAGRAM_USERNAME', 'danie_lalatun')
-        self.password = os.getenv('INSTAGRAM_PASSWORD', '')
+        self.session_file = self.account.get('session_file')
+        self.username = self.account.secret('username', 'danie_lalatun')
+        self.password = self.account.secret('password')
+        self.limiter = get_limiter(self.platform, self.account.name, self.account.get('rate_limit'))
+        # Content-hash claims: never post the same clip twice
+        self.guard = UploadGuard(self.tracker, self.platform)
+    
+    def _session_valid(self) -> bool:
+        """Cheap authenticated call to check the loaded session"""
+        try:
+            self.client.account_info()
+            return True
+        except Exception:
+            return False
     
     def connect(self) -> bool:
-        """Connect to Instagram"""
-        print("🔑 [Instagram] Logging in...")
+        """Connect to Instagram, reusing the saved session when it still works"""
+        with METRICS.span(self.platform, 'login', account=self.account.name) as span:
+            span.ok = self._connect()
+        return span.ok
+    
+    def _connect(self) -> bool:
+        print(f"🔑 [Instagram:{self.account.name}] Connecting...")
         self.client = InstagramClient()
         
         try:
             if os.path.exists(self.session_file):
                 self.client.load_settings(self.session_file)
+                if self._session_valid():
+                    print("✅ [Instagram] Session restored\n")
+                    return True
+                
+                # Log in again as the same device, without the stale auth
+                print("   Saved session expired, logging in...")
+                uuids = self.client.get_settings().get('uuids')
+                self.client.set_settings({})
+                if uuids:
+                    self.client.set_uuids(uuids)
+            
             self.client.login(self.username, self.password)
-            print("✅ [Instagram] Logged in\n")
+            self.client.dump_settings(self.session_file)
+            print("✅ [Instagram] Logged in (session saved)\n")
             return True
         except Exception as e:
-            print(f"❌ [Instagram] Login failed: {e}\n")
+            print(f"❌ [Instagram:{self.account.name}] Login failed: {e}\n")
             return False
     
     def upload(self, video_path: Path, caption: str) -> Tuple[bool, str]:
@@ -47,10 +85,6 @@ class InstagramUploader:
             url = f"https://www.instagram.com/reel/{media.code}/"
             print(f"✅ [Instagram] Posted: {url}\n")
             
-            del media
-            gc.collect()
-            time.sleep(2)
-            
             return True, url
         except Exception as e:
             error_msg = str(e)[:100]
@@ -58,63 +92,96 @@ class InstagramUploader:
             return False, error_msg
     
     def disconnect(self):
-        """Close session"""
+        """Save the session for the next run (no logout, so it stays valid)"""
         try:
             if self.client:
                 self.client.dump_settings(self.session_file)
-                self.client.logout()
         except:
             pass
     
-    def process_videos(self, queue_dir: Path) -> int:
-        """Process all new videos from CSV"""
+    def process_job(self, row: dict, queue_dir: Path) -> Optional[bool]:
+        """Upload one tracker row and record the Instagram job result
+        
+        Returns None when the video was already posted (duplicate content).
+        """
+        video_name = row.get('Video File', '')
+        video_path = upload_path(self.tracker, video_name, self.platform, queue_dir)
+        if not video_path.exists():
+            self.tracker.update_job(video_name, self.platform, 'error', error='File not found')
+            return False
+        
+        if not self.guard.begin(video_name, queue_dir):
+            return None
+        
+        self.tracker.set_job_fields(video_name, self.platform, {'account': self.account.name})
+        caption = row.get('Caption', '')
+        self.limiter.wait()
+        self.tracker.start_job(video_name, self.platform)
+        with METRICS.span(self.platform, 'upload', video_name, self.account.name,
+                          video_path.stat().st_size) as span:
+            success, result = self.upload(video_path, caption)
+            span.ok = success
+        self.limiter.report(success, result)
+        
+        self.guard.end(video_name, success, result)
+        
+        # Committed right away, so a crash never loses a finished upload
+        if success:
+            self.tracker.update_job(video_name, self.platform, 'published', url=result, duration=span.seconds)
+        else:
+            self.tracker.update_job(video_name, self.platform, 'error', error=result, duration=span.seconds)
+        
+        return success
+    
+    def reconcile(self, rows: list, queue_dir: Path):
+        """Settle jobs a crash left `uploading`
+        
+        Instagram keeps no hidden field to tag an upload with, so a recent
+        post with the job's caption, posted after the upload started, counts
+        as that upload. Jobs with no match go back to the queue.
+        """
         if not self.connect():
+            return  # Still `uploading`; checked again on the next start
+        try:
+            recent = self.client.user_medias(self.client.user_id, RECONCILE_LOOKBACK)
+        except Exception as e:
+            print(f"⚠️ [Instagram:{self.account.name}] Can't list recent posts, checking next start: {e}\n")
+            self.disconnect()
+            return
+        
+        matched = set()
+        try:
+            for row in rows:
+                video_name = row['Video File']
+                caption = (row.get('Caption') or '').strip()
+                started = (self.tracker.get_job(video_name, self.platform) or {}).get('updated_at')
+                since = datetime.strptime(started, DATE_FORMAT).astimezone() - timedelta(minutes=5) if started else None
+                media = next((
+                    m for m in recent
+                    if m.code not in matched and (m.caption_text or '').strip() == caption
+                    and (since is None or m.taken_at >= since)
+                ), None)
+                if media:
+                    matched.add(media.code)
+                    self.guard.recover(video_name, queue_dir, f"https://www.instagram.com/reel/{media.code}/")
+                else:
+                    self.tracker.update_job(video_name, self.platform, 'new')
+                    print(f"↩️  [Instagram] {video_name} was not posted, back in the queue")
+        finally:
+            self.disconnect()
+    
+    def process_videos(self, queue_dir: Path, rows: Optional[list] = None) -> int:
+        """Process new Instagram jobs: `rows` if given, else every job this account owns"""
+        if rows is None:
+            rows = [r for r in self.tracker.jobs(self.platform, 'new') if self.account.owns(r)]
+        if not rows or not self.connect():
             return 0
         
         count = 0
         try:
-            # Read CSV
-            rows = []
-            if self.csv_path.exists():
-                with open(self.csv_path, 'r', encoding='utf-8-sig') as f:
-                    reader = csv.DictReader(f)
-                    rows = list(reader)
-            
-            # Find new videos
             for row in rows:
-                if row.get('Status', '').lower() != 'new':
-                    continue
-                
-                video_name = row.get('Video File', '')
-                if not video_name:
-                    continue
-                
-                video_path = queue_dir / video_name
-                if not video_path.exists():
-                    row['Status'] = 'error'
-                    row['Error'] = 'File not found'
-                    continue
-                
-                caption = row.get('Caption', '')
-                success, result = self.upload(video_path, caption)
-                
-                if success:
-                    row['Status'] = 'published'
-                    row['URL'] = result
-                    row['Error'] = ''
+                if self.process_job(row, queue_dir):
                     count += 1
-                else:
-                    row['Status'] = 'error'
-                    row['Error'] = result
-                
-                time.sleep(2)
-            
-            # Write updated CSV
-            if rows:
-                with open(self.csv_path, 'w', encoding='utf-8', newline='') as f:
-                    writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-                    writer.writeheader()
-                    writer.writerows(rows)
         
         finally:
             self.disconnect()
@@ -125,7 +192,10 @@ if __name__ == "__main__":
     queue_dir = Path('videos_queue')
     csv_path = Path('upload_tracker.csv')
     
-    uploader = InstagramUploader(csv_path)
+    tracker = open_tracker()
+    tracker.import_csv(csv_path)
+    uploader = InstagramUploader(tracker)
     posted = uploader.process_videos(queue_dir)
+    tracker.export_csv(csv_path)
     
     print(f"\n✅ Instagram: {posted} videos posted")
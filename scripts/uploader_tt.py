@@ -3,186 +3,447 @@
 # ═══════════════════════════════════════════════════════════════
 
 import os
-import csv
+import re
 import time
 import asyncio
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Tuple
+from typing import Iterable, Optional, Tuple
 from playwright.async_api import async_playwright
+from tracker import open_tracker
+from accounts import Account, get_registry
+from hashindex import UploadGuard
+from media import upload_path
+from metrics import METRICS
+from ratelimit import get_limiter
+
+# Page signals the upload flow waits on
+FILE_INPUT = 'input[type="file"]'
+LOGIN_BUTTON = 'button:has-text("Log in")'
+CAPTION_INPUT = 'textarea, [contenteditable="true"]'
+POST_BUTTON_READY = (
+    'button:has-text("Post"):not([disabled]):not([aria-disabled="true"]), '
+    'button:has-text("Publish"):not([disabled]):not([aria-disabled="true"])'
+)
+UPLOAD_DONE_MARKER = 'text=/Uploaded|100%/'
+PUBLISHED_MARKER = 'text=/(video|post) (has been|is being) (uploaded|published|posted)|Manage your posts|View profile/i'
+
+# Network responses that mean "video processed" / "post created"
+PROCESSED_RESPONSE = re.compile(r'/(upload|video)/.*(commit|complete|finish|status)', re.I)
+PUBLISHED_RESPONSE = re.compile(r'/(project/post|post/create|publish)', re.I)
 
 class TikTokUploader:
-    def __init__(self, csv_path: Path):
-        self.csv_path = csv_path
-        self.username = os.getenv('TIKTOK_USERNAME', '')
-        self.password = os.getenv('TIKTOK_PASSWORD', '')
+    platform = 'tiktok'
+    upload_url = "https://www.tiktok.com/upload"
+    
+    # Upper bounds per step (ms); processing also scales with file size
+    timeouts = {
+        'page': 30000,
+        'login': 60000,
+        'caption': 15000,
+        'processing_min': 60000,
+        'processing_per_mb': 2000,
+        'processing_max': 900000,
+        'publish': 60000,
+    }
+    
+    def __init__(self, tracker, account: Optional[Account] = None):
+        self.tracker = open_tracker(tracker)
+        self.account = account or get_registry().get(self.platform)
+        self.username = self.account.secret('username')
+        self.password = self.account.secret('password')
         self.headless = True  # Set to False for debugging
+        self.state_file = self.account.get('state_file')  # Saved login (cookies + storage)
+        # Parallel uploads, one isolated browser context each
+        self.concurrency = max(1, int(os.getenv('TIKTOK_CONCURRENCY', '2')))
+        self._playwright = None
+        self.browser = None
+        self._contexts = None
+        self._all_contexts = []
+        self._start_lock = asyncio.Lock()
+        # Shared by all context slots, so parallel uploads are spaced out too
+        self.limiter = get_limiter(self.platform, self.account.name, self.account.get('rate_limit'))
+        # Content-hash claims: never post the same clip twice
+        self.guard = UploadGuard(self.tracker, self.platform)
     
-    async def upload(self, video_path: Path, caption: str, tags: list) -> Tuple[bool, str]:
-        """Upload to TikTok via Playwright"""
+    async def _new_context(self):
+        """New browser context, restored from the saved login if there is one"""
+        kwargs = {'viewport': {'width': 1920, 'height': 1080}}
+        if os.path.exists(self.state_file):
+            kwargs['storage_state'] = self.state_file
+        context = await self.browser.new_context(**kwargs)
+        self._all_contexts.append(context)
+        return context
+    
+    async def _save_state(self, context):
         try:
-            print(f"📤 [TikTok] Uploading {video_path.name}...")
-            
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=self.headless)
-                context = await browser.new_context(
-                    viewport={'width': 1920, 'height': 1080}
+            await context.storage_state(path=self.state_file)
+        except Exception as e:
+            print(f"⚠️ [TikTok] Could not save session: {e}")
+    
+    @contextmanager
+    def _step(self, video_name: str, step: str, nbytes: int = 0):
+        """Measure one upload step and record it in the metrics"""
+        span = None
+        try:
+            with METRICS.span(self.platform, step, video_name, self.account.name, nbytes) as span:
+                yield span
+        finally:
+            if span is not None:
+                print(f"   ⏱️ {step}: {span.seconds:.1f}s{'' if span.ok else ' (failed)'}")
+    
+    @staticmethod
+    async def _first_signal(waiters, timeout_ms: int):
+        """Wait until any waiter succeeds; cancel the rest.
+        
+        Waiters that fail (e.g. a selector that never matches) are ignored as
+        long as another one can still succeed within `timeout_ms`.
+        """
+        tasks = [asyncio.ensure_future(w) for w in waiters]
+        deadline = time.monotonic() + timeout_ms / 1000
+        errors = []
+        try:
+            pending = set(tasks)
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
                 )
-                page = await context.new_page()
-                
-                # Go to TikTok
-                await page.goto("https://www.tiktok.com/upload", wait_until='networkidle')
-                
-                # Check if login needed
-                try:
-                    # Try to find login button (if not logged in)
-                    login_btn = await page.query_selector('button:has-text("Log in")', timeout=5000)
-                    if login_btn:
-                        print("   Logging in...")
-                        await page.click('button:has-text("Log in")')
-                        await page.wait_for_timeout(2000)
-                        
-                        # Use phone/email login
-                        await page.click('button:has-text("Use phone or email")')
-                        await page.wait_for_timeout(1000)
-                        
-                        # Fill username
-                        await page.fill('input[name="username"]', self.username)
-                        await page.wait_for_timeout(500)
-                        
-                        # Fill password
-                        await page.fill('input[type="password"]', self.password)
-                        await page.wait_for_timeout(500)
-                        
-                        # Submit
-                        await page.click('button[type="submit"]')
-                        await page.wait_for_timeout(5000)
-                except:
-                    pass  # Already logged in or different flow
-                
-                # Wait for upload page
-                await page.wait_for_load_state('networkidle', timeout=15000)
-                
-                # Upload video
-                print("   Selecting video...")
-                file_input = await page.query_selector('input[type="file"]')
-                if file_input:
-                    await file_input.set_input_files(str(video_path))
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+            raise TimeoutError(f"No signal within {timeout_ms / 1000:g}s"
+                               + (f" ({errors[0]})" if errors else ""))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _open_upload_page(self, page) -> bool:
+        """Open the upload page. Returns True if it asks for a login."""
+        timeout = self.timeouts['page']
+        await page.goto(self.upload_url, wait_until='domcontentloaded', timeout=timeout)
+        element = await self._first_signal([
+            page.wait_for_selector(FILE_INPUT, state='attached', timeout=timeout),
+            page.wait_for_selector(LOGIN_BUTTON, state='visible', timeout=timeout),
+        ], timeout)
+        return await element.get_attribute('type') != 'file'
+    
+    async def _login(self, page):
+        """Log in with phone/email and save the session"""
+        timeout = self.timeouts['login']
+        print("   Logging in...")
+        await page.click(LOGIN_BUTTON, timeout=timeout)
+        
+        # Use phone/email login
+        await page.click('button:has-text("Use phone or email")', timeout=timeout)
+        
+        # Fill username and password
+        await page.fill('input[name="username"]', self.username, timeout=timeout)
+        await page.fill('input[type="password"]', self.password, timeout=timeout)
+        
+        # Submit and wait until the upload form shows up
+        await page.click('button[type="submit"]', timeout=timeout)
+        await page.wait_for_selector(FILE_INPUT, state='attached', timeout=timeout)
+        
+        await self._save_state(page.context)
+    
+    async def start(self) -> bool:
+        """Launch one browser for the whole run and fill the context pool"""
+        async with self._start_lock:
+            if self.browser:
+                return True
+            with METRICS.span(self.platform, 'login', account=self.account.name) as span:
+                span.ok = await self._start()
+            return span.ok
+    
+    async def _start(self) -> bool:
+        print(f"🔑 [TikTok:{self.account.name}] Starting browser...")
+        try:
+            self._playwright = await async_playwright().start()
+            self.browser = await self._playwright.chromium.launch(headless=self.headless)
+            
+            # Check the saved session once; log in only if it has expired
+            context = await self._new_context()
+            page = await context.new_page()
+            try:
+                if await self._open_upload_page(page):
+                    await self._login(page)
+                    print("✅ [TikTok] Logged in (session saved)\n")
                 else:
-                    # Try drop area
-                    await page.set_input_files('input[type="file"]', str(video_path))
-                
-                await page.wait_for_timeout(10000)  # Wait for encoding
-                
-                # Fill caption
-                print("   Adding caption...")
-                caption_full = f"{caption}\n{' '.join([f'#{tag}' for tag in tags])}"
-                
-                # Try different selectors for caption
-                caption_input = None
-                try:
-                    caption_input = await page.query_selector('textarea')
-                except:
-                    try:
-                        caption_input = await page.query_selector('[contenteditable="true"]')
-                    except:
-                        pass
-                
-                if caption_input:
-                    await caption_input.fill(caption_full)
-                
-                # Submit
-                print("   Publishing...")
-                post_btn = await page.query_selector('button:has-text("Post")')
-                if post_btn:
-                    await post_btn.click()
+                    print("✅ [TikTok] Session restored\n")
+            finally:
+                await page.close()
+            
+            self._contexts = asyncio.Queue()
+            self._contexts.put_nowait(context)
+            for _ in range(self.concurrency - 1):
+                self._contexts.put_nowait(await self._new_context())
+            return True
+        
+        except Exception as e:
+            print(f"❌ [TikTok] Browser start failed: {e}\n")
+            await self.stop()
+            return False
+    
+    async def stop(self):
+        """Save the session and close the browser"""
+        try:
+            if self._all_contexts:
+                await self._save_state(self._all_contexts[0])
+            for context in self._all_contexts:
+                await context.close()
+            if self.browser:
+                await self.browser.close()
+            if self._playwright:
+                await self._playwright.stop()
+        except Exception:
+            pass
+        finally:
+            self._all_contexts = []
+            self._contexts = None
+            self.browser = None
+            self._playwright = None
+    
+    async def upload(self, video_path: Path, caption: str, tags: list,
+                     video_name: Optional[str] = None) -> Tuple[bool, str]:
+        """Upload to TikTok via Playwright, on a pooled browser context
+        
+        Waits for a free context, so at most `concurrency` uploads run at once.
+        Each upload gets its own page, closed afterwards even on failure.
+        `video_name` is the tracker key when `video_path` is a prepared copy.
+        """
+        if not await self.start():
+            return False, 'Browser not started'
+        
+        context = await self._contexts.get()
+        page = None
+        name = video_path.name
+        waiters = []  # Signal listeners started ahead of the action they observe
+        throttled = []  # 429 responses seen while uploading
+        try:
+            print(f"📤 [TikTok] Uploading {name}...")
+            
+            page = await context.new_page()
+            page.on('response', lambda r: throttled.append(r.url) if r.status == 429 else None)
+            
+            # Go to TikTok; the session may have expired mid-run
+            with self._step(name, 'open'):
+                if await self._open_upload_page(page):
+                    await self._login(page)
+            
+            # Wait until TikTok has processed the file: whichever comes first of
+            # the processing response, the progress UI finishing, or Post enabling.
+            # Listen before selecting the file so a fast response isn't missed.
+            size_mb = video_path.stat().st_size / (1024 * 1024)
+            processing_timeout = int(min(
+                self.timeouts['processing_max'],
+                max(self.timeouts['processing_min'], size_mb * self.timeouts['processing_per_mb'])
+            ))
+            processed = asyncio.ensure_future(page.wait_for_event(
+                'response',
+                lambda r: r.ok and bool(PROCESSED_RESPONSE.search(r.url)),
+                timeout=processing_timeout
+            ))
+            waiters.append(processed)
+            
+            # Upload video
+            print("   Selecting video...")
+            with self._step(name, 'select', video_path.stat().st_size):
+                await page.set_input_files(FILE_INPUT, str(video_path))
+            
+            with self._step(name, 'processing'):
+                await self._first_signal([
+                    processed,
+                    page.wait_for_selector(UPLOAD_DONE_MARKER, timeout=processing_timeout),
+                    page.wait_for_selector(POST_BUTTON_READY, timeout=processing_timeout),
+                ], processing_timeout)
+            
+            # Fill caption
+            print("   Adding caption...")
+            caption_full = f"{caption}\n{' '.join([f'#{tag}' for tag in tags])}"
+            with self._step(name, 'caption'):
+                caption_input = await page.wait_for_selector(
+                    CAPTION_INPUT, timeout=self.timeouts['caption']
+                )
+                await caption_input.fill(caption_full)
+            
+            # Submit once the Post button is actually enabled
+            print("   Publishing...")
+            with self._step(name, 'post_ready'):
+                post_btn = await page.wait_for_selector(
+                    POST_BUTTON_READY, timeout=processing_timeout
+                )
+            
+            with self._step(name, 'publish'):
+                publish_timeout = self.timeouts['publish']
+                confirmation = [
+                    page.wait_for_event(
+                        'response',
+                        lambda r: r.ok and r.request.method == 'POST'
+                        and bool(PUBLISHED_RESPONSE.search(r.url)),
+                        timeout=publish_timeout
+                    ),
+                    page.wait_for_selector(PUBLISHED_MARKER, timeout=publish_timeout),
+                ]
+                confirmation = [asyncio.ensure_future(w) for w in confirmation]
+                waiters.extend(confirmation)
+                # Past this click the video may be live even if we crash
+                self.tracker.set_job_fields(video_name or name, self.platform, {'committed': 1})
+                await post_btn.click()
+                await self._first_signal(confirmation, publish_timeout)
+            
+            # Try to get URL (may not be available immediately)
+            try:
+                url_elem = await page.query_selector('a[href*="tiktok.com"]')
+                if url_elem:
+                    url = await url_elem.get_attribute('href')
                 else:
-                    # Try another selector
-                    post_btn = await page.query_selector('button:has-text("Publish")')
-                    if post_btn:
-                        await post_btn.click()
-                
-                # Wait for confirmation
-                await page.wait_for_load_state('networkidle', timeout=30000)
-                
-                # Try to get URL (may not be available immediately)
-                try:
-                    url_elem = await page.query_selector('a[href*="tiktok.com"]')
-                    if url_elem:
-                        url = await url_elem.get_attribute('href')
-                    else:
-                        url = "https://www.tiktok.com/upload"  # Fallback
-                except:
-                    url = "https://www.tiktok.com/upload"
-                
-                print(f"✅ [TikTok] Posted!\n")
-                
-                await browser.close()
-                return True, url
+                    url = self.upload_url  # Fallback
+            except:
+                url = self.upload_url
+            
+            print(f"✅ [TikTok] Posted!\n")
+            return True, url
         
         except Exception as e:
             error_msg = str(e)[:100]
+            if throttled:
+                error_msg = f"HTTP 429 (too many requests): {error_msg}"
             print(f"❌ [TikTok] Error: {error_msg}\n")
             return False, error_msg
+        
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            if page:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            if self._contexts is not None:
+                self._contexts.put_nowait(context)
+            else:
+                # stop() ran meanwhile; the pool is gone, so don't hand the context back
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+    
+    async def process_job(self, row: dict, queue_dir: Path) -> Optional[bool]:
+        """Upload one tracker row and record the TikTok job result
+        
+        Returns None when the video was already posted (duplicate content).
+        """
+        video_name = row.get('Video File', '')
+        video_path = upload_path(self.tracker, video_name, self.platform, queue_dir)
+        if not video_path.exists():
+            self.tracker.update_job(video_name, self.platform, 'error', error='File not found')
+            return False
+        
+        if not self.guard.begin(video_name, queue_dir):
+            return None
+        
+        self.tracker.set_job_fields(video_name, self.platform, {'account': self.account.name})
+        caption = row.get('Caption', '')
+        tags = row.get('Tags', '').split(',') if row.get('Tags') else []
+        
+        await self.limiter.wait_async()
+        self.tracker.start_job(video_name, self.platform)
+        with METRICS.span(self.platform, 'upload', video_name, self.account.name,
+                          video_path.stat().st_size) as span:
+            success, result = await self.upload(video_path, caption, tags, video_name)
+            span.ok = success
+        self.limiter.report(success, result)
+        
+        self.guard.end(video_name, success, result)
+        
+        # Committed right away, so a crash never loses a finished upload
+        if success:
+            self.tracker.update_job(video_name, self.platform, 'published', url=result, duration=span.seconds)
+        else:
+            self.tracker.update_job(video_name, self.platform, 'error', error=result, duration=span.seconds)
+        
+        return success
+    
+    def reconcile(self, rows: list, queue_dir: Path):
+        """Settle jobs a crash left `uploading`
+        
+        TikTok has no API to look posts up, so this goes by how far the upload
+        got: before Post was clicked nothing is live and the job goes back to
+        the queue; after it, the job is flagged for a look at the profile.
+        """
+        for row in rows:
+            video_name = row['Video File']
+            job = self.tracker.get_job(video_name, self.platform) or {}
+            if job.get('committed'):
+                self.tracker.update_job(video_name, self.platform, 'error',
+                                        error='Interrupted after Post; check the profile, then set to new')
+                print(f"⚠️ [TikTok] {video_name}: interrupted after Post was clicked, marked error")
+            else:
+                self.tracker.update_job(video_name, self.platform, 'new')
+                print(f"↩️  [TikTok] {video_name} was not posted, back in the queue")
     
-    async def process_videos(self, queue_dir: Path) -> int:
-        """Process all new videos from CSV"""
+    async def process_videos(self, queue_dir: Path, rows: Optional[Iterable[dict]] = None) -> int:
+        """Process new TikTok jobs: `rows` if given, else every job this account owns
+        
+        `rows` may be a lazy iterator that blocks until each row is ready (files
+        still being prepared, leases taken as it goes). It is read in a thread,
+        one row per free upload slot, so uploads start as rows come in.
+        """
         count = 0
         try:
-            # Read CSV
-            rows = []
-            if self.csv_path.exists():
-                with open(self.csv_path, 'r', encoding='utf-8-sig') as f:
-                    reader = csv.DictReader(f)
-                    rows = list(reader)
+            if rows is None:
+                rows = [r for r in self.tracker.jobs(self.platform, 'new') if self.account.owns(r)]
+            rows = iter(rows)
+            row = await asyncio.to_thread(next, rows, None)
+            if row is None or not await self.start():
+                return 0
             
-            # Find new videos
-            for row in rows:
-                if row.get('Status', '').lower() != 'new':
-                    continue
-                
-                video_name = row.get('Video File', '')
-                if not video_name:
-                    continue
-                
-                video_path = queue_dir / video_name
-                if not video_path.exists():
-                    row['Status'] = 'error'
-                    row['Error'] = 'File not found'
-                    continue
-                
-                caption = row.get('Caption', '')
-                tags = row.get('Tags', '').split(',') if row.get('Tags') else []
-                
-                success, result = await self.upload(video_path, caption, tags)
-                
-                if success:
-                    row['Status'] = 'published'
-                    row['TikTok URL'] = result
-                    row['Error'] = ''
-                    count += 1
-                else:
-                    row['Status'] = 'error'
-                    row['Error'] = result
-                
-                await asyncio.sleep(5)  # Rate limiting
+            # Up to `concurrency` uploads at once; each result is written to the
+            # tracker as soon as that upload finishes
+            semaphore = asyncio.Semaphore(self.concurrency)
+            
+            async def run(row):
+                nonlocal count
+                try:
+                    if await self.process_job(row, queue_dir):
+                        count += 1
+                except Exception as e:
+                    print(f"❌ [TikTok] {row.get('Video File')}: {e}\n")
+                finally:
+                    semaphore.release()
             
-            # Write updated CSV
-            if rows:
-                with open(self.csv_path, 'w', encoding='utf-8', newline='') as f:
-                    writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-                    writer.writeheader()
-                    writer.writerows(rows)
+            tasks = []
+            try:
+                while row is not None:
+                    await semaphore.acquire()
+                    tasks.append(asyncio.create_task(run(row)))
+                    row = await asyncio.to_thread(next, rows, None)
+            finally:
+                # Let uploads already under way finish before the browser stops
+                await asyncio.gather(*tasks, return_exceptions=True)
         
         except Exception as e:
             print(f"❌ [TikTok] Process error: {e}\n")
         
+        finally:
+            await self.stop()
+        
         return count
 
 if __name__ == "__main__":
     queue_dir = Path('videos_queue')
     csv_path = Path('upload_tracker.csv')
     
-    uploader = TikTokUploader(csv_path)
+    tracker = open_tracker()
+    tracker.import_csv(csv_path)
+    uploader = TikTokUploader(tracker)
     posted = asyncio.run(uploader.process_videos(queue_dir))
+    tracker.export_csv(csv_path)
     
     print(f"\n✅ TikTok: {posted} videos posted")
@@ -3,69 +3,276 @@
 # ═══════════════════════════════════════════════════════════════
 
 import os
-import csv
 import time
+import json
 import pickle
+import random
+import threading
+import httplib2
 from pathlib import Path
-from typing import Tuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
 from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
+from tracker import open_tracker, upload_tag
+from quota import QuotaAccountant, QuotaExceeded, VIDEO_INSERT_COST, project_id
+from accounts import Account, get_registry
+from hashindex import UploadGuard
+from media import mimetype_for, upload_path
+from ratelimit import get_limiter
+from metrics import METRICS
+
+# Resumable upload chunks must be multiples of 256 KB
+CHUNK_UNIT = 256 * 1024
+MIN_CHUNK_SIZE = 4 * CHUNK_UNIT          # 1 MB
+MAX_CHUNK_SIZE = 1024 * CHUNK_UNIT       # 256 MB
+TARGET_CHUNK_SECONDS = 15                # Aim for chunks that take this long
+
+# Retry policy for transient errors
+MAX_RETRIES = 8
+BACKOFF_BASE = 2.0   # Seconds
+BACKOFF_CAP = 120.0  # Seconds
+
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+TRANSIENT_REASONS = RATE_LIMIT_REASONS | {'backendError', 'internalError'}
+# Resumable session is gone (expired or unknown): start a fresh one
+SESSION_GONE_STATUSES = {404, 410}
+# Daily limits: retrying today is pointless, defer to the next quota window
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded', 'uploadLimitExceeded'}
+
+# API description used to build the client. Read from this file if present,
+# else from the copy bundled with googleapiclient; only fetched (and saved
+# here) when neither exists
+DISCOVERY_FILE = os.getenv('YOUTUBE_DISCOVERY_FILE', 'youtube_discovery_v3.json')
+DISCOVERY_URL = 'https://youtube.googleapis.com/$discovery/rest?version=v3'
+
+# Access tokens live ~1 hour. Refresh in the background this long before
+# expiry; only block on a refresh when less than TOKEN_MIN_VALID is left
+TOKEN_REFRESH_AHEAD = timedelta(minutes=10)
+TOKEN_MIN_VALID = timedelta(minutes=2)
+TOKEN_RETRY_SECONDS = 60.0
+
+# Latest channel uploads searched for uploads a crash cut off
+# (channels.list + playlistItems.list + videos.list, 1 unit each)
+RECONCILE_LOOKBACK = 50
+RECONCILE_COST = 3
+
+_discovery: Optional[Dict] = None
+_discovery_lock = threading.Lock()
+
+
+def _error_reason(error: HttpError) -> str:
+    try:
+        return json.loads(error.content)['error']['errors'][0]['reason']
+    except Exception:
+        return ''
+
+
+def is_transient(error: Exception) -> bool:
+    """True for errors worth retrying: 5xx, rate limits and network failures"""
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        return status in TRANSIENT_STATUSES or (
+            status == 403 and _error_reason(error) in TRANSIENT_REASONS
+        )
+    return isinstance(error, (OSError, TimeoutError, httplib2.HttpLib2Error))
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, capped"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def discovery_document() -> Dict:
+    """The YouTube v3 discovery document, loaded once per process"""
+    global _discovery
+    with _discovery_lock:
+        if _discovery is None:
+            _discovery = json.loads(_read_discovery())
+        return _discovery
+
+
+def _read_discovery() -> str:
+    if os.path.exists(DISCOVERY_FILE):
+        with open(DISCOVERY_FILE, 'r', encoding='utf-8') as f:
+            return f.read()
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        document = get_static_doc('youtube', 'v3')
+    except ImportError:  # googleapiclient < 2.0 ships no documents
+        document = None
+    if document:
+        return document
+    
+    print(f"🌐 [YouTube] Fetching the API description once (cached in {DISCOVERY_FILE})")
+    response, content = httplib2.Http(timeout=30).request(DISCOVERY_URL)
+    if response.status != 200:
+        raise RuntimeError(f"Discovery document request failed: HTTP {response.status}")
+    document = content.decode('utf-8')
+    tmp_path = f"{DISCOVERY_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(document)
+    os.replace(tmp_path, DISCOVERY_FILE)
+    return document
+
+
+def token_lifetime(credentials: Credentials) -> Optional[timedelta]:
+    """Time until the access token expires (None if it has no expiry)"""
+    if credentials.expiry is None:
+        return None
+    # google-auth keeps expiry as naive UTC
+    return credentials.expiry - datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def save_credentials(credentials: Credentials, token_file: Path):
+    """Write the token as JSON (swapped in whole, readable by the owner only)"""
+    tmp_path = token_file.with_name(token_file.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(credentials.to_json())
+    try:
+        os.chmod(tmp_path, 0o600)
+    except OSError:
+        pass
+    os.replace(tmp_path, token_file)
+
+
+def load_credentials(token_file: Path, scopes: list) -> Optional[Credentials]:
+    """Saved credentials, converting a token pickled by older versions once"""
+    if token_file.exists():
+        # With the scopes it was granted: asking a refresh for more fails
+        return Credentials.from_authorized_user_file(str(token_file))
+    legacy = token_file.with_suffix('.pickle')
+    if not legacy.exists():
+        return None
+    with open(legacy, 'rb') as f:
+        credentials = pickle.load(f)
+    save_credentials(credentials, token_file)
+    legacy.unlink()
+    print(f"🔁 [YouTube] Converted {legacy.name} to {token_file.name}")
+    return credentials
+
+
+class TokenRefresher:
+    """Daemon thread that refreshes an access token TOKEN_REFRESH_AHEAD before
+    it expires and saves it, so uploads never wait on the token endpoint"""
+    
+    def __init__(self, credentials: Credentials, token_file: Path, label: str):
+        self.credentials = credentials
+        self.token_file = token_file
+        self.label = label
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"token-refresh-{label}", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while True:
+            lifetime = token_lifetime(self.credentials)
+            if lifetime is None:
+                return
+            if self._stop.wait(max(0.0, (lifetime - TOKEN_REFRESH_AHEAD).total_seconds())):
+                return
+            try:
+                self.credentials.refresh(Request())
+                save_credentials(self.credentials, self.token_file)
+            except Exception as e:
+                # The client still refreshes on its own if the token runs out
+                print(f"⚠️ [YouTube:{self.label}] Token refresh failed, retrying: {e}")
+                if self._stop.wait(TOKEN_RETRY_SECONDS):
+                    return
+
 
 class YouTubeUploader:
-    def __init__(self, csv_path: Path):
-        self.csv_path = csv_path
+    platform = 'youtube'
+    
+    def __init__(self, tracker, account: Optional[Account] = None):
+        self.tracker = open_tracker(tracker)
+        self.account = account or get_registry().get(self.platform)
         self.youtube = None
         self.credentials = None
-        self.credentials_file = 'youtube_credentials.json'
-        self.token_file = 'youtube_token.pickle'
-        self.scopes = ['https://www.googleapis.com/auth/youtube.upload']
+        self.credentials_file = self.account.get('credentials_file')
+        # JSON, also for accounts configured with an old `.pickle` name (converted on first use)
+        self.token_file = Path(self.account.get('token_file')).with_suffix('.json')
+        self.refresher = None
+        # Read access finds uploads a crash cut off (tokens saved before keep upload only)
+        self.scopes = ['https://www.googleapis.com/auth/youtube.upload',
+                       'https://www.googleapis.com/auth/youtube.readonly']
+        # Starting chunk size; tuned to measured throughput as chunks go out
+        self.chunk_size = 10 * 1024 * 1024
+        self.quota = QuotaAccountant(self.tracker, project_id(self.credentials_file))
+        self.limiter = get_limiter(self.platform, self.account.name, self.account.get('rate_limit'))
+        # Content-hash claims: never post the same clip twice
+        self.guard = UploadGuard(self.tracker, self.platform)
     
     def authenticate(self) -> bool:
         """Authenticate with YouTube API"""
-        print("🔑 [YouTube] Authenticating...")
+        with METRICS.span(self.platform, 'login', account=self.account.name) as span:
+            span.ok = self._authenticate()
+        return span.ok
+    
+    def _authenticate(self) -> bool:
+        print(f"🔑 [YouTube:{self.account.name}] Authenticating...")
         
         try:
-            # Try token first
-            if os.path.exists(self.token_file):
-                with open(self.token_file, 'rb') as f:
-                    self.credentials = pickle.load(f)
-            
-            # Refresh if needed
-            if self.credentials:
-                if self.credentials.expired and self.credentials.refresh_token:
+            # Try token first; no network call while it has time left
+            self.credentials = load_credentials(self.token_file, self.scopes)
+            how = 'saved token'
+            if self.credentials and self.credentials.refresh_token:
+                lifetime = token_lifetime(self.credentials)
+                if lifetime is not None and lifetime < TOKEN_MIN_VALID:
                     self.credentials.refresh(Request())
-                if self.credentials.valid:
-                    self.youtube = build('youtube', 'v3', credentials=self.credentials)
-                    print("✅ [YouTube] Authenticated (token refreshed)\n")
-                    return True
+                    save_credentials(self.credentials, self.token_file)
+                    how = 'token refreshed'
+            elif self.credentials and not self.credentials.valid:
+                self.credentials = None
             
             # New auth
-            if not os.path.exists(self.credentials_file):
-                print("❌ [YouTube] youtube_credentials.json not found\n")
-                return False
-            
-            flow = InstalledAppFlow.from_client_secrets_file(
-                self.credentials_file,
-                self.scopes
-            )
-            self.credentials = flow.run_local_server(port=0)
+            if not self.credentials:
+                if not os.path.exists(self.credentials_file):
+                    print(f"❌ [YouTube] {self.credentials_file} not found\n")
+                    return False
+                flow = InstalledAppFlow.from_client_secrets_file(
+                    self.credentials_file,
+                    self.scopes
+                )
+                self.credentials = flow.run_local_server(port=0)
+                save_credentials(self.credentials, self.token_file)
+                how = 'new'
             
-            # Save token
-            with open(self.token_file, 'wb') as f:
-                pickle.dump(self.credentials, f)
-            
-            self.youtube = build('youtube', 'v3', credentials=self.credentials)
-            print("✅ [YouTube] Authenticated (new)\n")
+            self.youtube = build_from_document(discovery_document(), credentials=self.credentials)
+            self.close()
+            if self.credentials.refresh_token:
+                self.refresher = TokenRefresher(self.credentials, self.token_file, self.account.name)
+                self.refresher.start()
+            print(f"✅ [YouTube] Authenticated ({how})\n")
             return True
         
         except Exception as e:
             print(f"❌ [YouTube] Auth failed: {e}\n")
             return False
     
-    def upload(self, video_path: Path, title: str, description: str, tags: list) -> Tuple[bool, str]:
-        """Upload to YouTube"""
+    def close(self):
+        """Stop refreshing the token in the background"""
+        if self.refresher:
+            self.refresher.stop()
+            self.refresher = None
+    
+    def upload(self, video_path: Path, title: str, description: str, tags: list,
+               video_name: Optional[str] = None) -> Tuple[bool, str]:
+        """Upload to YouTube
+        
+        `video_name` is the tracker key when `video_path` is a prepared copy.
+        """
+        video_name = video_name or video_path.name
         try:
             print(f"📤 [YouTube] Uploading {video_path.name}...")
             
@@ -73,7 +280,8 @@ class YouTubeUploader:
                 "snippet": {
                     "title": title,
                     "description": description,
-                    "tags": tags[:30],  # Max 30 tags
+                    # Max 30 tags; the last one finds this upload again after a crash
+                    "tags": tags[:29] + [upload_tag(video_name, self.platform)],
                     "categoryId": "24"  # Entertainment
                 },
                 "status": {
@@ -82,30 +290,73 @@ class YouTubeUploader:
                 }
             }
             
-            media = MediaFileUpload(
-                str(video_path),
-                mimetype='video/mp4',
-                resumable=True,
-                chunksize=10*1024*1024  # 10MB chunks
-            )
-            
-            request = self.youtube.videos().insert(
-                part="snippet,status",
-                body=body,
-                media_body=media
-            )
+            job = self.tracker.get_job(video_name, self.platform) or {}
+            if job.get('resume_uri'):
+                print(f"   Resuming saved session at {int(job['resume_offset']) / (1024 * 1024):.1f} MB")
+            request = self._insert_request(video_path, body, job.get('resume_uri'),
+                                           int(job.get('resume_offset') or 0))
+            # Ask the server for its committed offset before sending any bytes
+            probe = bool(request.resumable_uri)
             
             # Execute with progress
             response = None
+            attempt = 0
             while response is None:
                 try:
-                    status, response = request.next_chunk()
+                    if probe:
+                        response = self._probe_session(request)
+                        probe = False
+                        if response is not None:
+                            break  # Every byte arrived before the last run stopped
+                    sent_before = request.resumable_progress
+                    with METRICS.span(self.platform, 'chunk', video_name, self.account.name) as span:
+                        status, response = request.next_chunk()
+                        # The last chunk returns the video without advancing the progress
+                        sent_to = request.resumable.size() if response is not None else request.resumable_progress
+                        span.bytes = sent_to - sent_before
+                    if response is None and self._tune_chunk_size(span.bytes, span.seconds):
+                        # Chunk size is fixed per upload object: carry on with a new one
+                        request = self._insert_request(video_path, body, request.resumable_uri,
+                                                       request.resumable_progress)
+                    attempt = 0
+                    
+                    # Remember the session so a restart continues from here
+                    if response is None and request.resumable_uri:
+                        self.tracker.set_job_fields(video_name, self.platform, {
+                            'resume_uri': request.resumable_uri,
+                            'resume_offset': request.resumable_progress,
+                        })
                     if status:
                         progress = int(status.progress() * 100)
                         print(f"   Progress: {progress}%")
+                
                 except Exception as e:
-                    print(f"   Retry: {e}")
-                    time.sleep(5)
+                    if isinstance(e, HttpError) and _error_reason(e) in QUOTA_REASONS:
+                        raise QuotaExceeded(_error_reason(e)) from e
+                    if attempt >= MAX_RETRIES:
+                        raise
+                    if (isinstance(e, HttpError) and e.resp.status in SESSION_GONE_STATUSES
+                            and request.resumable_uri):
+                        print("   Upload session expired, starting over")
+                        self._clear_session(video_name)
+                        # A fresh session is a new videos.insert call
+                        if not self.quota.reserve(VIDEO_INSERT_COST):
+                            raise QuotaExceeded('daily quota reserved') from e
+                        request = self._insert_request(video_path, body)
+                    elif not is_transient(e):
+                        # Permanent failure: don't resume this session next run
+                        self._clear_session(video_name)
+                        raise
+                    elif isinstance(e, HttpError) and (
+                            e.resp.status == 429 or _error_reason(e) in RATE_LIMIT_REASONS):
+                        # Slow the next uploads down too, not just this retry
+                        self.limiter.throttled()
+                    delay = backoff_delay(attempt)
+                    attempt += 1
+                    print(f"   Retry {attempt}/{MAX_RETRIES} in {delay:.1f}s: {e}")
+                    time.sleep(delay)
+            
+            self._clear_session(video_name)
             
             video_id = response['id']
             url = f"https://www.youtube.com/watch?v={video_id}"
@@ -113,66 +364,201 @@ class YouTubeUploader:
             
             return True, url
         
+        except QuotaExceeded:
+            raise
         except Exception as e:
             error_msg = str(e)[:100]
             print(f"❌ [YouTube] Error: {error_msg}\n")
             return False, error_msg
     
-    def process_videos(self, queue_dir: Path) -> int:
-        """Process all new videos from CSV"""
+    def _insert_request(self, video_path: Path, body: dict, resume_uri: Optional[str] = None,
+                        resume_offset: int = 0):
+        """Build the videos.insert request at the current chunk size, on an open session if given"""
+        media = MediaFileUpload(
+            str(video_path),
+            mimetype=mimetype_for(video_path),
+            resumable=True,
+            chunksize=self.chunk_size
+        )
+        
+        request = self.youtube.videos().insert(
+            part="snippet,status",
+            body=body,
+            media_body=media
+        )
+        
+        if resume_uri:
+            request.resumable_uri = resume_uri
+            request.resumable_progress = resume_offset
+        return request
+    
+    @staticmethod
+    def _probe_session(request) -> Optional[Dict]:
+        """Move a resumed request to the offset the server has committed
+        
+        Returns the video if the upload already completed. An empty PUT with
+        `Content-Range: bytes */size` is the resumable protocol's status query.
+        """
+        size = request.resumable.size()
+        resp, content = request.http.request(
+            request.resumable_uri, method='PUT', body='',
+            headers={'Content-Range': f'bytes */{size}', 'Content-Length': '0'}
+        )
+        if resp.status in (200, 201):
+            return json.loads(content)
+        if resp.status != 308:
+            raise HttpError(resp, content, uri=request.resumable_uri)
+        committed = resp.get('range')  # "bytes=0-N", absent if nothing arrived
+        request.resumable_progress = int(committed.rsplit('-', 1)[1]) + 1 if committed else 0
+        return None
+    
+    def _clear_session(self, video_name: str):
+        self.tracker.set_job_fields(video_name, self.platform, {'resume_uri': '', 'resume_offset': 0})
+    
+    def _tune_chunk_size(self, sent: int, seconds: float) -> bool:
+        """Resize the next chunks so each one takes about TARGET_CHUNK_SECONDS. True if it changed."""
+        if sent <= 0 or seconds <= 0:
+            return False
+        target = int(sent / seconds * TARGET_CHUNK_SECONDS)
+        target = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, target // CHUNK_UNIT * CHUNK_UNIT))
+        # Move halfway towards the target to smooth out noisy samples
+        size = max(MIN_CHUNK_SIZE, (self.chunk_size + target) // 2 // CHUNK_UNIT * CHUNK_UNIT)
+        changed = size != self.chunk_size
+        self.chunk_size = size
+        return changed
+    
+    def _defer(self, video_name: str, reason: str):
+        self.guard.end(video_name, False)
+        when = self.quota.defer(video_name, self.platform)
+        print(f"⏳ [YouTube] {video_name}: {reason}, deferred until {when:%Y-%m-%d %H:%M}\n")
+    
+    def process_job(self, row: dict, queue_dir: Path) -> Optional[bool]:
+        """Upload one tracker row and record the YouTube job result
+        
+        Returns None when the job was deferred to the next quota window or
+        the video was already posted (duplicate content).
+        """
+        video_name = row.get('Video File', '')
+        video_path = upload_path(self.tracker, video_name, self.platform, queue_dir)
+        if not video_path.exists():
+            self.tracker.update_job(video_name, self.platform, 'error', error='File not found')
+            return False
+        
+        if not self.guard.begin(video_name, queue_dir):
+            return None
+        
+        # Pay for videos.insert before sending any bytes. A saved resumable
+        # session was paid for when it was opened.
+        job = self.tracker.get_job(video_name, self.platform) or {}
+        if job.get('resume_uri') and job.get('account') not in ('', self.account.name):
+            # Session was opened by another channel; start over on this one
+            self._clear_session(video_name)
+            job['resume_uri'] = ''
+        self.tracker.set_job_fields(video_name, self.platform, {'account': self.account.name})
+        if not job.get('resume_uri') and not self.quota.reserve(VIDEO_INSERT_COST):
+            self._defer(video_name, f"quota left {self.quota.remaining()} < {VIDEO_INSERT_COST}")
+            return None
+        
+        title = row.get('Title', 'New Video')
+        description = row.get('Description', '')
+        tags = row.get('Tags', '').split(',') if row.get('Tags') else []
+        
+        self.limiter.wait()
+        self.tracker.start_job(video_name, self.platform)
+        try:
+            with METRICS.span(self.platform, 'upload', video_name, self.account.name,
+                              video_path.stat().st_size) as span:
+                success, result = self.upload(video_path, title, description, tags, video_name)
+                span.ok = success
+        except QuotaExceeded as e:
+            self.quota.exhaust()
+            self._defer(video_name, f"API quota exceeded ({e})")
+            # No video was created: back to `new` (ends the lease), held until the next window
+            self.tracker.update_job(video_name, self.platform, 'new')
+            return None
+        
+        self.guard.end(video_name, success, result)
+        
+        # Committed right away, so a crash never loses a finished upload
+        if success:
+            self.tracker.update_job(video_name, self.platform, 'published', url=result, duration=span.seconds)
+        else:
+            self.tracker.update_job(video_name, self.platform, 'error', error=result, duration=span.seconds)
+        
+        self.limiter.report(success)
+        return success
+    
+    def _recent_uploads(self) -> Dict[str, str]:
+        """{video tag: URL} over the channel's latest uploads"""
+        tags = {}
+        channels = self.youtube.channels().list(part='contentDetails', mine=True).execute()
+        for channel in channels.get('items', []):
+            playlist = channel['contentDetails']['relatedPlaylists']['uploads']
+            items = self.youtube.playlistItems().list(
+                part='contentDetails', playlistId=playlist, maxResults=RECONCILE_LOOKBACK
+            ).execute().get('items', [])
+            ids = [item['contentDetails']['videoId'] for item in items]
+            if not ids:
+                continue
+            videos = self.youtube.videos().list(part='snippet', id=','.join(ids)).execute()
+            for video in videos.get('items', []):
+                for tag in video['snippet'].get('tags', []):
+                    tags[tag] = f"https://www.youtube.com/watch?v={video['id']}"
+        return tags
+    
+    def reconcile(self, rows: list, queue_dir: Path):
+        """Settle jobs a crash left `uploading`
+        
+        Every upload carries its job's upload_tag() as a video tag, so the
+        channel's latest uploads tell whether it went through. A job that is
+        not there goes back to the queue; so does one with a saved resumable
+        session, whose server-side state is checked before any bytes are sent.
+        Only if neither check is possible is the job flagged for a manual look.
+        """
         if not self.authenticate():
+            return  # Still `uploading`; checked again on the next start
+        recent = None
+        if self.quota.reserve(RECONCILE_COST):
+            try:
+                recent = self._recent_uploads()
+            except HttpError as e:
+                print(f"⚠️ [YouTube:{self.account.name}] Can't list the channel's uploads "
+                      f"({e.resp.status} {_error_reason(e)}); delete {self.token_file} and log in "
+                      f"again to grant read access\n")
+        
+        for row in rows:
+            video_name = row['Video File']
+            url = recent.get(upload_tag(video_name, self.platform)) if recent is not None else None
+            job = self.tracker.get_job(video_name, self.platform) or {}
+            if url:
+                self._clear_session(video_name)
+                self.guard.recover(video_name, queue_dir, url)
+            elif recent is not None or job.get('resume_uri'):
+                self.tracker.update_job(video_name, self.platform, 'new')
+                print(f"↩️  [YouTube] {video_name} was not posted, back in the queue")
+            else:
+                self.tracker.update_job(video_name, self.platform, 'error',
+                                        error='Upload interrupted; check the channel, then set to new')
+                print(f"⚠️ [YouTube] {video_name}: upload interrupted and can't be checked, marked error")
+        self.close()
+    
+    def process_videos(self, queue_dir: Path, rows: Optional[list] = None) -> int:
+        """Process new YouTube jobs: `rows` if given, else every job this account owns"""
+        if rows is None:
+            rows = [r for r in self.tracker.jobs(self.platform, 'new') if self.account.owns(r)]
+        if not rows or not self.authenticate():
             return 0
         
         count = 0
         try:
-            # Read CSV
-            rows = []
-            if self.csv_path.exists():
-                with open(self.csv_path, 'r', encoding='utf-8-sig') as f:
-                    reader = csv.DictReader(f)
-                    rows = list(reader)
-            
-            # Find new videos
             for row in rows:
-                if row.get('Status', '').lower() != 'new':
-                    continue
-                
-                video_name = row.get('Video File', '')
-                if not video_name:
-                    continue
-                
-                video_path = queue_dir / video_name
-                if not video_path.exists():
-                    row['Status'] = 'error'
-                    row['Error'] = 'File not found'
-                    continue
-                
-                title = row.get('Title', 'New Video')
-                description = row.get('Description', '')
-                tags = row.get('Tags', '').split(',') if row.get('Tags') else []
-                
-                success, result = self.upload(video_path, title, description, tags)
-                
-                if success:
-                    row['Status'] = 'published'
-                    row['YouTube URL'] = result
-                    row['Error'] = ''
+                if self.process_job(row, queue_dir):
                     count += 1
-                else:
-                    row['Status'] = 'error'
-                    row['Error'] = result
-                
-                time.sleep(3)  # YouTube quota safety
-            
-            # Write updated CSV
-            if rows:
-                with open(self.csv_path, 'w', encoding='utf-8', newline='') as f:
-                    writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-                    writer.writeheader()
-                    writer.writerows(rows)
         
         except Exception as e:
             print(f"❌ [YouTube] Process error: {e}\n")
+        finally:
+            self.close()
         
         return count
 
@@ -180,7 +566,10 @@ if __name__ == "__main__":
     queue_dir = Path('videos_queue')
     csv_path = Path('upload_tracker.csv')
     
-    uploader = YouTubeUploader(csv_path)
+    tracker = open_tracker()
+    tracker.import_csv(csv_path)
+    uploader = YouTubeUploader(tracker)
     posted = uploader.process_videos(queue_dir)
+    tracker.export_csv(csv_path)
     
     print(f"\n✅ YouTube: {posted} videos posted")
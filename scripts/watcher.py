@@ -0,0 +1,138 @@
+# ═══════════════════════════════════════════════════════════════
+# Queue Watcher
+# Reports videos landing in videos_queue: file-system events via
+# watchdog (inotify on Linux) when installed, polling otherwise
+# ═══════════════════════════════════════════════════════════════
+
+import os
+import time
+import asyncio
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from media import VIDEO_EXTENSIONS
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Optional: pip install watchdog
+    Observer = None
+    FileSystemEventHandler = object
+
+POLL_INTERVAL = 2.0    # Seconds between directory scans without watchdog
+SETTLE_SECONDS = 2.0   # A file must stop growing this long before it is ingested
+
+
+def _is_video(name: str) -> bool:
+    return name[name.rfind('.'):].lower() in VIDEO_EXTENSIONS
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: 'QueueWatcher'):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher._seen(Path(event.src_path).name)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher._seen(Path(event.dest_path).name)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher._seen(Path(event.src_path).name)
+
+
+class QueueWatcher:
+    """Yields names of videos that landed in the queue and finished copying.
+
+    File-system events (or a periodic scan) only mark a name as a candidate;
+    it is handed out once its size and mtime have been stable for
+    SETTLE_SECONDS, so half-copied files are never uploaded.
+    """
+
+    def __init__(self, queue_dir: Path, poll_interval: float = POLL_INTERVAL):
+        self.queue_dir = Path(queue_dir)
+        self.poll_interval = poll_interval
+        self.mode = 'events' if Observer is not None else 'polling'
+        self._observer = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        self._candidates: Dict[str, Tuple[int, int, float]] = {}  # name -> (size, mtime, stable since)
+        self._known = set()
+
+    def start(self, known: List[str] = ()):
+        """Start watching; `known` names (already tracked) are not reported"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._known = set(known)
+        if self.mode == 'events':
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), str(self.queue_dir), recursive=False)
+            self._observer.start()
+        # One scan either way, for files that landed while we were down
+        self._scan()
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+    def _seen(self, name: str):
+        """Called from the watchdog thread (or the poller) for a touched file"""
+        if not _is_video(name) or name in self._known:
+            return
+        with self._lock:
+            if name in self._candidates:
+                return
+            self._candidates[name] = (-1, -1, 0.0)
+        if self._loop and self._wakeup:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _scan(self):
+        with os.scandir(self.queue_dir) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    self._seen(entry.name)
+
+    def _settled(self) -> List[str]:
+        """Candidates whose size/mtime stopped changing; forgets vanished files"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for name, (size, mtime, since) in list(self._candidates.items()):
+                try:
+                    stat = (self.queue_dir / name).stat()
+                except FileNotFoundError:
+                    del self._candidates[name]
+                    continue
+                if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                    self._candidates[name] = (stat.st_size, stat.st_mtime_ns, now)
+                elif now - since >= SETTLE_SECONDS:
+                    del self._candidates[name]
+                    self._known.add(name)
+                    ready.append(name)
+        return sorted(ready)
+
+    async def changes(self) -> List[str]:
+        """Wait for the next batch of settled files"""
+        while True:
+            with self._lock:
+                pending = bool(self._candidates)
+            timeout = min(self.poll_interval, SETTLE_SECONDS / 2) if pending else self.poll_interval
+            if self.mode == 'events' and not pending:
+                timeout = None  # Nothing to settle: sleep until an event arrives
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self.mode == 'polling':
+                await asyncio.to_thread(self._scan)
+            ready = await asyncio.to_thread(self._settled)
+            if ready:
+                return ready
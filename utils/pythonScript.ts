@@ -1,114 +1,412 @@
 export const PYTHON_SCRIPT = `import os
-import sys
+import json
+import hashlib
+import argparse
 import subprocess
-import glob
-import shutil
+import tempfile
+import time
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 import piexif
 
 # Requirements:
 # pip install piexif
 # ffmpeg must be installed on system
 
-def clean_image(filepath):
+# Remembers which images are tagged and what each video was built from,
+# so untouched images and unchanged videos are skipped next run
+MANIFEST_FILE = ".process_assets.json"
+SLIDESHOW_OUTPUT = "slideshow_video.mp4"
+MERGED_OUTPUT = "final_merged_selfie.mp4"
+ASSET_FOLDER_MARKERS = ("Slideshow", "Selfie", "Video")
+
+# Slideshow encoding
+SLIDE_SECONDS = 3
+SLIDE_FPS = 25
+SCALED_DIR = ".scaled"
+X264_PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast",
+                "medium", "slow", "slower", "veryslow")
+SLIDESHOW_DEFAULTS = {
+    "preset": "medium",      # x264's own defaults
+    "crf": 23,
+    "size": None,            # "WxH" to fit every slide into one frame size
+    "prescale": False,       # scale each slide once to a PNG instead of in the encode
+    "segment_images": 10,    # slides per parallel segment once "size" is set; 0 = one encode
+    "segment_jobs": 1,       # segments (and prescales) run at once within one slideshow
+}
+
+def exif_payload():
+    """EXIF block injected into every image (built once per run)"""
+    exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+    
+    # Set Fake Device Data
+    exif_dict["0th"][piexif.ImageIFD.Make] = "Apple"
+    exif_dict["0th"][piexif.ImageIFD.Model] = "iPhone 17 Pro"
+    exif_dict["0th"][piexif.ImageIFD.Software] = "18.1"
+    
+    return piexif.dump(exif_dict)
+
+def clean_image(filepath, exif_bytes):
+    """Inject the EXIF block; returns the error, or None (printed by the caller, in order)"""
     try:
-        print(f"Processing Image: {filepath}")
-        exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
-        
-        # Set Fake Device Data
-        exif_dict["0th"][piexif.ImageIFD.Make] = "Apple"
-        exif_dict["0th"][piexif.ImageIFD.Model] = "iPhone 17 Pro"
-        exif_dict["0th"][piexif.ImageIFD.Software] = "18.1"
-        
-        exif_bytes = piexif.dump(exif_dict)
         piexif.insert(exif_bytes, filepath)
-        print(" - Metadata injected (iPhone 17 Pro)")
-    except ImportError:
-        print("Error: piexif library not found. Run 'pip install piexif'")
+        return None
     except Exception as e:
-        print(f" - Error processing image: {e}")
-
-def process_video_assets(folder_path):
-    # Check for video + audio to merge
-    videos = glob.glob(os.path.join(folder_path, "*.mp4"))
-    audio = glob.glob(os.path.join(folder_path, "voiceover.wav"))
-    
-    if videos and audio:
-        video_path = videos[0]
-        audio_path = audio[0]
-        output_path = os.path.join(folder_path, "final_merged_selfie.mp4")
-        print(f"Merging Video + Audio in {folder_path}")
-        
-        # ffmpeg command to replace audio or merge
-        # -stream_loop -1 loops the video if audio is longer
-        # -shortest cuts to shortest stream
-        cmd = [
-            "ffmpeg", "-y",
-            "-stream_loop", "-1", "-i", video_path,
-            "-i", audio_path,
-            "-c:v", "copy", "-c:a", "aac",
-            "-map", "0:v:0", "-map", "1:a:0",
-            "-shortest",
-            output_path
-        ]
-        try:
+        return e
+
+def clean_images(root, manifest, workers, force=False):
+    """Tag every JPEG under root that isn't tagged with this run's payload yet
+    
+    An image is skipped when its size and mtime still match what was recorded
+    right after it was last tagged, with the same payload. The rest are tagged
+    on a thread pool (the work is file I/O).
+    """
+    exif_bytes = exif_payload()
+    payload = hashlib.sha1(exif_bytes).hexdigest()
+    tagged = manifest.setdefault("images", {})
+    counts = {"tagged": 0, "up to date": 0, "failed": 0}
+    
+    paths = []
+    todo = []
+    for folder, dirs, files in os.walk(root):
+        for file in files:
+            if file.lower().endswith(('.jpg', '.jpeg')):
+                path = os.path.join(folder, file)
+                paths.append(path)
+                st = os.stat(path)
+                entry = tagged.get(path)
+                if (not force and entry and entry["payload"] == payload
+                        and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns):
+                    counts["up to date"] += 1
+                else:
+                    todo.append(path)
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, error in zip(todo, pool.map(clean_image, todo, repeat(exif_bytes))):
+            print(f"Processing Image: {path}")
+            if error is None:
+                print(" - Metadata injected (iPhone 17 Pro)")
+                st = os.stat(path)
+                tagged[path] = {"size": st.st_size, "mtime": st.st_mtime_ns, "payload": payload}
+                counts["tagged"] += 1
+            else:
+                print(f" - Error processing image: {error}")
+                tagged.pop(path, None)
+                counts["failed"] += 1
+    
+    # Forget images that are gone
+    for path in set(tagged) - set(paths):
+        del tagged[path]
+    return counts
+
+def process_video_assets(folder_path, video_path, audio_path):
+    output_path = os.path.join(folder_path, MERGED_OUTPUT)
+    print(f"Merging Video + Audio in {folder_path}")
+    
+    # ffmpeg command to replace audio or merge
+    # -stream_loop -1 loops the video if audio is longer
+    # -shortest cuts to shortest stream
+    cmd = [
+        "ffmpeg", "-y",
+        "-stream_loop", "-1", "-i", video_path,
+        "-i", audio_path,
+        "-c:v", "copy", "-c:a", "aac",
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-shortest",
+        output_path
+    ]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print(" - Merged successfully!")
+        return True
+    except Exception as e:
+        print(f" - Merge failed: {e}")
+        return False
+
+def scale_filter(size):
+    """Fit a slide into WxH, padding the rest with black"""
+    width, height = size.split("x")
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1")
+
+def prescale_images(folder_path, images, size, workers=1):
+    """PNG copies of the slides at WxH, made once and reused while newer than their source"""
+    scaled_dir = os.path.join(folder_path, SCALED_DIR)
+    os.makedirs(scaled_dir, exist_ok=True)
+    
+    def scale(img):
+        scaled = os.path.join(scaled_dir, os.path.splitext(os.path.basename(img))[0] + ".png")
+        if not (os.path.exists(scaled) and os.path.getmtime(scaled) >= os.path.getmtime(img)):
+            cmd = ["ffmpeg", "-y", "-i", img, "-vf", scale_filter(size), scaled]
             subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            print(" - Merged successfully!")
-        except Exception as e:
-            print(f" - Merge failed: {e}")
-
-def create_video_from_slideshow(folder_path):
-    images = sorted(glob.glob(os.path.join(folder_path, "*.jpg")))
-    audio = glob.glob(os.path.join(folder_path, "voiceover.wav"))
-    
-    if len(images) >= 3 and audio:
-        print(f"Creating Slideshow Video in {folder_path}")
-        output_path = os.path.join(folder_path, "slideshow_video.mp4")
-
-        # Create input list file (UTF-8 to avoid Unicode issues on Windows codepages)
-        input_list_path = os.path.join(folder_path, "input.txt")
-        with open(input_list_path, "w", encoding="utf-8") as f:
-            for img in images:
-                f.write(f"file '{os.path.abspath(img)}'\\n")
-                f.write("duration 3\\n")
+        return scaled
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(scale, images))
+
+def write_concat_list(list_path, images):
+    # UTF-8 to avoid Unicode issues on Windows codepages
+    with open(list_path, "w", encoding="utf-8") as f:
+        for img in images:
+            f.write(f"file '{os.path.abspath(img)}'\\n")
+            f.write(f"duration {SLIDE_SECONDS}\\n")
+        # The concat demuxer ignores the last duration unless the last file is listed again
+        f.write(f"file '{os.path.abspath(images[-1])}'\\n")
+
+def encode_slides(images, list_path, vf, options, output_path, audio_path=None):
+    """Slides -> H.264 at SLIDE_FPS, exactly SLIDE_SECONDS per slide (cut to the audio if shorter)"""
+    write_concat_list(list_path, images)
+    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        cmd += ["-i", audio_path]
+    cmd += ["-vf", vf, "-r", str(SLIDE_FPS), "-t", str(len(images) * SLIDE_SECONDS),
+            "-c:v", "libx264", "-preset", options["preset"], "-crf", str(options["crf"])]
+    if audio_path:
+        cmd += ["-c:a", "aac", "-shortest"]
+    else:
+        cmd += ["-an"]
+    subprocess.run(cmd + [output_path], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def create_video_from_slideshow(folder_path, images, audio_path, options=SLIDESHOW_DEFAULTS):
+    """Slides (SLIDE_SECONDS each) + voiceover -> slideshow_video.mp4
+    
+    With a frame size set, long slideshows are cut into segments of
+    \`segment_images\` slides that are encoded at once, each by its own x264,
+    then joined without re-encoding. Every segment is a whole number of
+    frames, so the video shows the same frames at the same times as a
+    single encode. Without a size the slides keep their own dimensions and
+    segments could disagree, so the whole slideshow is one encode.
+    """
+    print(f"Creating Slideshow Video in {folder_path}")
+    output_path = os.path.join(folder_path, SLIDESHOW_OUTPUT)
+    started = time.perf_counter()
+    
+    try:
+        # Every segment must share one frame size for the join to work
+        vf = "format=yuv420p"
+        if options["size"] and options["prescale"]:
+            images = prescale_images(folder_path, images, options["size"], options["segment_jobs"])
+        elif options["size"]:
+            vf = scale_filter(options["size"]) + "," + vf
         
-        # Command: Images -> Video + Audio
-        # Assuming 3 images, 3s duration each approx
-        cmd = [
-            "ffmpeg", "-y",
-            "-f", "concat", "-safe", "0", "-i", input_list_path,
-            "-i", audio[0],
-            "-vf", "format=yuv420p",
-            "-c:v", "libx264", "-c:a", "aac",
-            "-shortest",
-            output_path
-        ]
+        per_segment = options["segment_images"] if options["size"] else 0
+        with tempfile.TemporaryDirectory(dir=folder_path) as work_dir:
+            if not per_segment or len(images) <= per_segment:
+                # Command: Images -> Video + Audio
+                encode_slides(images, os.path.join(work_dir, "input.txt"), vf, options,
+                              output_path, audio_path)
+                segments = 1
+            else:
+                chunks = [images[i:i + per_segment] for i in range(0, len(images), per_segment)]
+                segment_paths = [os.path.join(work_dir, f"segment_{i:03d}.mp4") for i in range(len(chunks))]
+                
+                def encode_segment(i):
+                    encode_slides(chunks[i], os.path.join(work_dir, f"segment_{i:03d}.txt"), vf,
+                                  options, segment_paths[i])
+                
+                with ThreadPoolExecutor(max_workers=options["segment_jobs"]) as pool:
+                    list(pool.map(encode_segment, range(len(chunks))))
+                
+                # Join the segments as they are and add the voiceover
+                list_path = os.path.join(work_dir, "segments.txt")
+                with open(list_path, "w", encoding="utf-8") as f:
+                    f.writelines(f"file '{os.path.abspath(path)}'\\n" for path in segment_paths)
+                cmd = [
+                    "ffmpeg", "-y",
+                    "-f", "concat", "-safe", "0", "-i", list_path,
+                    "-i", audio_path,
+                    "-c:v", "copy", "-c:a", "aac",
+                    "-map", "0:v:0", "-map", "1:a:0",
+                    "-shortest",
+                    output_path
+                ]
+                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                segments = len(chunks)
         
-        try:
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            print(" - Slideshow created!")
-        except Exception as e:
-            print(f" - Slideshow creation failed: {e}")
-        finally:
-            if os.path.exists(input_list_path):
-                os.remove(input_list_path)
+        took = time.perf_counter() - started
+        print(f" - Slideshow created in {took:.1f}s ({len(images)} slides, {segments} segment(s))")
+        return True
+    except Exception as e:
+        print(f" - Slideshow creation failed: {e}")
+        return False
 
-def main():
-    print("Starting Asset Processing...")
+# ─── Build graph ──────────────────────────────────────────────
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+def file_digest(path, hashes):
+    """SHA-1 of a file, re-read only when its size or mtime changed since the last run"""
+    st = os.stat(path)
+    cached = hashes.get(path)
+    if cached and cached["size"] == st.st_size and cached["mtime"] == st.st_mtime_ns:
+        return cached["sha1"]
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    hashes[path] = {"size": st.st_size, "mtime": st.st_mtime_ns, "sha1": digest.hexdigest()}
+    return hashes[path]["sha1"]
+
+def find_jobs(root=".", slideshow_options=SLIDESHOW_DEFAULTS):
+    """{output: (builder, args, inputs, settings)} for every video the asset folders can produce
     
-    # Process all nested folders
-    for root, dirs, files in os.walk("."):
+    inputs lists the files an output is built from; an input that is itself
+    an output (a slideshow later merged with audio) makes a dependency.
+    settings are the encode options that change the output's frames.
+    """
+    settings = "{preset}/{crf}/{size}".format(**slideshow_options)
+    jobs = {}
+    for folder, dirs, files in os.walk(root):
+        if not any(marker in folder for marker in ASSET_FOLDER_MARKERS):
+            continue
+        audio = os.path.join(folder, "voiceover.wav")
+        if "voiceover.wav" not in files:
+            continue
         
-        # Clean Images
-        for file in files:
-            full_path = os.path.join(root, file)
-            if file.lower().endswith(('.jpg', '.jpeg')):
-                clean_image(full_path)
+        slideshow = os.path.join(folder, SLIDESHOW_OUTPUT)
+        images = sorted(os.path.join(folder, f) for f in files if f.lower().endswith(".jpg"))
+        if len(images) >= 3:
+            jobs[slideshow] = (create_video_from_slideshow, (folder, images, audio, slideshow_options),
+                               images + [audio], settings)
         
-        # Check for asset folders to process video
-        if "Slideshow" in root or "Selfie" in root or "Video" in root:
-             create_video_from_slideshow(root)
-             process_video_assets(root)
+        # Merge the folder's own clip, else the slideshow made above
+        videos = sorted(os.path.join(folder, f) for f in files
+                        if f.endswith(".mp4") and f not in (SLIDESHOW_OUTPUT, MERGED_OUTPUT))
+        if not videos and slideshow in jobs:
+            videos = [slideshow]
+        if videos:
+            jobs[os.path.join(folder, MERGED_OUTPUT)] = (
+                process_video_assets, (folder, videos[0], audio), [videos[0], audio], "")
+    return jobs
 
+def signature(inputs, hashes, settings=""):
+    """Fingerprint of an output's inputs (names and contents) and settings"""
+    digest = hashlib.sha1(settings.encode("utf-8"))
+    for path in inputs:
+        digest.update(f"{path}\\0{file_digest(path, hashes)}\\0".encode("utf-8"))
+    return digest.hexdigest()
+
+def build_videos(jobs, manifest, workers, force=False):
+    """Rebuild stale outputs, running independent ones at once
+    
+    An output is stale when it is missing or its inputs' signature differs
+    from the one recorded when it was last built. A job starts only once
+    the outputs it reads are built; if one of those fails it is skipped.
+    """
+    built = manifest.setdefault("outputs", {})
+    hashes = manifest.setdefault("hashes", {})
+    waiting = {output: [i for i in inputs if i in jobs] for output, (_, _, inputs, _) in jobs.items()}
+    counts = {"built": 0, "up to date": 0, "failed": 0}
+    
+    def start_ready(pool, running):
+        # Skipping an up-to-date output can free its dependents, so repeat
+        ready = [output for output, deps in waiting.items() if not deps]
+        while ready:
+            for output in ready:
+                del waiting[output]
+                builder, args, inputs, settings = jobs[output]
+                sig = signature(inputs, hashes, settings)
+                if not force and built.get(output) == sig and os.path.exists(output):
+                    counts["up to date"] += 1
+                    finish(output, True)
+                else:
+                    running[pool.submit(builder, *args)] = (output, sig)
+            ready = [output for output, deps in waiting.items() if not deps]
+    
+    def finish(output, ok):
+        for other, deps in list(waiting.items()):
+            if output not in deps:
+                continue
+            if ok:
+                deps.remove(output)
+            else:
+                del waiting[other]
+                counts["failed"] += 1
+                print(f" - Skipped {other}: {output} was not built")
+                finish(other, False)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        start_ready(pool, running)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                output, sig = running.pop(future)
+                try:
+                    ok = future.result() and os.path.exists(output)
+                except Exception as e:
+                    print(f" - Error building {output}: {e}")
+                    ok = False
+                if ok:
+                    built[output] = sig
+                    counts["built"] += 1
+                else:
+                    built.pop(output, None)
+                    counts["failed"] += 1
+                finish(output, ok)
+            start_ready(pool, running)
+    
+    # Forget files that are gone
+    for path in [p for p in hashes if not os.path.exists(p)]:
+        del hashes[path]
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Tag images and build slideshow/selfie videos")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="videos built at once (default: CPU cores)")
+    parser.add_argument("--image-jobs", type=int, default=min(32, (os.cpu_count() or 1) * 4),
+                        help="images tagged at once (default: 4 per core, at most 32)")
+    parser.add_argument("--force", action="store_true", help="retag every image and rebuild every video")
+    parser.add_argument("--preset", choices=X264_PRESETS, default=SLIDESHOW_DEFAULTS["preset"],
+                        help="x264 preset for slideshows (default: medium)")
+    parser.add_argument("--crf", type=int, default=SLIDESHOW_DEFAULTS["crf"],
+                        help="x264 CRF for slideshows, lower is better (default: 23)")
+    parser.add_argument("--segment-images", type=int, default=SLIDESHOW_DEFAULTS["segment_images"],
+                        help="slides per parallel segment when --slideshow-size is set, "
+                             "0 for one encode per slideshow (default: 10)")
+    parser.add_argument("--slideshow-size", metavar="WxH",
+                        help="fit every slide into this frame size, e.g. 1080x1920")
+    parser.add_argument("--prescale", action="store_true",
+                        help="scale each slide once to a PNG before encoding (needs --slideshow-size)")
+    args = parser.parse_args()
+    if args.prescale and not args.slideshow_size:
+        parser.error("--prescale needs --slideshow-size")
+    slideshow_options = {
+        "preset": args.preset,
+        "crf": args.crf,
+        "size": args.slideshow_size,
+        "prescale": args.prescale,
+        "segment_images": max(0, args.segment_images),
+        # Slideshows already build --jobs at a time: share the cores, don't multiply them
+        "segment_jobs": max(1, (os.cpu_count() or 1) // max(1, args.jobs)),
+    }
+    
+    print("Starting Asset Processing...")
+    manifest = load_manifest()
+    
+    # Clean Images first: the slideshows are built from them
+    counts = clean_images(".", manifest, max(1, args.image_jobs), args.force)
+    save_manifest(manifest)
+    print(f"\\nImages: {counts['tagged']} tagged, {counts['up to date']} up to date, {counts['failed']} failed")
+    
+    # Then every video whose inputs changed, in parallel
+    jobs = find_jobs(".", slideshow_options)
+    counts = build_videos(jobs, manifest, max(1, args.jobs), args.force)
+    save_manifest(manifest)
+    print(f"\\nVideos: {counts['built']} built, {counts['up to date']} up to date, {counts['failed']} failed")
+    
     print("\\nDone! All assets processed.")
 
 if __name__ == "__main__":